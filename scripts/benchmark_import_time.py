@@ -0,0 +1,102 @@
+"""
+基于 `python -X importtime` 的启动耗时基准，用于防止 v1 入口模块重新在导入时加载重型依赖
+
+用法（在项目根目录）:
+    PYTHONPATH=$(pwd) python scripts/benchmark_import_time.py
+    PYTHONPATH=$(pwd) python scripts/benchmark_import_time.py --budget 0.8 src.v1_plain.main_parse_pdfs
+
+每个模块在独立的子进程里导入，解析 stderr 中的 importtime 输出：
+- 导入了 FORBIDDEN_MODULES 中的任何模块即视为回归
+- 模块累计导入耗时超过预算也视为回归
+存在回归时以非零状态码退出，可以直接挂到 CI / pre-commit 里
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_MODULES = [
+    "src.v1_plain.parse_text",
+    "src.v1_plain.parse_table",
+    "src.v1_plain.table_finder",
+    "src.v1_plain.main_parse_pdfs",
+    "src.v1_plain.main_extract_tables",
+    "src.v1_plain.main_find_next_table",
+]
+
+# 这些模块只应在第一次计算向量时被导入
+FORBIDDEN_MODULES = ["torch", "sentence_transformers", "transformers", "sklearn"]
+
+DEFAULT_BUDGET_SECONDS = 1.0
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    在子进程中导入模块
+
+    Returns:
+        (含解释器启动的累计导入耗时秒数, {顶层包名: 累计微秒})
+    """
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+
+    total_us = 0
+    packages: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        top_level = name.split(".")[0]
+        packages[top_level] = max(packages.get(top_level, 0), cumulative_us)
+        if len(indent) == 1:
+            # 只累加最外层的导入（解释器启动、父包、模块本身），嵌套导入已包含在其中
+            total_us += cumulative_us
+    return total_us / 1e6, packages
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="单个模块的导入耗时预算（秒）")
+    parser.add_argument("--top", type=int, default=5, help="每个模块展示耗时最多的前 N 个顶层包")
+    args = parser.parse_args(argv)
+
+    regressions = []
+    for module in args.modules:
+        seconds, packages = measure_import(module)
+        forbidden = [name for name in FORBIDDEN_MODULES if name in packages]
+        heaviest = sorted(packages.items(), key=lambda x: x[1], reverse=True)[:args.top]
+
+        status = "OK"
+        if forbidden:
+            status = "FAIL"
+            regressions.append(f"{module}: 导入时加载了 {', '.join(forbidden)}")
+        if seconds > args.budget:
+            status = "FAIL"
+            regressions.append(f"{module}: 导入耗时 {seconds:.3f}s 超过预算 {args.budget:.3f}s")
+
+        print(f"[{status}] {module}: {seconds:.3f}s")
+        for name, us in heaviest:
+            print(f"    {name:<30} {us / 1e6:.3f}s")
+
+    if regressions:
+        print("\n检测到导入耗时回归:")
+        for item in regressions:
+            print(f"  - {item}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+比较 v1 语义模型不同推理后端的编码吞吐、进程内存与打分一致性
+
+用法（在项目根目录）:
+    PYTHONPATH=$(pwd) python scripts/benchmark_model_backends.py
+    PYTHONPATH=$(pwd) python scripts/benchmark_model_backends.py --pdf "/path/to/report.pdf" torch onnx onnx:avx512_vnni
+
+后端写法为 `backend[:quantization]`。每个后端在独立子进程中加载与计时，峰值 RSS 互不干扰；
+以第一个后端（默认 torch）的打分为基准，输出各后端余弦相似度的最大绝对误差
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_BACKENDS = ["torch", "onnx", "onnx:avx512_vnni"]
+
+
+def load_texts(pdf_path: str = None, limit: int = 2000) -> List[str]:
+    """从 PDF 中取文本块作为样本；未指定 PDF 时使用内置样例文本重复填充"""
+    from src.v1_plain.model_loader import PARITY_SAMPLE_TEXTS
+
+    if not pdf_path:
+        return (PARITY_SAMPLE_TEXTS * (limit // len(PARITY_SAMPLE_TEXTS) + 1))[:limit]
+
+    from src.utils.document_session import DocumentSession
+    from src.v1_plain.parse_text import _extract_blocks
+
+    texts = []
+    with DocumentSession(pdf_path) as session:
+        for page_num in range(len(session)):
+            texts.extend(block[4] for block in _extract_blocks(session, page_num))
+            if len(texts) >= limit:
+                break
+    return texts[:limit]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为 B
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def run_worker(spec: str, pdf_path: str, limit: int) -> Dict:
+    """子进程：加载指定后端，计时编码并返回打分"""
+    from src.v1_plain.config import DEFAULT_CONFIG as config
+    from src.v1_plain.model_loader import load_model, similarity_scores
+
+    backend, _, quantization = spec.partition(':')
+    texts = load_texts(pdf_path, limit)
+
+    start = time.perf_counter()
+    model = load_model(backend, quantization or None)
+    load_seconds = time.perf_counter() - start
+
+    model.encode(texts[:config.model.batch_size], batch_size=config.model.batch_size)  # 预热
+    start = time.perf_counter()
+    model.encode(texts, batch_size=config.model.batch_size, normalize_embeddings=True, show_progress_bar=False)
+    encode_seconds = time.perf_counter() - start
+
+    return {
+        'backend': spec,
+        'texts': len(texts),
+        'load_seconds': load_seconds,
+        'texts_per_second': len(texts) / encode_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'scores': similarity_scores(model, texts).tolist()}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backends", nargs="*", default=DEFAULT_BACKENDS)
+    parser.add_argument("--pdf", help="从该 PDF 中抽取文本块作为样本")
+    parser.add_argument("--limit", type=int, default=2000, help="样本文本块数量")
+    parser.add_argument("--tolerance", type=float, default=None, help="余弦相似度允许的最大绝对误差，默认取 ModelConfig.parity_tolerance")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.pdf, args.limit)))
+        return 0
+
+    from src.v1_plain.config import DEFAULT_CONFIG as config
+    tolerance = config.model.parity_tolerance if args.tolerance is None else args.tolerance
+
+    results = []
+    for spec in args.backends:
+        cmd = [sys.executable, __file__, "--worker", spec, "--limit", str(args.limit)]
+        if args.pdf:
+            cmd += ["--pdf", args.pdf]
+        env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+        proc = subprocess.run(cmd, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"[FAIL] {spec}: 子进程失败\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        return 1
+
+    reference = results[0]
+    failed = False
+    print(f"{'backend':<22}{'load(s)':>10}{'texts/s':>12}{'speedup':>10}{'RSS(MB)':>10}{'max|Δ|':>10}")
+    for result in results:
+        max_error = max(abs(a - b) for a, b in zip(result['scores'], reference['scores']))
+        speedup = result['texts_per_second'] / reference['texts_per_second']
+        ok = max_error <= tolerance
+        failed |= not ok
+        print(f"{result['backend']:<22}{result['load_seconds']:>10.2f}{result['texts_per_second']:>12.1f}"
+              f"{speedup:>9.2f}x{result['peak_rss_mb']:>10.0f}{max_error:>10.4f}{'' if ok else '  超出容差'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
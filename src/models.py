@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from uuid import uuid4
 
 from sqlalchemy import JSON, Column
@@ -33,6 +33,8 @@ class Paper(SQLModel, table=True):
     publish_month: Optional[str] = Field(default=None, description="第一页解析出的发表月份")
     publish_month_verified: Optional[bool] = Field(default=False, description="是否已经尝试过解析第一页")
 
+    route_decisions: List["RouteDecision"] = Relationship(back_populates="paper")
+
 
 class CandidateTable(SQLModel, table=True):
     """
@@ -49,3 +51,65 @@ class CandidateTable(SQLModel, table=True):
     bbox: List[float] = Field(sa_column=Column(JSON), description="该表格在页面上的 bbox 格式坐标")
     raw_data: List[List[str]] = Field(sa_column=Column(JSON), description="该表格的二维数组数据")
     headers: List[str] = Field(sa_column=Column(JSON), description="该表格的列头，通常等于 raw_data 的第一行，但存在辅助列、跨行等问题")
+
+
+class LLMBatch(SQLModel, table=True):
+    """
+    批量提交给 LLM 的任务（Claude Message Batches），结果在任务结束后写入分块缓存
+    """
+    __tablename__ = "llm_batch"
+
+    id: str = Field(primary_key=True, description="服务端返回的 batch id")
+    created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+
+    model: str = Field(description="请求使用的模型")
+    status: str = Field(default="in_progress", index=True, description="in_progress / canceling / ended")
+    request_count: int = Field(description="任务包含的请求数")
+    succeeded_count: Optional[int] = Field(default=None, description="成功并已写入缓存的请求数")
+    ingested_at: Optional[datetime] = Field(default=None, description="结果写入缓存的时间，为空表示尚未处理结果")
+
+    items: List["LLMBatchItem"] = Relationship(back_populates="batch")
+
+
+class LLMBatchItem(SQLModel, table=True):
+    """
+    批量任务中的单个请求，对应一个 PDF 分块
+    """
+    __tablename__ = "llm_batch_item"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    custom_id: str = Field(index=True, description="请求 id，等于该分块的结果缓存键")
+
+    batch: LLMBatch = Relationship(back_populates="items")
+    batch_id: str = Field(foreign_key="llm_batch.id", index=True)
+
+    paper_name: str = Field(index=True, description="分块所属的文件名")
+    pages: List[int] = Field(sa_column=Column(JSON), description="分块包含的页面在原文件中的下标（从 0 开始）")
+    status: str = Field(default="processing", index=True,
+                        description="processing / succeeded / errored / canceled / expired")
+    error: Optional[str] = Field(default=None, description="失败原因")
+
+
+class RouteDecision(SQLModel, table=True):
+    """
+    混合路由对一篇文章的决策：本地解析结果的评分，以及是否交给 LLM 重新解析、两边各自的耗时
+    """
+    __tablename__ = "route_decision"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+
+    paper: Paper = Relationship(back_populates="route_decisions")
+    paper_id: int = Field(foreign_key="paper.id", index=True)
+
+    score: float = Field(description="本地结果的综合评分（0-1）")
+    scores: Dict[str, float] = Field(sa_column=Column(JSON), description="各项检查的得分")
+    threshold: float = Field(description="做决策时使用的阈值")
+    route: str = Field(index=True, description="local：采用本地结果 / llm：交给 LLM")
+    local_seconds: float = Field(description="本地解析耗时（秒），复用已有候选表格时只计评分")
+    llm_seconds: Optional[float] = Field(default=None, description="LLM 解析耗时（秒）")
+    llm_success: Optional[bool] = Field(default=None, description="LLM 是否成功返回目标表格")
+    llm_input_tokens: Optional[int] = Field(default=None, description="LLM 请求实际消耗的输入 token 数")
+    llm_output_tokens: Optional[int] = Field(default=None, description="LLM 请求实际消耗的输出 token 数")
+    note: Optional[str] = Field(default=None, description="LLM 失败原因等")
@@ -0,0 +1,357 @@
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import reduction
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Optional
+
+from src.log import logger
+
+
+class DeadlineExceeded(Exception):
+    """任务超过时限，执行它的子进程已被杀掉"""
+
+
+class WorkerCrashed(Exception):
+    """执行任务的子进程意外退出（如 PyMuPDF 段错误）"""
+
+
+# 子进程内与父进程通信的管道，见 send_message
+_worker_conn = None
+
+
+def send_message(payload):
+    """
+    在任务执行过程中向父进程发送消息（如进度），由父进程的 on_message 回调处理
+
+    每个子进程只使用自己的管道，被杀掉时不会破坏其他子进程的通信；不在子进程中时直接忽略
+    """
+    if _worker_conn is not None:
+        _worker_conn.send(('message', payload))
+
+
+def _worker_main(conn, initializer, initargs):
+    global _worker_conn
+    _worker_conn = conn
+    if initializer is not None:
+        initializer(*initargs)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        fn, args, kwargs = task
+        try:
+            reply = ('result', fn(*args, **kwargs))
+        except BaseException as e:
+            reply = ('error', e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # 结果或异常无法序列化
+            conn.send(('error', RuntimeError(f"无法回传任务结果: {e!r}")))
+
+
+def _zygote_main(conn, initializer, initargs):
+    """
+    只负责 fork 子进程的单线程进程
+
+    DeadlinePool 创建时（调度线程启动之前）从父进程 fork 一次，之后所有子进程（包括超时或崩溃后补充的子进程）
+    都从这里 fork：父进程此时已经有调度线程、Rich 的刷新线程等，在多线程进程中 fork 可能继承被其他线程持有的锁。
+    zygote 继承了父进程 fork 时的内存（已加载的模型），子进程照样写时复制共享
+    """
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # 子进程退出后由内核自动回收
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        parent_end, child_end = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            conn.close()
+            parent_end.close()
+            code = 0
+            try:
+                _worker_main(Connection(child_end.detach()), initializer, initargs)
+            except BaseException:
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+
+        child_end.close()
+        reduction.send_handle(conn, parent_end.fileno(), os.getppid())
+        parent_end.close()
+        conn.send(pid)
+
+
+class _ForkedProcess:
+    """由 zygote fork 出的子进程：不是当前进程的直接子进程，只能按 pid 检查与终止，拿不到退出码"""
+
+    exitcode = None
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def is_alive(self) -> bool:
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def join(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.future: Optional[Future] = None
+        self.description = ''
+        self.deadline = None
+
+
+class DeadlinePool:
+    """
+    带硬性时限的进程池
+
+    每个任务在独立的子进程中执行，父进程的调度线程用 multiprocessing.connection.wait 同时等待所有子进程的管道：
+    - 任务从交给子进程时开始计时，超过 timeout 秒即杀掉该子进程，Future 以 DeadlineExceeded 结束
+    - 子进程意外退出时 Future 以 WorkerCrashed 结束
+    两种情况都会立即补充一个新的子进程，单个病态文件不会拖住整体吞吐。
+    返回标准的 concurrent.futures.Future，可直接配合 as_completed / wait 使用
+
+    使用 fork 方式时，子进程不由父进程直接 fork，而是由创建进程池时 fork 出的 zygote 进程 fork（见 _zygote_main），
+    因此进程池应在启动其他线程（Live、推理线程等）之前创建
+    """
+
+    def __init__(self, max_workers: int, timeout: Optional[float], mp_context=None,
+                 initializer: Callable = None, initargs: tuple = (), on_message: Callable = None):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.on_message = on_message
+        self._ctx = mp_context or multiprocessing.get_context()
+        self._initializer = initializer
+        self._initargs = initargs
+
+        self._pending = deque()  # (future, task, description)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._wakeup_pending = False
+        self._wakeup_reader, self._wakeup_writer = multiprocessing.Pipe(duplex=False)
+
+        self._zygote = self._zygote_conn = None
+        if self._ctx.get_start_method() == 'fork':
+            self._zygote_conn, zygote_conn = self._ctx.Pipe()
+            self._zygote = self._ctx.Process(target=_zygote_main, args=(zygote_conn, initializer, initargs),
+                                             name="deadline-pool-zygote", daemon=True)
+            self._zygote.start()
+            zygote_conn.close()
+        self._thread = threading.Thread(target=self._run, name="deadline-pool", daemon=True)
+
+        self.killed = 0
+        self.crashed = 0
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        description = str(args[0]) if args else getattr(fn, '__name__', '')
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("DeadlinePool 已关闭")
+            self._pending.append((future, (fn, args, kwargs), description))
+        self._wakeup()
+        return future
+
+    def shutdown(self, wait: bool = True):
+        """不再接受新任务，已提交的任务执行完后退出子进程"""
+        with self._lock:
+            self._shutdown = True
+        self._wakeup()
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True)
+
+    def _wakeup(self):
+        # 管道里最多只放一个唤醒信号，避免提交大量任务时写满管道
+        with self._lock:
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+        self._wakeup_writer.send(None)
+
+    def _spawn(self) -> _Worker:
+        if self._zygote_conn is not None:
+            self._zygote_conn.send('spawn')
+            parent_conn = Connection(reduction.recv_handle(self._zygote_conn))
+            process = _ForkedProcess(self._zygote_conn.recv())
+        else:
+            parent_conn, child_conn = self._ctx.Pipe()
+            process = self._ctx.Process(target=_worker_main,
+                                        args=(child_conn, self._initializer, self._initargs),
+                                        daemon=True)
+            process.start()
+            child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, kill: bool):
+        if kill and worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        self._workers.remove(worker)
+
+    def _assign(self):
+        """把排队中的任务交给空闲子进程，不足时按需创建"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                worker = next((w for w in self._workers if w.future is None), None)
+                if worker is None and len(self._workers) >= self.max_workers:
+                    return
+                future, task, description = self._pending.popleft()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            worker = worker or self._spawn()
+            try:
+                worker.conn.send(task)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            worker.future = future
+            worker.description = description
+            worker.deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            logger.exception("DeadlinePool 调度线程异常退出")
+            with self._lock:
+                self._shutdown = True
+                pending, self._pending = list(self._pending), deque()
+            for worker in list(self._workers):
+                if worker.future is not None:
+                    pending.append((worker.future, None, worker.description))
+                self._retire(worker, kill=True)
+            for future, _, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+            self._stop_zygote()
+
+    def _loop(self):
+        while True:
+            self._assign()
+            with self._lock:
+                finished = self._shutdown and not self._pending
+            if finished and all(w.future is None for w in self._workers):
+                break
+
+            deadlines = [w.deadline for w in self._workers if w.future is not None and w.deadline]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = wait([self._wakeup_reader] + [w.conn for w in self._workers], timeout)
+
+            for conn in ready:
+                if conn is self._wakeup_reader:
+                    self._wakeup_reader.recv()
+                    with self._lock:
+                        self._wakeup_pending = False
+                    continue
+                worker = next(w for w in self._workers if w.conn is conn)
+                self._handle_reply(worker)
+
+            now = time.monotonic()
+            for worker in [w for w in self._workers if w.future is not None and w.deadline and w.deadline <= now]:
+                logger.warning(f"任务超过时限 {self.timeout} 秒，终止子进程 {worker.process.pid}: {worker.description}")
+                self.killed += 1
+                future = worker.future
+                self._retire(worker, kill=True)
+                future.set_exception(DeadlineExceeded(f"超过时限 {self.timeout} 秒"))
+
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            self._retire(worker, kill=False)
+        self._stop_zygote()
+
+    def _stop_zygote(self):
+        if self._zygote is None:
+            return
+        try:
+            self._zygote_conn.send(None)
+        except Exception:
+            pass
+        self._zygote.join(5)
+        if self._zygote.is_alive():
+            self._zygote.kill()
+            self._zygote.join()
+        self._zygote_conn.close()
+        self._zygote = None
+
+    def _handle_reply(self, worker: _Worker):
+        try:
+            kind, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join()
+            exitcode = worker.process.exitcode
+            self.crashed += 1
+            future = worker.future
+            self._retire(worker, kill=True)
+            if future is not None:
+                logger.warning(f"子进程意外退出 (exitcode={exitcode}): {worker.description}")
+                future.set_exception(WorkerCrashed(f"子进程意外退出 (exitcode={exitcode})"))
+            return
+
+        if kind == 'message':
+            if self.on_message is not None:
+                try:
+                    self.on_message(payload)
+                except Exception as e:
+                    logger.error(f"处理子进程消息出错: {e}")
+            return
+
+        future, worker.future, worker.deadline = worker.future, None, None
+        if kind == 'result':
+            future.set_result(payload)
+        else:
+            future.set_exception(payload)
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pymupdf
+
+Bbox = Tuple[float, float, float, float]
+
+
+class _CachedPage:
+    """单个页面及其 TextPage，各种文字提取结果按需生成并缓存"""
+
+    def __init__(self, page: pymupdf.Page):
+        self.page = page
+        # 与 page.get_text() / get_text("blocks") 默认使用的 flags 相同，pymupdf 的 find_tables 内部也是这组 flags
+        self.textpage = page.get_textpage(flags=pymupdf.TEXTFLAGS_TEXT)
+        self.text: Optional[str] = None
+        self.blocks: Optional[List[tuple]] = None
+        self.rawdict: Optional[Dict] = None
+        self.clipped_blocks: Dict[Bbox, List[tuple]] = {}
+
+
+class DocumentSession:
+    """
+    持有一个打开的 PDF，并为每个页面只构建一次 TextPage
+
+    全文、文本块、rawdict 都从同一个 TextPage 派生（带 clip 的文本块除外，见 get_blocks），
+    最近使用的 max_cached_pages 个页面保留在 LRU 中；close() 或退出 with 块时释放全部页面并关闭文档。
+    pymupdf 的 page.find_tables() 不接受外部传入的 TextPage，仍会在内部自行提取一次
+    """
+
+    def __init__(self, source: Union[str, Path, pymupdf.Document], max_cached_pages: int = 8):
+        self._owns_doc = not isinstance(source, pymupdf.Document)
+        self.doc = pymupdf.open(source) if self._owns_doc else source
+        self.max_cached_pages = max(1, max_cached_pages)
+        self._pages: "OrderedDict[int, _CachedPage]" = OrderedDict()
+
+        self.textpages_built = 0
+
+    def __len__(self):
+        return len(self.doc)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._pages.clear()
+        if self._owns_doc and not self.doc.is_closed:
+            self.doc.close()
+
+    def _cached(self, page_num: int) -> _CachedPage:
+        cached = self._pages.get(page_num)
+        if cached is None:
+            cached = _CachedPage(self.doc[page_num])
+            self.textpages_built += 1
+            self._pages[page_num] = cached
+            while len(self._pages) > self.max_cached_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_num)
+        return cached
+
+    def page(self, page_num: int) -> pymupdf.Page:
+        """页面对象；同一页面在缓存期间始终返回同一个对象"""
+        return self._cached(page_num).page
+
+    def textpage(self, page_num: int) -> pymupdf.TextPage:
+        return self._cached(page_num).textpage
+
+    def get_text(self, page_num: int) -> str:
+        """等价于 page.get_text()"""
+        cached = self._cached(page_num)
+        if cached.text is None:
+            cached.text = cached.textpage.extractText()
+        return cached.text
+
+    def get_rawdict(self, page_num: int) -> Dict:
+        """等价于 page.get_text("rawdict") 中的文字部分（不含图片块）"""
+        cached = self._cached(page_num)
+        if cached.rawdict is None:
+            cached.rawdict = cached.textpage.extractRAWDICT(cb=cached.page.cropbox)
+        return cached.rawdict
+
+    def get_blocks(self, page_num: int, clip: Bbox = None) -> List[tuple]:
+        """
+        等价于 page.get_text("blocks", clip=clip)，格式为 (x0, y0, x1, y1, text, block_no, block_type)
+
+        带 clip 时由 MuPDF 原生裁剪：TextPage 的 clip 只能在构建时指定，每个不同的 clip 单独构建一个 TextPage，
+        结果按 clip 缓存在页面上
+        """
+        cached = self._cached(page_num)
+        if clip is None:
+            if cached.blocks is None:
+                cached.blocks = cached.textpage.extractBLOCKS()
+            return cached.blocks
+
+        key = tuple(pymupdf.Rect(clip))
+        blocks = cached.clipped_blocks.get(key)
+        if blocks is None:
+            textpage = cached.page.get_textpage(clip=key, flags=pymupdf.TEXTFLAGS_BLOCKS)
+            self.textpages_built += 1
+            blocks = cached.clipped_blocks[key] = textpage.extractBLOCKS()
+        return blocks
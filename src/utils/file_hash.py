@@ -0,0 +1,96 @@
+import hashlib
+import json
+import mmap
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, Optional, Union
+
+from src.log import logger
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+@contextmanager
+def mapped_file(path: Union[str, Path]) -> Iterator[Union[mmap.mmap, bytes]]:
+    """
+    只读内存映射整个文件，映射对象可以当作只读的 bytes 切片，也可以当作文件对象 read / seek；
+    空文件无法映射，返回 b''
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def hash_buffer(buffer, block_size: int = HASH_BLOCK_SIZE) -> str:
+    """按大块计算 SHA256，memoryview 切片不复制数据"""
+    sha256_hash = hashlib.sha256()
+    with memoryview(buffer) as view:
+        for start in range(0, len(view), block_size):
+            sha256_hash.update(view[start:start + block_size])
+    return sha256_hash.hexdigest()
+
+
+class FileHashIndex:
+    """
+    持久化的文件哈希索引：按 (绝对路径, 文件大小, mtime_ns) 记住文件的 SHA256，
+    文件没有变化时只需一次 stat()，不必重新读取整个文件
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = Lock()
+        self._entries: Dict[str, list] = {}
+        if self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except Exception as e:
+                logger.warning(f"读取文件哈希索引失败，将重建: {e}")
+
+        self.hits = 0
+        self.misses = 0
+
+    def hash(self, file_path: Union[str, Path], buffer=None) -> str:
+        """
+        Args:
+            file_path: 文件路径
+            buffer: 调用方已经映射 / 读入的文件内容，索引未命中时直接用它计算，避免再读一次文件
+        """
+        key = str(Path(file_path).resolve())
+        stat = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        if buffer is None:
+            with mapped_file(key) as buffer:
+                file_hash = hash_buffer(buffer)
+        else:
+            file_hash = hash_buffer(buffer)
+
+        with self._lock:
+            self._entries[key] = [stat.st_size, stat.st_mtime_ns, file_hash]
+            self._save()
+        return file_hash
+
+    def get(self, file_path: Union[str, Path]) -> Optional[str]:
+        """只查索引，文件变化或未记录时返回 None"""
+        key = str(Path(file_path).resolve())
+        stat = os.stat(key)
+        entry = self._entries.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._entries, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.path)
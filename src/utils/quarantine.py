@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from src.log import logger
+
+# 隔离文件的处理策略
+QUARANTINE_POLICIES = ('skip', 'retry_light')
+
+
+class Quarantine:
+    """
+    持久化的隔离名单：记录超时或导致子进程崩溃的文件及原因
+
+    - policy='skip': 之后的运行直接跳过名单中的文件
+    - policy='retry_light': 先用更轻量的策略重试一次，轻量策略仍失败才跳过；重试成功则移出名单
+    """
+
+    def __init__(self, path: Path, policy: str = 'retry_light'):
+        if policy not in QUARANTINE_POLICIES:
+            raise ValueError(f"不支持的隔离策略: {policy}，可选: {QUARANTINE_POLICIES}")
+        self.path = Path(path)
+        self.policy = policy
+        self._lock = Lock()
+        self._entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except Exception as e:
+                logger.warning(f"读取隔离名单失败，将重建: {e}")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self._entries.get(name)
+
+    def should_skip(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and (self.policy == 'skip' or entry['strategy'] == 'light')
+
+    def use_light(self, name: str) -> bool:
+        """名单中、且还可以用轻量策略重试的文件"""
+        return name in self._entries and not self.should_skip(name)
+
+    def add(self, name: str, reason: str, strategy: str = 'full'):
+        """
+        Args:
+            name: 文件名
+            reason: 失败原因
+            strategy: 失败时使用的策略，'full' 或 'light'
+        """
+        with self._lock:
+            entry = self._entries.get(name, {'attempts': 0})
+            entry.update({
+                'reason': reason,
+                'strategy': strategy,
+                'attempts': entry['attempts'] + 1,
+                'updated_at': datetime.now().isoformat(timespec='seconds')})
+            self._entries[name] = entry
+            self._save()
+        logger.warning(f"已隔离: {name} ({strategy}, {reason})")
+
+    def remove(self, name: str):
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                self._save()
+                logger.info(f"已移出隔离名单: {name}")
+
+    def _save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._entries, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,44 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, Set, Tuple
+
+Bbox = Tuple[float, float, float, float]
+
+
+class RectGrid:
+    """
+    矩形的均匀网格索引：每个矩形登记到它覆盖的所有网格里，查询时只需检查 bbox 覆盖的网格中的矩形
+
+    适用于"大量小矩形（字符）落在哪些中等矩形（单元格）里"这类查询，单次查询的开销与矩形总数无关
+    """
+
+    def __init__(self, rects: Dict[Hashable, Bbox], cell_size: float = 32.0):
+        self.cell_size = cell_size
+        self.rects = {key: tuple(rect) for key, rect in rects.items()}
+        self._buckets = defaultdict(list)
+        for key, rect in self.rects.items():
+            for bucket in self._buckets_of(rect):
+                self._buckets[bucket].append(key)
+
+    def _buckets_of(self, bbox: Bbox) -> Iterable[Tuple[int, int]]:
+        x0, y0, x1, y1 = bbox
+        size = self.cell_size
+        for gx in range(int(x0 // size), int(x1 // size) + 1):
+            for gy in range(int(y0 // size), int(y1 // size) + 1):
+                yield gx, gy
+
+    def query(self, bbox: Bbox) -> Set[Hashable]:
+        """返回与 bbox 相交（含边界接触）的所有矩形的键"""
+        x0, y0, x1, y1 = bbox
+        found = set()
+        for bucket in self._buckets_of(bbox):
+            for key in self._buckets.get(bucket, ()):
+                if key in found:
+                    continue
+                rx0, ry0, rx1, ry1 = self.rects[key]
+                if rx0 <= x1 and x0 <= rx1 and ry0 <= y1 and y0 <= ry1:
+                    found.add(key)
+        return found
+
+
+def contains(outer: Bbox, inner: Bbox) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and inner[2] <= outer[2] and inner[3] <= outer[3]
@@ -0,0 +1,60 @@
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from src.log import logger
+
+T = TypeVar('T')
+
+# 任务提交顺序：'longest_first' 按预计耗时（页数）从大到小，减少最后只剩一个大文件在跑的长尾；'filename' 保持原顺序
+SCHEDULING_POLICIES = ('longest_first', 'filename')
+
+
+def schedule(items: Iterable[T], cost: Callable[[T], float], policy: str = 'longest_first') -> List[T]:
+    """按调度策略返回提交顺序，耗时相同的保持原顺序"""
+    if policy not in SCHEDULING_POLICIES:
+        raise ValueError(f"不支持的调度策略: {policy}，可选: {SCHEDULING_POLICIES}")
+    items = list(items)
+    if policy == 'longest_first':
+        items.sort(key=cost, reverse=True)
+    return items
+
+
+def load_page_counts() -> Dict[str, int]:
+    """从数据库读取已知的页数 {文件名: Paper.page_size}，数据库不可用时返回空字典"""
+    try:
+        from sqlmodel import select
+
+        from src.database import get_db
+        from src.models import Paper
+
+        with get_db() as session:
+            return {name: page_size for name, page_size in session.exec(select(Paper.name, Paper.page_size))}
+    except Exception as e:
+        logger.warning(f"读取页数失败，改用文件大小估计: {e}")
+        return {}
+
+
+def estimate_pages(paths: Iterable[Path], page_counts: Optional[Dict[str, int]] = None) -> Dict[Path, float]:
+    """
+    估计每个 PDF 的页数：优先使用已知页数；未知的按文件大小除以已知文件的每页字节数中位数估计，
+    完全没有已知页数时直接以文件大小作为相对耗时
+    """
+    page_counts = page_counts or {}
+    sizes = {path: path.stat().st_size for path in paths}
+    bytes_per_page = [sizes[path] / page_counts[path.name] for path in sizes if page_counts.get(path.name)]
+    scale = median(bytes_per_page) if bytes_per_page else 1
+
+    return {path: page_counts.get(path.name) or size / scale for path, size in sizes.items()}
+
+
+def schedule_pdf_files(paths: Iterable[Path], policy: str = 'longest_first',
+                       page_counts: Optional[Dict[str, int]] = None) -> List[Path]:
+    """按调度策略排列 PDF 文件；longest_first 时未传入 page_counts 则从数据库读取"""
+    paths = list(paths)
+    if policy == 'filename':
+        return paths
+    if page_counts is None:
+        page_counts = load_page_counts()
+    pages = estimate_pages(paths, page_counts)
+    return schedule(paths, pages.__getitem__, policy)
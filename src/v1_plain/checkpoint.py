@@ -0,0 +1,155 @@
+import ast
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+BBOX_KEYS = ('text_bbox', 'table_bbox')
+
+
+class CheckpointJournal:
+    """
+    断点续跑用的追加式日志（JSON Lines）
+
+    每个事件一行、写完即 flush，写入开销与已处理文件数无关：
+    - {"type": "page", "file_name": ..., "last_page": ..., "best_match": {...}}  文件处理到的页码与当前最优匹配
+    - {"type": "result", "result": {...}}  文件处理成功的结果，之后该文件不再续跑
+
+    加载时逐行回放，进程崩溃导致的残缺行直接跳过；回放后把状态压缩成一份快照，
+    先写临时文件再原子替换，任何时刻磁盘上都有一份完整的日志
+    """
+
+    def __init__(self, path: Path, legacy_progress_file: Path = None, legacy_page_progress_file: Path = None):
+        self.path = Path(path)
+        self.legacy_progress_file = legacy_progress_file
+        self.legacy_page_progress_file = legacy_page_progress_file
+        self._lock = Lock()
+        self._file = None
+
+    def load(self) -> Tuple[List[Dict], Dict[str, int], Dict[str, Dict]]:
+        """
+        回放日志并压缩，之后以追加模式打开
+
+        Returns:
+            (已成功的结果列表, {文件名: 最后处理的页码}, {文件名: 最优匹配})
+        """
+        if self.path.exists():
+            results, page_progress, best_matches = self._replay()
+        else:
+            results, page_progress, best_matches = self._load_legacy()
+
+        self._compact(results, page_progress, best_matches)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        logger.info(f"已加载 {len(results)} 条已处理记录、{len(page_progress)} 个文件的处理进度")
+        return results, page_progress, best_matches
+
+    def record_page(self, file_name: str, last_page: int, best_match: Optional[Dict] = None):
+        self._append({'type': 'page', 'file_name': file_name, 'last_page': last_page, 'best_match': best_match})
+
+    def record_result(self, result: Dict):
+        self._append({'type': 'result', 'result': result})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _append(self, event: Dict):
+        line = json.dumps(event, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("CheckpointJournal 尚未加载")
+            self._file.write(line)
+            self._file.flush()
+
+    def _replay(self):
+        results: Dict[str, Dict] = {}
+        page_progress: Dict[str, int] = {}
+        best_matches: Dict[str, Dict] = {}
+
+        with open(self.path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过无法解析的断点记录: {self.path}:{line_no}")
+                    continue
+
+                if event.get('type') == 'result':
+                    result = event['result']
+                    results[result['file_name']] = result
+                    page_progress.pop(result['file_name'], None)
+                    best_matches.pop(result['file_name'], None)
+                elif event.get('type') == 'page' and event['file_name'] not in results:
+                    page_progress[event['file_name']] = event['last_page']
+                    if event.get('best_match'):
+                        best_matches[event['file_name']] = _restore_bboxes(event['best_match'])
+
+        return list(results.values()), page_progress, best_matches
+
+    def _compact(self, results, page_progress, best_matches):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps({'type': 'result', 'result': result}, ensure_ascii=False, default=str) + '\n')
+            for file_name, last_page in page_progress.items():
+                event = {'type': 'page', 'file_name': file_name, 'last_page': last_page,
+                         'best_match': best_matches.get(file_name)}
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _load_legacy(self):
+        """首次运行时导入旧版的 progress.csv / page_progress.csv"""
+        results, page_progress, best_matches = [], {}, {}
+        if not (self.legacy_progress_file and self.legacy_progress_file.exists()) and not (
+                self.legacy_page_progress_file and self.legacy_page_progress_file.exists()):
+            return results, page_progress, best_matches
+
+        import pandas as pd
+
+        try:
+            if self.legacy_progress_file and self.legacy_progress_file.exists():
+                df = pd.read_csv(self.legacy_progress_file)
+                results = [{k: (None if pd.isna(v) else v) for k, v in record.items()}
+                           for record in df.to_dict('records') if record.get('status') == 'success']
+
+            if self.legacy_page_progress_file and self.legacy_page_progress_file.exists():
+                df = pd.read_csv(self.legacy_page_progress_file)
+                for _, row in df.iterrows():
+                    fname = row['file_name']
+                    page_progress[fname] = int(row['last_page'])
+                    if pd.notna(row['best_match_confidence']):
+                        best_matches[fname] = {
+                            'page_num': int(row['best_match_page']) if pd.notna(row['best_match_page']) else None,
+                            'confidence': float(row['best_match_confidence']),
+                            'matched_text': row['best_match_text'],
+                            'text_bbox': _parse_bbox(row['best_match_bbox']),
+                            'table_bbox': _parse_bbox(row['best_match_table_bbox'])}
+            logger.info(f"已从旧版 CSV 进度文件导入断点: {len(results)} 条结果, {len(page_progress)} 个文件进度")
+        except Exception as e:
+            logger.warning(f"读取旧版进度文件失败: {e}")
+        return results, page_progress, best_matches
+
+
+def _parse_bbox(value):
+    """安全解析 CSV 中以字符串保存的 bbox，如 '(1.0, 2.0, 3.0, 4.0)'"""
+    if not isinstance(value, str) or value in ('', 'None'):
+        return None
+    try:
+        return tuple(ast.literal_eval(value))
+    except (ValueError, SyntaxError, TypeError):
+        return None
+
+
+def _restore_bboxes(best_match: Dict) -> Dict:
+    """JSON 中的 bbox 为列表，还原为与处理时一致的元组"""
+    for key in BBOX_KEYS:
+        if isinstance(best_match.get(key), list):
+            best_match[key] = tuple(best_match[key])
+    return best_match
@@ -11,11 +11,24 @@ class PDFProcessingConfig:
     # PDF处理相关配置
     pdf_folder: Path
     output_file: Path
+    checkpoint_file: Path = field(default_factory=lambda: OUTPUT_DIR / "checkpoint.jsonl")  # 断点续跑日志
+    # 旧版 CSV 进度文件，仅在断点日志不存在时导入一次
     progress_file: Path = field(default_factory=lambda: OUTPUT_DIR / "progress.csv")
     page_progress_file: Path = field(default_factory=lambda: OUTPUT_DIR / "page_progress.csv")
     max_workers: Optional[int] = None
     max_test_files: Optional[int] = None  # 测试模式下处理的最大文件数
-    processing_timeout: int = 300  # 单个文件处理超时时间(秒)
+    # 单个文件处理超时时间(秒)，仅 'process' 模式生效：超时的子进程被杀掉，文件进入隔离名单
+    processing_timeout: int = 300
+    quarantine_file: Path = field(default_factory=lambda: OUTPUT_DIR / "quarantine_v1.json")
+    # 隔离名单中文件的处理方式：'skip' 直接跳过；'retry_light' 先用轻量检索策略重试一次
+    quarantine_policy: str = 'retry_light'
+    # 并发方式：'process' 父进程加载模型后 fork 出进程池，模型权重写时复制共享，单文件超时可强制终止；
+    # 'thread' 线程池，没有硬性时限，卡住的文件会一直占用一个线程
+    executor: str = 'process'
+    worker_torch_threads: int = 1  # 进程池模式下每个子进程的 torch 算子线程数，避免多进程超额订阅
+    # 任务提交顺序：'longest_first' 按页数（数据库中的 Paper.page_size，未知时按文件大小估计）从大到小；'filename' 按文件序号
+    scheduling_policy: str = 'longest_first'
+    refresh_per_second: float = 4  # 进度表格的重绘频率，与页面处理速度无关
 
 
 @dataclass
@@ -23,6 +36,28 @@ class ModelConfig:
     # 模型相关配置
     model_name: str = 'all-MiniLM-L6-v2'
     device: str = 'cpu'
+    batch_size: int = 64  # 单次前向传播的最大文本块数
+    page_window: int = 4  # 每次批量编码时合并的页面数
+    # 推理后端：'torch' 为原始 PyTorch 推理；'onnx' 使用导出的 ONNX 模型在 onnxruntime 上推理
+    backend: str = 'torch'
+    # 仅 onnx 后端：动态 int8 量化的目标指令集，可选 'avx512_vnni' / 'avx512' / 'avx2' / 'arm64'，None 表示不量化
+    onnx_quantization: Optional[str] = None
+    onnx_export_dir: Path = field(default_factory=lambda: OUTPUT_DIR / "onnx")  # 本地导出/量化模型的目录
+    # 多线程处理 PDF 时，把各线程的编码请求交给唯一的推理线程合并成批
+    inference_service: bool = True
+    service_max_batch_size: int = 256  # 推理线程合并请求时的最大文本数
+    service_max_latency_ms: float = 10  # 推理线程为凑批最多等待的时间
+    verify_parity: bool = False  # 加载非 torch 后端时，是否先与 torch 结果做一致性校验
+    parity_tolerance: float = 0.02  # 与 torch 后端相比，余弦相似度允许的最大绝对误差
+
+
+@dataclass
+class EmbeddingCacheConfig:
+    # 文本块向量缓存相关配置
+    enabled: bool = True
+    cache_dir: Path = field(default_factory=lambda: OUTPUT_DIR / "embedding_cache")
+    max_entries: int = 100_000  # 最多缓存的向量条数，超出后按最近最少使用淘汰
+    flush_every: int = 2000  # 每新增多少条向量把索引落盘一次
 
 
 @dataclass
@@ -31,12 +66,19 @@ class TargetConfig:
     table_name: str = "Summary of project findings and ratings"
     table_position_tolerance: int = 50  # 表格位置匹配的容差(像素)
     min_confidence_threshold: float = 0.5  # 最小相似度阈值
+    # 检索模式：'full' 对所有文本块做语义打分；'rerank' 先用词法得分粗筛全文，再只对 top-K 做语义重排
+    # （rerank 尚未在全量语料上与 full 做过结果对比，默认仍为 full）
+    retrieval_mode: str = 'full'
+    rerank_top_k: int = 20  # 进入语义重排的候选文本块数
+    lexical_min_score: float = 0.3  # 最高词法得分低于该值时（标题可能被改写），回退为全量语义打分
+    light_rerank_top_k: int = 5  # 轻量策略（重试隔离名单中的文件）：更少的候选，且不回退为全量语义打分
 
 
 @dataclass
 class Config:
     pdf: PDFProcessingConfig
     model: ModelConfig = field(default_factory=ModelConfig)
+    cache: EmbeddingCacheConfig = field(default_factory=EmbeddingCacheConfig)
     target: TargetConfig = field(default_factory=TargetConfig)
     log: LogConfig = field(default_factory=LogConfig)
 
@@ -47,17 +89,30 @@ PDF处理配置:
     文件夹路径: {self.pdf.pdf_folder}
     输出文件: {self.pdf.output_file}
     最大并发数: {self.pdf.max_workers or '自动'}
+    并发方式: {self.pdf.executor}
+    调度策略: {self.pdf.scheduling_policy}
     测试文件数: {self.pdf.max_test_files or '全部'}
     处理超时: {self.pdf.processing_timeout}秒
+    隔离策略: {self.pdf.quarantine_policy}
 
 模型配置:
     模型名称: {self.model.model_name}
     设备: {self.model.device}
+    推理后端: {self.model.backend}{f' ({self.model.onnx_quantization})' if self.model.onnx_quantization else ''}
+    批大小: {self.model.batch_size}
+    页面窗口: {self.model.page_window}
+    推理服务: {self.model.inference_service} (批上限: {self.model.service_max_batch_size}, 等待: {self.model.service_max_latency_ms}ms)
+
+向量缓存配置:
+    启用: {self.cache.enabled}
+    缓存目录: {self.cache.cache_dir}
+    最大条数: {self.cache.max_entries}
 
 目标配置:
     表格名称: {self.target.table_name}
     位置容差: {self.target.table_position_tolerance}像素
     最小相似度: {self.target.min_confidence_threshold}
+    检索模式: {self.target.retrieval_mode} (top-K: {self.target.rerank_top_k}, 词法回退阈值: {self.target.lexical_min_score})
 
 日志配置:
     控制台级别: {self.log.console_level}
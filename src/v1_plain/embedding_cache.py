@@ -0,0 +1,207 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+INDEX_VERSION = 2
+# blake2b-128 摘要按原始字节存为 uint8[16]：numpy 的 'S16' 会去掉结尾的 \0，约 1/256 的键读回来会变短
+KEY_SIZE = 16
+
+
+def normalize_text(text: str) -> str:
+    """归一化文本块：合并连续空白、去掉首尾空白"""
+    return ' '.join(text.split())
+
+
+class EmbeddingCache:
+    """
+    文本块向量的磁盘缓存，键为 (模型名, 归一化文本哈希)
+
+    - 向量存放在按槽位（slot）寻址的内存映射 float32 数组 `<model>.f32` 中
+    - 索引 `<model>.index.npz` 只记录每个槽位的键与最近使用时间，体积很小
+    - 条数达到上限后按最近最少使用（LRU）批量淘汰，淘汰后立即落盘索引，
+      保证磁盘上的索引永远不会指向一个已被复用的槽位
+    - readonly 模式（fork 出的子进程）只读共享的内存映射，新向量暂存在 pending 中交给父进程统一写入
+    """
+
+    def __init__(self, cache_dir: Path, model_name: str, max_entries: int = 100_000, flush_every: int = 2000,
+                 evict_fraction: float = 0.1):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.evict_fraction = evict_fraction
+
+        slug = re.sub(r'[^\w.-]', '_', model_name)
+        self.vectors_path = self.cache_dir / f"{slug}.f32"
+        self.index_path = self.cache_dir / f"{slug}.index.npz"
+
+        self._lock = Lock()
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._keys = np.zeros((max_entries, KEY_SIZE), dtype=np.uint8)  # slot -> key
+        self._last_used = np.zeros(max_entries, dtype=np.int64)  # slot -> 最近使用的逻辑时钟，0 表示空闲
+        self._slots: Dict[bytes, int] = {}  # key -> slot
+        self._free_slots: List[int] = []
+        self._next_slot = 0
+        self._tick = 0
+        self._unflushed = 0
+        self.readonly = False
+        self._pending: List[Tuple[str, np.ndarray]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load()
+
+    def _key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=KEY_SIZE).digest()
+
+    def _slot_key(self, slot: int) -> bytes:
+        return self._keys[slot].tobytes()
+
+    def _load(self):
+        """加载已有索引；模型、容量或维度不一致时丢弃旧缓存"""
+        if not self.index_path.exists() or not self.vectors_path.exists():
+            return
+        try:
+            with np.load(self.index_path, allow_pickle=False) as index:
+                if (int(index['version']) != INDEX_VERSION or str(index['model_name']) != self.model_name
+                        or index['keys'].shape != self._keys.shape):
+                    logger.info(f"向量缓存与当前配置不一致，重建: {self.index_path}")
+                    return
+                dim = int(index['dim'])
+                keys = index['keys']
+                last_used = index['last_used']
+
+            self._open_vectors(dim, mode='r+')
+            self._keys[:] = keys
+            self._last_used[:] = last_used
+            used = np.flatnonzero(last_used > 0)
+            self._slots = {self._slot_key(slot): int(slot) for slot in used}
+            self._next_slot = int(used.max()) + 1 if len(used) else 0
+            self._free_slots = [slot for slot in range(self._next_slot) if last_used[slot] == 0]
+            self._tick = int(last_used.max()) if len(last_used) else 0
+            logger.info(f"已加载向量缓存: {len(self._slots)} 条 ({self.model_name})")
+        except Exception as e:
+            logger.warning(f"读取向量缓存失败，将重建: {e}")
+            self._vectors = None
+            self._dim = None
+
+    def _open_vectors(self, dim: int, mode: str):
+        self._dim = dim
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode=mode, shape=(self.max_entries, dim))
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._next_slot < self.max_entries:
+            self._next_slot += 1
+            return self._next_slot - 1
+        self._evict()
+        return self._free_slots.pop()
+
+    def _evict(self):
+        """批量淘汰最久未使用的一部分槽位，并立即落盘索引"""
+        n_evict = max(1, int(self.max_entries * self.evict_fraction))
+        victims = np.argpartition(self._last_used, n_evict - 1)[:n_evict]
+        for slot in victims:
+            self._slots.pop(self._slot_key(slot), None)
+            self._keys[slot] = 0
+            self._last_used[slot] = 0
+        self._free_slots.extend(int(slot) for slot in victims)
+        self.evictions += n_evict
+        self._save_index()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """批量查询，未命中的位置返回 None"""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                slot = self._slots.get(self._key(text))
+                if slot is None or self._vectors is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self.hits += 1
+                self._tick += 1
+                self._last_used[slot] = self._tick
+                results.append(np.array(self._vectors[slot]))
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """批量写入向量"""
+        if len(texts) == 0:
+            return
+        with self._lock:
+            if self.readonly:
+                self._pending.extend(zip(texts, vectors))
+                return
+            if self._vectors is None:
+                self._open_vectors(int(vectors.shape[1]), mode='w+')
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._allocate_slot()
+                    self._slots[key] = slot
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._vectors[slot] = vector
+                self._tick += 1
+                self._last_used[slot] = self._tick
+                self._unflushed += 1
+
+            if self._unflushed >= self.flush_every:
+                self._save_index()
+
+    def drain_pending(self) -> List[Tuple[str, np.ndarray]]:
+        """取出 readonly 模式下暂存的新向量"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def _save_index(self):
+        """先刷新向量再原子替换索引文件，崩溃时索引只会落后而不会指向未写入的向量"""
+        if self._vectors is None or self.readonly:
+            return
+        self._vectors.flush()
+        tmp_path = self.index_path.with_suffix('.tmp.npz')
+        np.savez(tmp_path,
+                 version=INDEX_VERSION,
+                 model_name=self.model_name,
+                 dim=self._dim,
+                 keys=self._keys,
+                 last_used=self._last_used)
+        os.replace(tmp_path, self.index_path)
+        self._unflushed = 0
+
+    def flush(self):
+        with self._lock:
+            self._save_index()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._slots),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions}
+
+    def __str__(self):
+        stats = self.stats()
+        return (f"向量缓存: {stats['entries']}/{stats['max_entries']} 条, "
+                f"命中 {stats['hits']}, 未命中 {stats['misses']}, 命中率 {stats['hit_rate']:.1%}, "
+                f"淘汰 {stats['evictions']}")
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+import numpy as np
+from loguru import logger
+
+_STOP = object()
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+
+
+class InferenceService:
+    """
+    进程内的微批推理服务
+
+    多个工作线程并发提交文本并拿到 Future，由唯一的推理线程把排队中的请求合并成一批再统一编码：
+    - 合并后的文本数达到 max_batch_size，或者
+    - 距离该批第一个请求到达已过 max_latency_ms
+    就立即执行。这样模型始终只有一个线程在做前向传播，不会与其他线程争抢 torch 的算子线程池，
+    同时多个 PDF 的小请求能拼成大批次
+
+    服务未启动或已经停止时，submit 在调用线程中直接编码，返回的 Future 总会完成
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 256,
+                 max_latency_ms: float = 10):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        # 保证 _STOP 之后不会再有请求入队（否则这些请求永远不会被处理）
+        self._lock = threading.Lock()
+        self._accepting = False
+
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_worker_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def start(self) -> "InferenceService":
+        with self._lock:
+            if not self.is_running:
+                self._thread = threading.Thread(target=self._run, name="inference-service", daemon=True)
+                self._thread.start()
+            self._accepting = True
+        return self
+
+    def stop(self):
+        """处理完已提交的请求后停止；之后提交的请求在调用线程中直接编码"""
+        with self._lock:
+            self._accepting = False
+            thread = self._thread if self.is_running else None
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join()
+            logger.info(str(self))
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def submit(self, texts: List[str]) -> Future:
+        """提交一组文本，Future 的结果为对应的向量矩阵"""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+
+        with self._lock:
+            if self._accepting:
+                self._queue.put(request)
+                return request.future
+
+        # 服务未启动或已停止（例如超时后被放弃的工作线程仍在运行）
+        try:
+            request.future.set_result(self.encode_fn(request.texts))
+        except Exception as e:
+            request.future.set_exception(e)
+        return request.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            size = len(item.texts)
+            deadline = time.monotonic() + self.max_latency
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item.texts)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Request]):
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.texts += len(texts)
+
+    def __str__(self):
+        avg_texts = self.texts / self.batches if self.batches else 0
+        avg_requests = self.requests / self.batches if self.batches else 0
+        return (f"推理服务: {self.batches} 批, {self.requests} 个请求, {self.texts} 段文本, "
+                f"平均每批 {avg_requests:.1f} 个请求 / {avg_texts:.1f} 段文本")
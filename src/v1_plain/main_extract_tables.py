@@ -12,17 +12,20 @@ def main():
         print(f"页数: {len(finder.doc)}")
         print(f"元数据: {finder.doc.metadata}")
         
-        tables = finder.find_tables_with_context()
-        
-        print(f"找到 {len(tables)} 个表格:")
-        for i, table in enumerate(tables, 1):
-            print(f"\n表格 {i}:")
+        def on_page(page_num: int, total_pages: int):
+            print(f"\r处理第 {page_num + 1}/{total_pages} 页...", end="", flush=True)
+
+        count = 0
+        for count, table in enumerate(finder.iter_tables(progress_callback=on_page), 1):
+            print(f"\n\n表格 {count}:")
             print(f"页码范围: {table.start_page + 1} - {table.end_page + 1}")
             print(f"坐标: ({table.bbox[0]:.1f}, {table.bbox[1]:.1f}, {table.bbox[2]:.1f}, {table.bbox[3]:.1f})")
             print(f"前置文本: {format_text(table.preceding_text)}")
             if table.headers:
                 print(f"表头: {', '.join(format_text(header) for header in table.headers)}")
-            
+
+        print(f"\n\n处理完成，共找到 {count} 个表格。")
+
     finally:
         finder.close()
 
@@ -1,6 +1,11 @@
 import atexit
 import concurrent.futures
+import gc
+import multiprocessing
+import os
 import re
+import sys
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Lock
@@ -12,12 +17,27 @@ from rich.console import Console
 from rich.live import Live
 from rich.table import Table
 
+from src.utils.deadline_pool import DeadlineExceeded, DeadlinePool, WorkerCrashed, send_message
+from src.utils.quarantine import Quarantine
+from src.utils.scheduling import schedule_pdf_files
+from src.v1_plain.checkpoint import CheckpointJournal
 from src.v1_plain.config import DEFAULT_CONFIG, STATUS_EMOJI
 from src.v1_plain.model_loader import ModelLoader
 from src.v1_plain.parse_text import find_summary_text
 
 
+# 尚未处理完成的状态，其余状态都计为已完成
+IN_PROGRESS_STATUSES = {'pending', 'opening', 'processing', 'processing_page'}
+
+
 class ProgressTracker:
+    """
+    处理进度的共享状态
+
+    工作线程只在锁内做 O(1) 的状态更新（状态计数、最近活动列表），
+    表格由 Live 的刷新线程按固定频率调用 create_progress_table 渲染，开销与文件总数和页面速率无关
+    """
+
     def __init__(self, total_files, max_display_rows=20, keywords: str = None):
         self.keywords = keywords
         self.total_files = total_files
@@ -30,6 +50,8 @@ class ProgressTracker:
         self.last_save_count = 0  # 新增：记录上次保存的数量
         self.file_page_progress = {}  # 新增：记录每个文件的页面处理进度
         self.best_matches = {}  # 新增：记录每个文件的最佳匹配结果
+        self.status_counts = Counter()  # 各状态的文件数，随更新增量维护
+        self.recent = OrderedDict()  # 最近有更新的非 pending 文件，最多保留一屏
 
     def update_progress(self, file_name, status, details=None, best_match=None, current_page=None, total_pages=None):
         with self.lock:
@@ -42,6 +64,7 @@ class ProgressTracker:
                     'total_pages': total_pages  # 新增：总页数
                 }
             else:
+                self.status_counts[self.results[file_name]['status']] -= 1
                 self.results[file_name].update({
                     'status': status,
                     'details': details,
@@ -54,14 +77,26 @@ class ProgressTracker:
                     if (not current_best or (best_match.get('confidence', 0) > current_best.get('confidence', 0))):
                         self.results[file_name]['best_match'] = best_match
 
+            self.status_counts[status] += 1
+            if status != 'pending':
+                self.recent[file_name] = self.results[file_name]
+                self.recent.move_to_end(file_name)
+                while len(self.recent) > max(self.max_display_rows - 1, 0):
+                    self.recent.popitem(last=False)
+
             logger.debug(f"{file_name}: {status} - {details} - Best match: {best_match}")
 
     def create_progress_table(self):
+        """渲染当前进度；只读取增量维护的计数与最近活动，不遍历全部结果"""
+        with self.lock:
+            completed = sum(count for status, count in self.status_counts.items()
+                            if status not in IN_PROGRESS_STATUSES)
+            pending_count = self.status_counts['pending']
+            recent_items = [(f, dict(info)) for f, info in self.recent.items()]
+
         table = Table(box=box.ROUNDED, expand=True, show_edge=True)
 
         # 计算进度信息
-        completed = len([i for i in self.results.values() if
-                         i['status'] not in ['pending', 'processing', 'processing_page']])
         progress = completed / self.total_files if self.total_files > 0 else 0
 
         # 创建自定义进度条字符串
@@ -95,35 +130,20 @@ class ProgressTracker:
                                              f"预计剩余: {format_timedelta(estimated_remaining)}",
                                              f"目标匹配: {self.keywords}", save_info])))
 
-        # 添加列
         table.add_column("序号", style="cyan", width=3)
         table.add_column("状态", width=2)
         table.add_column("文件名", style="bright_blue", width=30)
         table.add_column("详情", style="green", width=30)
         table.add_column("最优匹配", style="yellow", width=60, overflow="fold")
 
-        # 获取所有非 pending 状态的项目
-        active_items = [(f, info) for f, info in self.results.items() if info['status'] != 'pending']
-
-        # 取 pending 状态的项目
-        pending_items = [(f, info) for f, info in self.results.items() if info['status'] == 'pending']
-
-        # 按照文件名排序
-        sorted_active = sorted(active_items, key=lambda x: extract_number(x[0]))
-        sorted_pending = sorted(pending_items, key=lambda x: extract_number(x[0]))
-
-        # 计算要显示的活动项目数量
-        remaining_rows = self.max_display_rows - 1  # 为最后一行保留空间
-        active_to_show = sorted_active[-remaining_rows:] if len(sorted_active) > remaining_rows else sorted_active
-
-        # 添加活动项目
-        for filename, info in active_to_show:
+        # 最近活动的文件按序号排序显示
+        for filename, info in sorted(recent_items, key=lambda x: extract_number(x[0])):
             self._add_table_row(table, filename, info)
 
         # 在最后一行显示进度条
-        if len(pending_items) > 0:
+        if pending_count > 0:
             table.add_row("...", "⏳", progress_bar,  # 现在 progress_bar 已定义
-                          f"还有 {len(pending_items)} 个文件等待处理", "", style="dim italic")
+                          f"还有 {pending_count} 个文件等待处理", "", style="dim italic")
 
         table.title = progress_text
         return table
@@ -195,63 +215,8 @@ def extract_number(filename):
     return int(match.group(1)) if match else float('inf')
 
 
-def load_page_progress(progress_file):
-    """加载文件处理进度和最优匹配信息"""
-    if progress_file.exists():
-        try:
-            df = pd.read_csv(progress_file)
-            progress = {}
-            best_matches = {}
-
-            for _, row in df.iterrows():
-                fname = row['file_name']
-                progress[fname] = row['last_page']
-
-                # 重建最优匹配信息
-                if pd.notna(row['best_match_confidence']):
-                    best_matches[fname] = {
-                        'page_num': int(row['best_match_page']) if pd.notna(row['best_match_page']) else None,
-                        'confidence': float(row['best_match_confidence']),
-                        'matched_text': row['best_match_text'],
-                        'text_bbox': eval(row['best_match_bbox']) if pd.notna(row['best_match_bbox']) else None,
-                        'table_bbox': eval(row['best_match_table_bbox']) if pd.notna(
-                            row['best_match_table_bbox']) else None}
-
-            logger.info(f"已加载 {len(progress)} 个文件的处理进度")
-            return progress, best_matches
-        except Exception as e:
-            logger.warning(f"读取页面进度失败: {e}")
-    return {}, {}
-
-
-def save_page_progress(page_progress, progress_file, progress_tracker):
-    """保存文件处理进度，包括页码和最优匹配"""
-    try:
-        records = []
-        for fname, page in page_progress.items():
-            # 获取文件的当前信息，包括最优匹配
-            current_info = progress_tracker.results.get(fname, {})
-            best_match = current_info.get('best_match', {})
-
-            record = {
-                'file_name': fname,
-                'last_page': page,
-                'best_match_page': best_match.get('page_num') if best_match else None,
-                'best_match_confidence': best_match.get('confidence') if best_match else None,
-                'best_match_text': best_match.get('matched_text') if best_match else None,
-                'best_match_bbox': str(best_match.get('text_bbox')) if best_match else None,
-                'best_match_table_bbox': str(best_match.get('table_bbox')) if best_match else None}
-            records.append(record)
-
-        df = pd.DataFrame(records)
-        df.to_csv(progress_file, index=False)
-        logger.debug(f"已保存页面进度到 {progress_file}")
-    except Exception as e:
-        logger.error(f"保存页面进度失败: {e}")
-
-
-def process_single_pdf(pdf_path, progress_tracker: ProgressTracker, start_page=0):
-    """修改处理单个PDF的函数，支持从指定页面开始"""
+def process_single_pdf(pdf_path, progress_tracker: ProgressTracker, start_page=0, light=False):
+    """修改处理单个PDF的函数，支持从指定页面开始；light 为 True 时使用轻量检索策略（用于重试隔离名单中的文件）"""
     try:
         logger.debug(f"开始处理文件: {pdf_path.name}, 从第 {start_page + 1} 页开始")
         progress_tracker.update_progress(pdf_path.name, 'opening', f"正在打开文件，从第 {start_page + 1} 页开始...")
@@ -267,8 +232,17 @@ def process_single_pdf(pdf_path, progress_tracker: ProgressTracker, start_page=0
                 current_page=page_num,
                 total_pages=total_pages)
 
+        def progress_callback(page_num, total_pages, stage):
+            """检索中间阶段的进度，只用于显示：不更新 last_page，不会被当作已处理的页面写入断点"""
+            if stage == 'lexical':
+                details = f"正在粗筛第 {page_num + 1:>3d}/{total_pages:>3d} 页..."
+            else:
+                details = "正在语义重排候选..."
+            progress_tracker.update_progress(pdf_path.name, 'processing', details, total_pages=total_pages)
+
         # 修改 find_summary_text 调用，添加 start_page 参数
-        result = find_summary_text(str(pdf_path), page_callback=page_callback, start_page=start_page)
+        result = find_summary_text(str(pdf_path), page_callback=page_callback, start_page=start_page, light=light,
+                                   progress_callback=progress_callback)
 
         if result:
             details = f"找到目标! 页码:{result['page_num'] + 1}, 相似度:{result['confidence']:.2f}"
@@ -320,37 +294,88 @@ def process_single_pdf(pdf_path, progress_tracker: ProgressTracker, start_page=0
                 'error_msg': error_msg}
 
 
-def load_previous_results(output_file):
-    """加载之前处理结果"""
-    if output_file.exists():
-        try:
-            df = pd.read_csv(output_file)
-            # 转换为字典列表格式
-            results = df.to_dict('records')
-            logger.info(f"加载到 {len(results)} 条已处理记录")
-            return results
-        except Exception as e:
-            logger.warning(f"读取历史记录失败: {e}")
-    return []
+class WorkerProgressTracker:
+    """子进程中代替 ProgressTracker：把进度更新经管道原样发回父进程"""
+
+    def update_progress(self, *args, **kwargs):
+        send_message(('progress', args, kwargs))
+
+
+def _init_process_worker(torch_threads):
+    """子进程初始化：限制 torch 算子线程数、把向量缓存切换为只读"""
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(torch_threads)
+    cache = ModelLoader.get_cache()
+    if cache is not None:
+        cache.readonly = True
+
 
+def _process_single_pdf_in_worker(pdf_path, start_page=0, light=False):
+    """子进程中执行的任务：处理单个 PDF，并把新算出的向量发回父进程写入缓存"""
+    result = process_single_pdf(pdf_path, WorkerProgressTracker(), start_page=start_page, light=light)
+    cache = ModelLoader.get_cache()
+    if cache is not None:
+        pending = cache.drain_pending()
+        if pending:
+            send_message(('embeddings', pending))
+    return result
 
-def save_results_to_csv(results, output_file):
-    """保存结果到CSV文件"""
-    if results:
-        df = pd.DataFrame(results)
-        df.to_csv(output_file, index=False)
-        logger.debug(f"已保存 {len(results)} 条处理记录到 {output_file}")
+
+def create_process_executor(max_workers, tracker):
+    """
+    创建共享模型权重、带单文件硬性时限的进程池
+
+    父进程先加载模型、冻结 GC，再以 fork 方式创建子进程，模型权重写时复制共享，不必付出 N 倍内存；
+    父进程在 fork 前不做前向推理（OpenMP 线程池在 fork 后不可用），目标向量由子进程各自计算。
+    单个文件超过 processing_timeout 秒时子进程会被杀掉并补充新进程（见 DeadlinePool）。
+    进程池须在 Live 等其他线程启动之前创建：之后所有子进程都由创建时 fork 出的 zygote 进程 fork。
+    子进程的进度更新经管道转发给 tracker；新算出的向量先暂存，进程池结束后再由父进程写入缓存，
+    避免在子进程仍在读取共享内存映射时复用槽位
+
+    Returns:
+        (executor, finalize)，finalize 需在进程池关闭后调用
+    """
+    ModelLoader.get_model()
+    cache = ModelLoader.get_cache()
+    gc.collect()
+    gc.freeze()
+
+    pending_embeddings = []
+
+    def on_message(message):
+        if message[0] == 'progress':
+            _, args, kwargs = message
+            tracker.update_progress(*args, **kwargs)
+        elif message[0] == 'embeddings':
+            pending_embeddings.extend(message[1])
+
+    executor = DeadlinePool(max_workers or os.cpu_count(),
+                            timeout=DEFAULT_CONFIG.pdf.processing_timeout,
+                            mp_context=multiprocessing.get_context('fork'),
+                            initializer=_init_process_worker,
+                            initargs=(DEFAULT_CONFIG.pdf.worker_torch_threads,),
+                            on_message=on_message)
+
+    def finalize():
+        gc.unfreeze()
+        if cache is not None and pending_embeddings:
+            import numpy as np
+            texts, vectors = zip(*pending_embeddings)
+            cache.put_many(list(texts), np.stack(vectors))
+
+    return executor, finalize
 
 
 def process_pdf_files(folder_path, keywords: str, max_workers=None):
     """修改主处理函数，支持页面级别的续传"""
     config = DEFAULT_CONFIG
-    progress_file = config.pdf.progress_file
-    page_progress_file = config.pdf.page_progress_file
 
-    # 加载已处理的结果和页面进度
-    previous_results = load_previous_results(progress_file)
-    page_progress, best_matches = load_page_progress(page_progress_file)
+    # 从断点日志恢复已处理的结果、页面进度与最优匹配（首次运行时导入旧版 CSV 进度文件）
+    journal = CheckpointJournal(config.pdf.checkpoint_file,
+                                legacy_progress_file=config.pdf.progress_file,
+                                legacy_page_progress_file=config.pdf.page_progress_file)
+    previous_results, page_progress, best_matches = journal.load()
     processed_files = {r['file_name'] for r in previous_results if r['status'] == 'success'}
 
     # 获取所有PDF文件并过滤掉完全处理完的
@@ -358,11 +383,19 @@ def process_pdf_files(folder_path, keywords: str, max_workers=None):
     pdf_files.sort(key=lambda x: extract_number(x.name))
     pdf_files = [f for f in pdf_files if f.name not in processed_files]
 
+    # 超时或导致子进程崩溃的文件：按隔离策略跳过，或用轻量策略重试
+    quarantine = Quarantine(config.pdf.quarantine_file, config.pdf.quarantine_policy)
+    skipped = [f.name for f in pdf_files if quarantine.should_skip(f.name)]
+    if skipped:
+        logger.warning(f"跳过隔离名单中的 {len(skipped)} 个文件: {skipped}")
+        pdf_files = [f for f in pdf_files if f.name not in skipped]
+
     total_files = len(pdf_files)
     logger.info(f"找到 {total_files} 个未处理的PDF文件")
 
     if not pdf_files:
         logger.info("所有文件已处理完成")
+        journal.close()
         return previous_results
 
     progress_tracker = ProgressTracker(total_files, max_display_rows=20, keywords=keywords)
@@ -379,111 +412,108 @@ def process_pdf_files(folder_path, keywords: str, max_workers=None):
 
         progress_tracker.update_progress(pdf_file.name, initial_status, initial_details, best_match=best_match)
 
-    # 注册程序退出时的保存函数
-    def save_on_exit():
-        save_results_to_csv(results, progress_file)
-        save_page_progress(page_progress, page_progress_file, progress_tracker)
-
-    atexit.register(save_on_exit)
-
-    # 创建一个共享的Live对象，供回调使用
-    live = None
+    # 每个事件写入后即已落盘，退出时只需关闭日志
+    atexit.register(journal.close)
 
-    def update_display():
-        """更新显示的辅助函数"""
-        if live:
-            live.update(progress_tracker.create_progress_table())
-
-    # 包装progress_tracker，使其在更新状态时自动刷新显示
-    class DisplayUpdatingTracker:
-        def __init__(self, tracker):
-            self.tracker = tracker
-
-        def update_progress(self, *args, **kwargs):
-            self.tracker.update_progress(*args, **kwargs)
-            update_display()
-
-    display_tracker = DisplayUpdatingTracker(progress_tracker)
+    use_processes = config.pdf.executor == 'process'
+    finalize_executor = None
+    if use_processes:
+        executor, finalize_executor = create_process_executor(max_workers, progress_tracker)
+    else:
+        # 线程模式没有硬性时限：卡在 PyMuPDF 调用中的线程无法终止，processing_timeout 只在进程模式下生效
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        # 多个线程的编码请求统一交给推理线程合并成批，避免各线程争抢 torch 算子线程、各自跑小批次
+        if config.model.inference_service:
+            ModelLoader.start_inference_service()
 
     try:
-        with Live(progress_tracker.create_progress_table(), console=console, refresh_per_second=4) as live_display:
-            live = live_display
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-
-                # 提交任务时考虑页面进度
-                for pdf_path in pdf_files:
+        # 工作线程只更新状态，由 Live 的刷新线程按固定频率重绘
+        with Live(get_renderable=progress_tracker.create_progress_table,
+                  console=console,
+                  refresh_per_second=config.pdf.refresh_per_second):
+            try:
+                future_to_path = {}
+
+                # 按调度策略提交（默认页数多的先跑），并考虑页面进度
+                for pdf_path in schedule_pdf_files(pdf_files, config.pdf.scheduling_policy):
                     start_page = page_progress.get(pdf_path.name, 0)
-                    logger.debug(f"提交任务: {pdf_path.name}, 从第 {start_page + 1} 页开始")
-                    future = executor.submit(process_single_pdf, pdf_path, display_tracker, start_page=start_page)
-                    futures.append((future, pdf_path))
-
-                # 处理完成的任务
-                for future in concurrent.futures.as_completed([f for f, _ in futures]):
+                    light = quarantine.use_light(pdf_path.name)
+                    logger.debug(f"提交任务: {pdf_path.name}, 从第 {start_page + 1} 页开始{'（轻量策略）' if light else ''}")
+                    if use_processes:
+                        future = executor.submit(_process_single_pdf_in_worker, pdf_path, start_page=start_page,
+                                                 light=light)
+                    else:
+                        future = executor.submit(process_single_pdf, pdf_path, progress_tracker,
+                                                 start_page=start_page, light=light)
+                    future_to_path[future] = pdf_path
+
+                # 处理完成的任务；进程模式下超时的子进程由 DeadlinePool 杀掉，Future 以 DeadlineExceeded 结束
+                for future in concurrent.futures.as_completed(future_to_path):
+                    pdf_path = future_to_path[future]
                     try:
-                        # 找到对应的 pdf_path
-                        pdf_path = next(p for f, p in futures if f == future)
-                        result = future.result(timeout=300)
+                        result = future.result()
+                        quarantine.remove(pdf_path.name)
 
                         # 更新页面进度和最优匹配
                         current_info = progress_tracker.results.get(pdf_path.name, {})
                         current_page = current_info.get('last_page')
                         best_match = current_info.get('best_match')
 
-                        if current_page is not None:
-                            page_progress[pdf_path.name] = current_page
-
-                        # 只有在成功找到目标时才添加到结果中
+                        # 只有在成功找到目标时才添加到结果中，并从页面进度中移除
                         if result['status'] == 'success':
                             results.append(result)
-                            # 从页面进度中移除已完成的文件
                             page_progress.pop(pdf_path.name, None)
-
-                        # 定期保存进度
-                        if len(results) % 2 == 0:
-                            save_results_to_csv(results, progress_file)
-                            save_page_progress(page_progress, page_progress_file, progress_tracker)
+                            journal.record_result(result)
                             progress_tracker.update_save_count(len(results))
+                        elif current_page is not None:
+                            page_progress[pdf_path.name] = current_page
+                            journal.record_page(pdf_path.name, current_page, best_match)
 
-                    except concurrent.futures.TimeoutError:
-                        logger.error(f"处理文件超时: {pdf_path.name}")
-                        save_current_progress(pdf_path, progress_tracker, page_progress, page_progress_file)
+                    except (DeadlineExceeded, WorkerCrashed) as e:
+                        logger.error(f"处理文件超时或崩溃: {pdf_path.name}, {str(e)}")
+                        save_current_progress(pdf_path, progress_tracker, page_progress, journal)
+                        quarantine.add(pdf_path.name, str(e), 'light' if quarantine.use_light(pdf_path.name) else 'full')
+                        progress_tracker.update_progress(pdf_path.name, 'error', f"已隔离: {str(e)}")
 
                     except Exception as e:
                         logger.error(f"处理文件出错: {pdf_path.name}, 错误: {str(e)}")
-                        save_current_progress(pdf_path, progress_tracker, page_progress, page_progress_file)
+                        save_current_progress(pdf_path, progress_tracker, page_progress, journal)
+            finally:
+                if use_processes:
+                    executor.shutdown()
+                else:
+                    # 不等待仍在运行的线程（例如卡在 PyMuPDF 调用中的），也不再启动排队中的任务
+                    executor.shutdown(wait=False, cancel_futures=True)
 
     except KeyboardInterrupt:
         logger.warning("用户中断处理")
         # 保存所有正在处理的文件的进度
         for pdf_path in pdf_files:
-            save_current_progress(pdf_path, progress_tracker, page_progress, page_progress_file)
-        save_results_to_csv(results, progress_file)
+            save_current_progress(pdf_path, progress_tracker, page_progress, journal)
         return results
     except Exception as e:
         logger.error(f"发生未预期的错误: {str(e)}")
         # 保存所有正在处理的文件的进度
         for pdf_path in pdf_files:
-            save_current_progress(pdf_path, progress_tracker, page_progress, page_progress_file)
-        save_results_to_csv(results, progress_file)
+            save_current_progress(pdf_path, progress_tracker, page_progress, journal)
         raise
     finally:
-        # 确保最终保存一次进度
-        save_results_to_csv(results, progress_file)
-        save_page_progress(page_progress, page_progress_file, progress_tracker)
+        ModelLoader.stop_inference_service()
+        if finalize_executor:
+            finalize_executor()
+        journal.close()
 
     return results
 
 
-def save_current_progress(pdf_path, progress_tracker, page_progress, page_progress_file):
-    """保存当前处理进度的辅助函数"""
+def save_current_progress(pdf_path, progress_tracker, page_progress, journal: CheckpointJournal):
+    """记录单个文件当前处理进度的辅助函数（已成功的文件不再记录）"""
     try:
         current_info = progress_tracker.results.get(pdf_path.name, {})
         current_page = current_info.get('last_page')
-        if current_page is not None:
+        if current_page is not None and current_info.get('status') != 'success':
             page_progress[pdf_path.name] = current_page
-            save_page_progress(page_progress, page_progress_file, progress_tracker)
+            journal.record_page(pdf_path.name, current_page, current_info.get('best_match'))
     except Exception as e:
         logger.error(f"保存进度时发生错误: {str(e)}")
 
@@ -1,5 +1,6 @@
 from src.config import ROOT_PATH
-from src.v3_stable.step_2_add_candidate_tables import init_candidate_tables
+from src.utils.scheduling import schedule_pdf_files
+from src.v3_stable.step_2_add_candidate_tables import find_criterion_tables
 
 import concurrent.futures
 import os
@@ -54,13 +55,13 @@ def process_single_pdf(index: int, pdf_path: pathlib.Path, progress: Progress, t
         )
     
     try:
-        table_data, start_page, end_page = init_candidate_tables(
-            pdf_path.name,
-            progress_callback=update_page_progress
-        )
+        tables_data = find_criterion_tables(pdf_path, progress_callback=update_page_progress)
+        if not tables_data:
+            raise ValueError("未找到包含 criterion 列的表格")
+        pages = [table['page'] for table in tables_data]
         result.update({
-            'start': start_page,
-            'end': end_page,
+            'start': min(pages),
+            'end': max(pages),
             'success': True
         })
     except ValueError as e:
@@ -70,15 +71,19 @@ def process_single_pdf(index: int, pdf_path: pathlib.Path, progress: Progress, t
     
     return result
 
-def process_all_pdfs(root_dir: str) -> pd.DataFrame:
+def process_all_pdfs(root_dir: str, scheduling_policy: str = 'longest_first') -> pd.DataFrame:
     """
     并发处理目录下的所有PDF文件，提取评分表格信息
+
+    提交顺序见 scheduling_policy（默认页数多的先跑），结果仍按文件名顺序输出
     """
     root_path = pathlib.Path(root_dir)
     
     pdf_files = sorted([f for f in root_path.glob("*.pdf")])
     total_files = len(pdf_files)
     results = [None] * total_files
+    file_index = {pdf_path: idx for idx, pdf_path in enumerate(pdf_files)}
+    submit_order = schedule_pdf_files(pdf_files, scheduling_policy)
 
     console.print(Panel(f"[bold blue]开始处理PDF文件[/]\n"
                        f"目录: {root_dir}\n"
@@ -142,46 +147,44 @@ def process_all_pdfs(root_dir: str) -> pd.DataFrame:
         completed = 0
         errors = []
         success_count = 0
-        current_tasks = {}  # 记录当前每个线程正在处理的任务
-        future_to_idx = {}  # 添加这个字典来跟踪future和任务索引的对应关系
-        
+        idle_workers = list(range(max_workers))[::-1]  # 空闲的进度条（线程）编号
+        future_to_task = {}  # future -> (任务索引, 文件路径, 进度条编号)
+        next_files = iter(submit_order)
+
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 初始提交第一批任务
-            futures = set()
-            for i in range(min(max_workers, total_files)):
+            def submit_next():
+                """把下一个文件交给一个空闲的进度条，没有剩余文件时返回 False"""
+                next_file_path = next(next_files, None)
+                if next_file_path is None:
+                    return False
+                worker_id = idle_workers.pop()
+                # 重置进度条并更新状态文本
+                progress.update(worker_tasks[worker_id], completed=0)
+                update_status(worker_tasks[worker_id], 'wait', next_file_path.name, str(next_file_path.absolute()))
                 future = executor.submit(
-                    process_single_pdf, 
-                    i, 
-                    pdf_files[i], 
-                    progress, 
-                    worker_tasks[i],
-                    max_filename_length  # 添加这个参数
+                    process_single_pdf,
+                    file_index[next_file_path],
+                    next_file_path,
+                    progress,
+                    worker_tasks[worker_id],
+                    max_filename_length
                 )
-                futures.add(future)
-                current_tasks[i] = i
-                future_to_idx[future] = (i, pdf_files[i])
-            
-            next_task_idx = max_workers
-            
+                future_to_task[future] = (file_index[next_file_path], next_file_path, worker_id)
+                return True
+
+            # 初始提交第一批任务
+            while idle_workers and submit_next():
+                pass
+
             # 处理完成的任务并提交新任务
-            while futures:
-                done, futures = concurrent.futures.wait(
-                    futures, 
+            while future_to_task:
+                done, _ = concurrent.futures.wait(
+                    future_to_task,
                     return_when=concurrent.futures.FIRST_COMPLETED
                 )
-                
+
                 for future in done:
-                    # 找到这个任务是哪个线程的
-                    worker_id = None
-                    for wid, task_idx in current_tasks.items():
-                        if task_idx == future_to_idx[future][0]:
-                            worker_id = wid
-                            break
-                    
-                    if worker_id is None:
-                        continue
-                            
-                    idx, pdf_path = future_to_idx[future]
+                    idx, pdf_path, worker_id = future_to_task.pop(future)
                     try:
                         result = future.result()
                         results[idx] = result
@@ -217,31 +220,9 @@ def process_all_pdfs(root_dir: str) -> pd.DataFrame:
                         description=f"[cyan]处理PDF文件... (成功: {success_count}/{completed})"
                     )
 
-                    # 在开始新任务时
-                    if next_task_idx < total_files:
-                        next_file_path = pdf_files[next_task_idx]  # 获取下一个文件路径
-                        # 重置进度条
-                        progress.update(worker_tasks[worker_id], completed=0)
-                        # 更新状态文本
-                        update_status(
-                            worker_tasks[worker_id], 
-                            'wait', 
-                            next_file_path.name, 
-                            str(next_file_path.absolute())
-                        )
-                        # 提交新任务
-                        new_future = executor.submit(
-                            process_single_pdf, 
-                            next_task_idx, 
-                            next_file_path, 
-                            progress, 
-                            worker_tasks[worker_id],
-                            max_filename_length
-                        )
-                        futures.add(new_future)
-                        current_tasks[worker_id] = next_task_idx
-                        future_to_idx[new_future] = (next_task_idx, next_file_path)
-                        next_task_idx += 1
+                    # 释放进度条并开始新任务
+                    idle_workers.append(worker_id)
+                    submit_next()
 
         if errors:
             console.print("\n[bold yellow]处理过程中的警告和错误:[/]")
@@ -1,30 +1,219 @@
-from sentence_transformers import SentenceTransformer
-from loguru import logger
+import atexit
+import re
 import time
+from threading import Lock
+from typing import List, Optional
+
+from loguru import logger
+
 from .config import DEFAULT_CONFIG as config  # 导入配置
 
+# 动态 int8 量化目标 -> sentence-transformers 导出的文件后缀（与 HF hub 上预量化文件的命名一致）
+QUANTIZED_FILE_SUFFIXES = {
+    'arm64': 'qint8_arm64',
+    'avx2': 'quint8_avx2',
+    'avx512': 'qint8_avx512',
+    'avx512_vnni': 'qint8_avx512_vnni'}
+
+# 一致性校验用的样例文本：目标标题的变体 + 报告里常见的正文、表头
+PARITY_SAMPLE_TEXTS = [
+    "Summary of project findings and ratings",
+    "Table 14: Summary of project findings and ratings",
+    "Table 2. Summary of evaluation criteria, ratings and justifications",
+    "Criterion Summary assessment Rating",
+    "Overall Project Performance Rating: Satisfactory",
+    "The project was aligned with GEF's strategic priorities.",
+    "Annex III. List of documents consulted during the evaluation",
+    "Financial Management 1. Adherence to UNEP's financial policies and procedures",
+]
+
+
+def load_model(backend: str = 'torch', quantization: Optional[str] = None):
+    """
+    按指定后端加载 SentenceTransformer
+
+    onnx 后端需要额外安装: pip install "sentence-transformers[onnx]"；
+    指定 quantization 时优先使用 hub 上预量化的文件，没有则在本地导出一份动态 int8 量化模型
+    """
+    from sentence_transformers import SentenceTransformer
+
+    name, device = config.model.model_name, config.model.device
+    if backend == 'torch':
+        return SentenceTransformer(name, device=device)
+    if backend != 'onnx':
+        raise ValueError(f"不支持的推理后端: {backend}")
+    if not quantization:
+        return SentenceTransformer(name, device=device, backend='onnx')
+    if quantization not in QUANTIZED_FILE_SUFFIXES:
+        raise ValueError(f"不支持的量化配置: {quantization}，可选: {list(QUANTIZED_FILE_SUFFIXES)}")
+
+    file_name = f"onnx/model_{QUANTIZED_FILE_SUFFIXES[quantization]}.onnx"
+    local_dir = config.model.onnx_export_dir / re.sub(r'[^\w.-]', '_', name)
+    if (local_dir / file_name).exists():
+        return SentenceTransformer(str(local_dir), device=device, backend='onnx', model_kwargs={'file_name': file_name})
+
+    try:
+        return SentenceTransformer(name, device=device, backend='onnx', model_kwargs={'file_name': file_name})
+    except Exception as e:
+        logger.info(f"未找到预量化模型 {file_name} ({e})，在本地导出到: {local_dir}")
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    model = SentenceTransformer(name, device=device, backend='onnx')
+    model.save(str(local_dir))
+    export_dynamic_quantized_onnx_model(model, quantization, str(local_dir))
+    return SentenceTransformer(str(local_dir), device=device, backend='onnx', model_kwargs={'file_name': file_name})
+
+
+def similarity_scores(model, texts: List[str]):
+    """用给定模型计算每段文本与目标文本的余弦相似度"""
+    target = model.encode([config.target.table_name], normalize_embeddings=True, convert_to_numpy=True)[0]
+    return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False) @ target
+
+
 class ModelLoader:
+    """
+    语义模型的懒加载单例
+
+    sentence_transformers / torch 只在第一次真正需要向量时才导入，
+    这样只做表格解析、进度查看的命令不必为模型加载付出数秒的启动时间
+    """
     _instance = None
     _model = None
-    
+    _target_embedding = None
+    _cache = None
+    _service = None
+    _lock = Lock()
+
     @classmethod
     def get_model(cls):
         """单例模式获取模型实例"""
         if cls._model is None:
-            start_time = time.time()
-            logger.info("加载语义相似度模型...")
-            cls._model = SentenceTransformer(
-                config.model.model_name,
-                device=config.model.device
-            )
-            logger.info(f"模型加载完成，耗时: {time.time() - start_time:.2f}秒")
+            with cls._lock:
+                if cls._model is None:
+                    start_time = time.time()
+                    logger.info("加载语义相似度模型...")
+                    model = load_model(config.model.backend, config.model.onnx_quantization)
+                    if config.model.backend != 'torch' and config.model.verify_parity:
+                        cls.check_backend_parity(model)
+                    cls._model = model
+                    logger.info(f"模型加载完成 ({cls.model_id()})，耗时: {time.time() - start_time:.2f}秒")
         return cls._model
 
+    @classmethod
+    def model_id(cls) -> str:
+        """模型标识，不同后端/量化得到的向量不完全相同，缓存时需要区分"""
+        if config.model.backend == 'torch':
+            return config.model.model_name
+        quantization = f"-{config.model.onnx_quantization}" if config.model.onnx_quantization else ''
+        return f"{config.model.model_name}@{config.model.backend}{quantization}"
+
+    @staticmethod
+    def check_backend_parity(model, texts: List[str] = None, tolerance: float = None) -> float:
+        """
+        与 torch 后端比较各文本与目标文本的余弦相似度，返回最大绝对误差
+
+        Raises:
+            ValueError: 误差超过容差
+        """
+        import numpy as np
+
+        texts = texts or PARITY_SAMPLE_TEXTS
+        tolerance = config.model.parity_tolerance if tolerance is None else tolerance
+        reference = similarity_scores(load_model('torch'), texts)
+        max_error = float(np.max(np.abs(similarity_scores(model, texts) - reference)))
+        if max_error > tolerance:
+            raise ValueError(f"推理后端与 torch 结果不一致: 最大误差 {max_error:.4f} > 容差 {tolerance}")
+        logger.info(f"推理后端一致性校验通过: 最大误差 {max_error:.4f} (容差 {tolerance})")
+        return max_error
+
+    @classmethod
+    def get_target_embedding(cls):
+        """获取目标文本（表格名称）的归一化向量，首次调用时计算并缓存"""
+        if cls._target_embedding is None:
+            cls._target_embedding = cls.encode_texts([config.target.table_name])[0]
+        return cls._target_embedding
+
+    @classmethod
+    def get_cache(cls):
+        """获取磁盘向量缓存（未启用时返回 None），进程退出时自动落盘并输出命中率"""
+        if cls._cache is None and config.cache.enabled:
+            with cls._lock:
+                if cls._cache is None:
+                    from .embedding_cache import EmbeddingCache
+                    cls._cache = EmbeddingCache(config.cache.cache_dir,
+                                                cls.model_id(),
+                                                max_entries=config.cache.max_entries,
+                                                flush_every=config.cache.flush_every)
+                    atexit.register(cls.close_cache)
+        return cls._cache
+
+    @classmethod
+    def close_cache(cls):
+        if cls._cache is not None:
+            cls._cache.flush()
+            logger.info(str(cls._cache))
+
+    @classmethod
+    def start_inference_service(cls):
+        """启动进程内微批推理服务，之后其他线程的 encode_texts 都会经由推理线程合并执行"""
+        if cls._service is None:
+            from .inference_service import InferenceService
+            cls._service = InferenceService(cls._encode_cached,
+                                            max_batch_size=config.model.service_max_batch_size,
+                                            max_latency_ms=config.model.service_max_latency_ms)
+        return cls._service.start()
+
+    @classmethod
+    def stop_inference_service(cls):
+        if cls._service is not None:
+            cls._service.stop()
+
+    @classmethod
+    def encode_texts(cls, texts: List[str]):
+        """
+        批量编码文本，返回 L2 归一化后的向量矩阵 (len(texts), dim)
+
+        归一化后任意两个向量的点积即为余弦相似度；推理服务运行时交给推理线程合并成批
+        """
+        service = cls._service
+        if service is not None and service.is_running and not service.in_worker_thread():
+            return service.encode(texts)
+        return cls._encode_cached(texts)
+
+    @classmethod
+    def _encode_cached(cls, texts: List[str]):
+        """先查磁盘缓存，只有未命中的（去重后的）文本才会交给模型"""
+        import numpy as np
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        cache = cls.get_cache()
+        if cache is None:
+            return cls._encode(texts)
+
+        vectors = cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, cls._encode(missing)))
+            cache.put_many(missing, np.stack(list(encoded.values())))
+            vectors = [encoded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return np.stack(vectors)
+
+    @classmethod
+    def _encode(cls, texts: List[str]):
+        """直接调用模型批量编码"""
+        model = cls.get_model()
+        return model.encode(texts,
+                            batch_size=config.model.batch_size,
+                            normalize_embeddings=True,
+                            convert_to_numpy=True,
+                            show_progress_bar=False)
+
     @classmethod
     def encode_text(cls, text):
-        """编码文本"""
+        """编码文本（归一化向量）"""
         start_time = time.time()
-        model = cls.get_model()
-        embedding = model.encode([text])[0]
+        embedding = cls.encode_texts([text])[0]
         # logger.debug(f"文本编码完成，耗时: {time.time() - start_time:.2f}秒")
-        return embedding 
\ No newline at end of file
+        return embedding
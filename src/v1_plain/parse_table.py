@@ -1,9 +1,12 @@
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Set, Tuple, Optional
 
 import fitz
 from loguru import logger
 
+from src.utils.document_session import DocumentSession
+from src.utils.rect_grid import RectGrid, contains
+
 
 @dataclass
 class TableInfo:
@@ -27,22 +30,22 @@ def extract_tables(pdf_path: str, page_callback=None, start_page: int = 0) -> Li
     Returns:
         List[TableInfo]: 表格信息列表
     """
-    doc = fitz.open(pdf_path)
+    session = DocumentSession(pdf_path)
     tables = []
     current_spanning_table = None
 
     try:
-        start_page = max(0, min(start_page, len(doc) - 1))
+        start_page = max(0, min(start_page, len(session) - 1))
 
-        for page_num in range(start_page, len(doc)):
+        for page_num in range(start_page, len(session)):
             try:
-                page = doc[page_num]
+                page = session.page(page_num)
 
                 if page_callback:
-                    page_callback(page_num, len(doc))
+                    page_callback(page_num, len(session))
 
                 # 获取当前页面的表格
-                page_tables = _extract_page_tables(page)
+                page_tables = _extract_page_tables(session, page_num)
 
                 # 处理跨页表格
                 if current_spanning_table:
@@ -77,22 +80,25 @@ def extract_tables(pdf_path: str, page_callback=None, start_page: int = 0) -> Li
         return []
 
     finally:
-        doc.close()
+        session.close()
 
 
-def _extract_page_tables(page: fitz.Page) -> List[TableInfo]:
+def _extract_page_tables(session: DocumentSession, page_num: int) -> List[TableInfo]:
     """
     从单个页面提取表格
 
     Args:
-        page: fitz.Page对象
+        session: 文档会话，页面的文字提取结果在其中缓存
+        page_num: 页面索引
 
     Returns:
         List[TableInfo]: 页面中的表格列表
     """
+    page = session.page(page_num)
     try:
         tables = []
         tab = page.find_tables()
+        bold_chars = None  # 页面上所有加粗字符的 bbox，遇到第一个表格时提取
 
         if tab.tables:
             for idx, table in enumerate(tab.tables):
@@ -122,6 +128,10 @@ def _extract_page_tables(page: fitz.Page) -> List[TableInfo]:
                             except Exception:
                                 continue
 
+                    if bold_chars is None:
+                        bold_chars = _extract_bold_chars(session.get_rawdict(page_num))
+                    bold_cells = _find_bold_cells(page, cells_dict, bold_chars)
+
                     for row_idx, row in enumerate(raw_table):
                         cleaned_row = []
                         for col_idx, cell_content in enumerate(row):
@@ -132,45 +142,8 @@ def _extract_page_tables(page: fitz.Page) -> List[TableInfo]:
                                 else:
                                     cell_text = str(cell_content).strip() if cell_content is not None else ""
 
-                                # 获取单元格区域和格式信息
-                                is_bold = False
-                                try:
-                                    cell_rect = cells_dict.get((row_idx, col_idx))
-                                    if cell_rect:
-                                        dict_output = page.get_text("dict", clip=cell_rect)
-
-                                        # 改进的加粗检测逻辑
-                                        for block in dict_output.get("blocks", []):
-                                            for line in block.get("lines", []):
-                                                for span in line.get("spans", []):
-                                                    # 检查字体名称中的加粗标识
-                                                    font = span.get("font", "").lower()
-                                                    flags = span.get("flags", 0)
-
-                                                    # 通过字体名称检测
-                                                    if any(bold_mark in font for bold_mark in
-                                                           ["bold", "bd", "-b", "black", "heavy"]):
-                                                        is_bold = True
-                                                        break
-
-                                                    # 通过字体flags检测 (16是加粗标志)
-                                                    if flags & 16:
-                                                        is_bold = True
-                                                        break
-
-                                                    # 通过字体粗细检测
-                                                    weight = span.get("weight", 0)
-                                                    if weight >= 600:  # 600及以上通常表示加粗
-                                                        is_bold = True
-                                                        break
-
-                                                if is_bold:
-                                                    break
-                                            if is_bold:
-                                                break
-
-                                except Exception as e:
-                                    logger.debug(f"获取单元格格式信息失败: {str(e)}")
+                                # 单元格格式信息：整页只提取一次文字，见 _find_bold_cells
+                                is_bold = (row_idx, col_idx) in bold_cells
 
                                 # 存储单元格信息
                                 cleaned_row.append({'text': cell_text, 'is_bold': is_bold})
@@ -200,6 +173,66 @@ def _extract_page_tables(page: fitz.Page) -> List[TableInfo]:
         return []
 
 
+# 字体名称中的加粗标识
+BOLD_FONT_MARKS = ["bold", "bd", "-b", "black", "heavy"]
+
+
+def _is_bold_span(span: Dict) -> bool:
+    """通过字体名称、字体 flags（16 是加粗标志）或字体粗细（600 及以上）判断 span 是否加粗"""
+    font = span.get("font", "").lower()
+    if any(bold_mark in font for bold_mark in BOLD_FONT_MARKS):
+        return True
+    if span.get("flags", 0) & 16:
+        return True
+    return span.get("weight", 0) >= 600
+
+
+def _extract_bold_chars(rawdict: Dict) -> List[Tuple[float, float, float, float]]:
+    """一次性提取页面 rawdict 中所有加粗 span 的字符 bbox；空白字符也保留，只有加粗空格的单元格同样算加粗"""
+    bold_chars = []
+    for block in rawdict.get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                if _is_bold_span(span):
+                    bold_chars.extend(tuple(char["bbox"]) for char in span["chars"])
+    return bold_chars
+
+
+def _find_bold_cells(page: fitz.Page, cells_dict: Dict[Tuple[int, int], fitz.Rect],
+                     bold_chars: List[Tuple[float, float, float, float]]) -> Set[Tuple[int, int]]:
+    """
+    找出包含加粗文字的单元格，结果与逐个单元格 page.get_text("dict", clip=cell_rect) 的判断一致
+
+    clip 是按字形的实际轮廓判断字符是否落在单元格内，比 rawdict 给出的字符 bbox 更紧：
+    - 加粗字符 bbox 完全在单元格内：一定加粗
+    - 没有任何加粗字符 bbox 与单元格相交：一定不加粗
+    - 只有部分相交的（字符压在单元格边界上）才回退为对该单元格单独提取文字
+    """
+    if not bold_chars or not cells_dict:
+        return set()
+
+    grid = RectGrid({key: tuple(rect) for key, rect in cells_dict.items()})
+    bold_cells, uncertain = set(), set()
+    for char_bbox in bold_chars:
+        for key in grid.query(char_bbox):
+            if contains(grid.rects[key], char_bbox):
+                bold_cells.add(key)
+            else:
+                uncertain.add(key)
+
+    for key in uncertain - bold_cells:
+        try:
+            dict_output = page.get_text("dict", clip=cells_dict[key])
+            if any(_is_bold_span(span)
+                   for block in dict_output.get("blocks", [])
+                   for line in block.get("lines", [])
+                   for span in line.get("spans", [])):
+                bold_cells.add(key)
+        except Exception as e:
+            logger.debug(f"获取单元格格式信息失败: {str(e)}")
+    return bold_cells
+
+
 def _is_table_spanning_to_next_page(table: TableInfo, page: fitz.Page) -> bool:
     """
     判断表格是否跨页
@@ -1,103 +1,253 @@
-from typing import Dict, Optional
+import heapq
+import re
+from typing import Dict, List, Optional, Set
 
-import fitz
 from loguru import logger
-from sklearn.metrics.pairwise import cosine_similarity
 
+from src.utils.document_session import DocumentSession
 from .config import DEFAULT_CONFIG as config
 from .model_loader import ModelLoader
 
-# 获取模型和目标文本
-model = ModelLoader.get_model()
+# 目标文本；模型与目标向量改为在第一次处理页面时才加载（见 ModelLoader）
 target_text = config.target.table_name
-target_embedding = model.encode([target_text])
 
+STOPWORDS = {'a', 'an', 'and', 'the', 'of', 'for', 'to', 'in', 'on', 'by', 'with'}
 
-def find_summary_text(pdf_path: str, page_callback=None, start_page=0) -> Optional[Dict]:
+
+def find_summary_text(pdf_path: str, page_callback=None, start_page=0, light=False,
+                      progress_callback=None) -> Optional[Dict]:
     """
     查找PDF中的目标文本，支持从指定页面开始处理
-    
+
+    检索模式由 config.target.retrieval_mode 决定：
+    - 'full': 以 config.model.page_window 页为一个窗口批量编码所有文本块
+    - 'rerank': 先对全文所有文本块做词法打分，只把 top-K 候选交给语义模型重排
+
     Args:
         pdf_path: PDF文件路径
-        page_callback: 页面处理进度回调函数
+        page_callback: 页面处理进度回调函数，上报的页面视为已处理（会写入断点）
+        progress_callback: 仅用于显示的进度回调 progress_callback(page_num, total_pages, stage)，
+            rerank 模式下在词法粗筛与语义重排阶段调用，上报的页面不视为已处理
         start_page: 开始处理的页面索引（从0开始）
+        light: 轻量策略，忽略检索模式配置，只对 light_rerank_top_k 个候选做语义重排且不回退为全量打分
     """
-    doc = fitz.open(pdf_path)
+    with DocumentSession(pdf_path) as session:
+        # 确保 start_page 在有效范围内
+        start_page = max(0, min(start_page, len(session) - 1))
+        if light:
+            return _find_by_rerank(session, page_callback, start_page, config.target.light_rerank_top_k,
+                                   fallback=False, progress_callback=progress_callback)
+        if config.target.retrieval_mode == 'rerank':
+            return _find_by_rerank(session, page_callback, start_page, config.target.rerank_top_k,
+                                   progress_callback=progress_callback)
+        return _find_by_full_scan(session, page_callback, start_page)
+
+
+def _find_by_full_scan(session: DocumentSession, page_callback, start_page) -> Optional[Dict]:
+    """全量语义打分：按页面窗口批量编码"""
     best_match = None
+    window = max(1, config.model.page_window)
 
-    try:
-        # 确保 start_page 在有效范围内
-        start_page = max(0, min(start_page, len(doc) - 1))
+    for window_start in range(start_page, len(session), window):
+        page_nums = range(window_start, min(window_start + window, len(session)))
+        page_blocks = {page_num: _extract_blocks(session, page_num) for page_num in page_nums}
+        page_scores = _score_blocks(page_blocks)
 
-        for page_num in range(start_page, len(doc)):
+        for page_num in page_nums:
             # 处理每一页...
             if page_callback:
-                page_callback(page_num, len(doc), best_match)
+                page_callback(page_num, len(session), best_match)
 
             # 如果找到更好的匹配，更新 best_match
-            current_match = process_page(doc[page_num])  # 假设这是处理单页的函数
+            current_match = _best_block_match(page_num, page_blocks[page_num], page_scores.get(page_num))
             if current_match and (not best_match or current_match['confidence'] > best_match['confidence']):
                 best_match = current_match
 
-        return best_match
-    finally:
-        doc.close()
+    return best_match
+
+
+def _find_by_rerank(session: DocumentSession, page_callback, start_page, top_k, fallback=True,
+                    progress_callback=None) -> Optional[Dict]:
+    """
+    两阶段检索：词法粗筛 + top-K 语义重排
+
+    最优匹配与阈值的判定方式与全量模式相同，只是候选集合缩小为词法得分最高的 K 个文本块；
+    如果全文最高词法得分都低于 lexical_min_score，则回退为全量语义打分（fallback=False 时不回退）
+
+    page_callback 只在候选打分完成后调用一次：词法粗筛阶段还没有任何页面被打分，此时上报的页面会被断点日志 /
+    隔离重试当作已处理，续传时跳过真正的匹配；粗筛与重排过程中的进度经 progress_callback 上报，只用于显示
+    """
+    page_blocks = {}
+    candidates = []  # (词法得分, 页码, 文本块)
+    for page_num in range(start_page, len(session)):
+        if progress_callback:
+            progress_callback(page_num, len(session), 'lexical')
+        page_blocks[page_num] = _extract_blocks(session, page_num)
+        for block in page_blocks[page_num]:
+            candidates.append((lexical_score(block[4]), page_num, block))
+
+    if progress_callback and page_blocks:
+        progress_callback(len(session) - 1, len(session), 'rerank')
+    best_match = _rerank_candidates(page_blocks, candidates, top_k, fallback)
+    if page_callback and page_blocks:
+        page_callback(len(session) - 1, len(session), best_match)
+    return best_match
+
+
+def _rerank_candidates(page_blocks: Dict[int, List[tuple]], candidates: List[tuple], top_k,
+                       fallback) -> Optional[Dict]:
+    # nlargest 等价于稳定排序后取前 K 个，得分相同的按页面顺序
+    top = heapq.nlargest(top_k, candidates, key=lambda x: x[0])
+    if not top:
+        return None
+    if fallback and top[0][0] < config.target.lexical_min_score:
+        logger.debug(f"最高词法得分 {top[0][0]:.2f} 低于阈值，回退为全量语义打分")
+        return _select_best_match(page_blocks, _score_blocks(page_blocks))
+
+    # 只保留候选文本块，保持原有的页面与块顺序
+    selected = {id(block) for _, _, block in top}
+    candidate_blocks = {}
+    for page_num, blocks in page_blocks.items():
+        kept = [block for block in blocks if id(block) in selected]
+        if kept:
+            candidate_blocks[page_num] = kept
+    return _select_best_match(candidate_blocks, _score_blocks(candidate_blocks))
+
+
+def _select_best_match(page_blocks: Dict[int, List[tuple]], page_scores: Dict) -> Optional[Dict]:
+    """按页面顺序选出全局最优匹配，规则与逐页处理时一致（相似度更高才替换）"""
+    best_match = None
+    for page_num in sorted(page_blocks):
+        current_match = _best_block_match(page_num, page_blocks[page_num], page_scores.get(page_num))
+        if current_match and (not best_match or current_match['confidence'] > best_match['confidence']):
+            best_match = current_match
+    return best_match
+
+
+def lexical_score(text: str) -> float:
+    """
+    文本块与目标文本的词法得分（词集合的 F1），用于廉价地粗筛候选
+
+    召回率衡量目标词出现了多少，精确率惩罚大段正文，因此短标题会排在前面
+    """
+    block_tokens = _tokenize(text)
+    if not block_tokens:
+        return 0.0
+    overlap = len(block_tokens & _target_tokens)
+    if not overlap:
+        return 0.0
+    recall = overlap / len(_target_tokens)
+    precision = overlap / len(block_tokens)
+    return 2 * recall * precision / (recall + precision)
+
+
+def _tokenize(text: str) -> Set[str]:
+    """小写、去停用词，并做最简单的复数还原（ratings -> rating）"""
+    tokens = set()
+    for token in re.findall(r'[a-z0-9]+', text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s'):
+            token = token[:-1]
+        tokens.add(token)
+    return tokens
+
+
+_target_tokens = _tokenize(target_text)
 
 
-def process_page(page) -> Optional[Dict]:
+def process_page(page, session: Optional[DocumentSession] = None) -> Optional[Dict]:
     """
     处理单个PDF页面，查找目标文本
-    
+
     Args:
         page: fitz.Page对象
-        
+        session: 调用方已经打开的 DocumentSession，逐页调用时传入以复用缓存的 TextPage；
+            不传时临时为 page.parent 创建一个
+
     Returns:
         Dict: 包含匹配结果的字典，如果没有找到匹配则返回None
     """
-    try:
-        # 获取页面文本
-        text = page.get_text()
-        if not text.strip():
-            return None
-
-        # 使用滑动窗口在页面中查找最佳匹配
-        window_size = len(target_text) * 3  # 使用3倍目标文本长度为窗口大小
-        best_match = None
-        max_confidence = 0
-
-        # 获取所有文本块
-        blocks = page.get_text("blocks")
-
-        for block in blocks:
-            block_text = block[4]  # block[4]是文本内容
-            if not block_text.strip():
-                continue
-
-            # 计算相似度
-            text_embedding = model.encode([block_text])
-            confidence = float(cosine_similarity(text_embedding, target_embedding)[0][0])
-
-            if confidence > max_confidence:
-                # 提取上下文
-                context_before = block_text[:50]  # 取前50个字符作为上文
-                context_after = block_text[-50:]  # 取后50个字符作为下文
-
-                best_match = {
-                    'page_num': page.number,
-                    'matched_text': block_text,
-                    'confidence': confidence,
-                    'text_bbox': block[:4],  # 文本块的边界框
-                    'table_bbox': None,  # 如果需要表格边界框，可以在这里添加
-                    'context_before': context_before,
-                    'context_after': context_after}
-                max_confidence = confidence
-
-        # 使用正确的配置属性名称：min_confidence_threshold
-        if best_match and best_match['confidence'] >= config.target.min_confidence_threshold:
-            return best_match
+    if session is None:
+        with DocumentSession(page.parent) as session:
+            return process_page(page, session)
 
-        return None
+    blocks = _extract_blocks(session, page.number)
+    page_scores = _score_blocks({page.number: blocks})
+    return _best_block_match(page.number, blocks, page_scores.get(page.number))
+
+
+def _extract_blocks(session: DocumentSession, page_num: int) -> List[tuple]:
+    """
+    获取页面上所有非空文本块；页面没有任何文字时返回空列表
 
+    block 格式为 (x0, y0, x1, y1, text, block_no, block_type)
+    """
+    try:
+        blocks = session.get_blocks(page_num)
+        # 与 page.get_text() 为空等价：没有任何非空的文字块（block_type == 0）
+        if not any(block[6] == 0 and block[4].strip() for block in blocks):
+            return []
+        return [block for block in blocks if block[4].strip()]
     except Exception as e:
         logger.error(f"处理页面时发生错误: {str(e)}")
+        return []
+
+
+def _score_blocks(page_blocks: Dict[int, List[tuple]]) -> Dict:
+    """
+    把多个页面的文本块合并为一次批量编码，返回 {page_num: 每个文本块与目标文本的余弦相似度数组}
+
+    向量已归一化，打分就是一次矩阵-向量乘法
+    """
+    texts = [block[4] for blocks in page_blocks.values() for block in blocks]
+    if not texts:
+        return {}
+
+    try:
+        embeddings = ModelLoader.encode_texts(texts)
+        scores = embeddings @ ModelLoader.get_target_embedding()
+    except Exception as e:
+        logger.error(f"批量编码文本块时发生错误: {str(e)}")
+        return {}
+
+    page_scores = {}
+    offset = 0
+    for page_num, blocks in page_blocks.items():
+        page_scores[page_num] = scores[offset:offset + len(blocks)]
+        offset += len(blocks)
+    return page_scores
+
+
+def _best_block_match(page_num: int, blocks: List[tuple], scores) -> Optional[Dict]:
+    """在单页的文本块中选出相似度最高且达到阈值的一个"""
+    if not blocks or scores is None:
         return None
+
+    best_match = None
+    max_confidence = 0
+
+    for block, confidence in zip(blocks, scores):
+        confidence = float(confidence)
+        block_text = block[4]  # block[4]是文本内容
+
+        if confidence > max_confidence:
+            # 提取上下文
+            context_before = block_text[:50]  # 取前50个字符作为上文
+            context_after = block_text[-50:]  # 取后50个字符作为下文
+
+            best_match = {
+                'page_num': page_num,
+                'matched_text': block_text,
+                'confidence': confidence,
+                'text_bbox': block[:4],  # 文本块的边界框
+                'table_bbox': None,  # 如果需要表格边界框，可以在这里添加
+                'context_before': context_before,
+                'context_after': context_after}
+            max_confidence = confidence
+
+    # 使用正确的配置属性名称：min_confidence_threshold
+    if best_match and best_match['confidence'] >= config.target.min_confidence_threshold:
+        return best_match
+
+    return None
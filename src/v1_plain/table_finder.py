@@ -1,8 +1,8 @@
-from typing import List, Tuple
+from collections import OrderedDict
+import re
+from typing import Callable, Dict, Iterator, List, Tuple
 
-import fitz
-
-from src.v1_plain.format_text import format_text
+from src.utils.document_session import DocumentSession
 
 
 class TableInfo:
@@ -16,80 +16,91 @@ class TableInfo:
         self.headers = []  # 新增：存储表头信息
 
 
-class TableFinder:
-    def __init__(self, doc_path: str):
-        self.doc = fitz.open(doc_path)
+# 表格检测参数
+TABLE_DETECTION_SETTINGS = dict(
+    vertical_strategy="text",  # 使用文本定位垂直线
+    horizontal_strategy="text",  # 使用文本定位水平线
+    intersection_tolerance=3,  # 交叉点容差
+    snap_tolerance=3,  # 对齐容差
+    join_tolerance=3,  # 连接容差
+    edge_min_length=3,  # 最小边长
+    min_words_vertical=3,  # 垂直方向最少词数
+    min_words_horizontal=1,  # 水平方向最少词数
+)
 
-    def find_tables_with_context(self) -> List[TableInfo]:
-        """查找文档中的所有表格，包括跨页表格，并获取表格前的文本"""
-        tables = []
+
+def caption_matches(pattern: str) -> Callable[[TableInfo], bool]:
+    """iter_tables 的停止条件：表格前置文本匹配正则 pattern（忽略大小写）"""
+    regex = re.compile(pattern, re.IGNORECASE)
+    return lambda table: bool(regex.search(table.preceding_text))
+
+
+class TableFinder:
+    def __init__(self, doc_path: str, max_cached_detections: int = 64):
+        # 表头、前置文本等带 clip 的文字提取都从会话中缓存的页面 TextPage 派生
+        self.session = DocumentSession(doc_path)
+        self.doc = self.session.doc
+        # 表格检测结果按 (页面索引, 检测参数) 缓存：_has_next_page_table 对下一页的检测在下一轮循环中直接复用
+        self.max_cached_detections = max(2, max_cached_detections)
+        self._detections: "OrderedDict[Tuple, List[tuple]]" = OrderedDict()
+        self.detections_run = 0
+
+    def find_tables_with_context(self, stop_when: Callable[[TableInfo], bool] = None,
+                                 progress_callback: Callable[[int, int], None] = None) -> List[TableInfo]:
+        """查找文档中的所有表格，包括跨页表格，并获取表格前的文本；参数见 iter_tables"""
+        return list(self.iter_tables(stop_when=stop_when, progress_callback=progress_callback))
+
+    def iter_tables(self, stop_when: Callable[[TableInfo], bool] = None,
+                    progress_callback: Callable[[int, int], None] = None) -> Iterator[TableInfo]:
+        """
+        逐个产出文档中的表格：跨页表格在确认不再延续后合并为一个产出
+
+        Args:
+            stop_when: 对每个产出的表格调用，返回 True 时产出该表格后停止扫描（如 caption_matches(...)）
+            progress_callback: 开始处理每一页时调用 progress_callback(page_num, total_pages)
+        """
         current_table = None
-        table_count = 0
-        
-        print(f"开始处理PDF文档，总页数: {len(self.doc)}")
-        
-        for page_num in range(len(self.doc)):
-            print(f"\r处理第 {page_num + 1}/{len(self.doc)} 页...", end="", flush=True)
-            page = self.doc[page_num]
-            table_rects = self._find_table_rectangles(page)
-            
+        total_pages = len(self.session)
+
+        for page_num in range(total_pages):
+            if progress_callback:
+                progress_callback(page_num, total_pages)
+            table_rects = self._find_table_rectangles(page_num)
+
             for rect in table_rects:
-                if current_table is None:
-                    # 发现新表格
-                    table_count += 1
-                    preceding_text = self._get_preceding_text(page, rect)
-                    headers = self._extract_headers(page, rect)
-                    current_table = TableInfo(
-                        start_page=page_num,
-                        end_page=page_num,
-                        bbox=rect,
-                        preceding_text=preceding_text
-                    )
-                    current_table.headers = headers
-                    
-                else:
-                    if self._is_continued_table(current_table, page_num, rect):
-                        # 更新跨页表格信息
-                        current_table.end_page = page_num
-                        current_table.bbox = self._merge_bboxes(current_table.bbox, rect)
-                    else:
-                        # 当前表格结束，输出信息并开始新表格
-                        self._print_table_info(current_table, len(tables) + 1)
-                        tables.append(current_table)
-                        
-                        # 开始新表格
-                        table_count += 1
-                        preceding_text = self._get_preceding_text(page, rect)
-                        headers = self._extract_headers(page, rect)
-                        current_table = TableInfo(
-                            start_page=page_num,
-                            end_page=page_num,
-                            bbox=rect,
-                            preceding_text=preceding_text
-                        )
-                        current_table.headers = headers
-
-                if not table_rects and current_table is not None:
-                    # 当前页没有表格，且存在未完成的表格，输出并保存
-                    self._print_table_info(current_table, len(tables) + 1)
-                    tables.append(current_table)
-                    current_table = None
+                if current_table is not None and self._is_continued_table(current_table, page_num, rect):
+                    # 更新跨页表格信息
+                    current_table.end_page = page_num
+                    current_table.bbox = self._merge_bboxes(current_table.bbox, rect)
+                    continue
+
+                if current_table is not None:
+                    # 当前表格结束
+                    yield current_table
+                    if stop_when and stop_when(current_table):
+                        return
+
+                # 发现新表格
+                current_table = TableInfo(
+                    start_page=page_num,
+                    end_page=page_num,
+                    bbox=rect,
+                    preceding_text=self._get_preceding_text(page_num, rect)
+                )
+                current_table.headers = self._extract_headers(page_num, rect)
 
             if current_table is not None and not self._has_next_page_table(page_num):
-                # 如果当前表格不会继续到下一页，输出并保存
-                self._print_table_info(current_table, len(tables) + 1)
-                tables.append(current_table)
+                # 如果当前表格不会继续到下一页
+                yield current_table
+                if stop_when and stop_when(current_table):
+                    return
                 current_table = None
 
         # 处理最后一个表格
         if current_table is not None:
-            self._print_table_info(current_table, len(tables) + 1)
-            tables.append(current_table)
+            yield current_table
 
-        print(f"\n\n处理完成，共找到 {len(tables)} 个表格。")
-        return tables
-
-    def _get_preceding_text(self, page: fitz.Page, table_rect: tuple) -> str:
+    def _get_preceding_text(self, page_num: int, table_rect: tuple) -> str:
         """获取表格上方最近的一行文本"""
         # 扩大搜索范围，获取表格上方50-100像素范围内的文本块
         search_rect = (
@@ -99,7 +110,7 @@ class TableFinder:
             table_rect[1]  # 到表格顶部
         )
         
-        blocks = page.get_text("blocks", clip=search_rect)
+        blocks = self.session.get_blocks(page_num, clip=search_rect)
         if not blocks:
             return ""
         
@@ -113,25 +124,31 @@ class TableFinder:
         closest_block = max(blocks, key=lambda b: b[3])
         return closest_block[4].strip()
 
-    def _find_table_rectangles(self, page: fitz.Page) -> List[tuple]:
-        """在页面中查找表格"""
-        # 配置表格检测参数
-        tab = page.find_tables(
-            vertical_strategy="text",  # 使用文本定位垂直线
-            horizontal_strategy="text",  # 使用文本定位水平线
-            intersection_tolerance=3,  # 交叉点容差
-            snap_tolerance=3,  # 对齐容差
-            join_tolerance=3,  # 连接容差
-            edge_min_length=3,  # 最小边长
-            min_words_vertical=3,  # 垂直方向最少词数
-            min_words_horizontal=1,  # 水平方向最少词数
-        )
-        
+    def _find_table_rectangles(self, page_num: int, settings: Dict = None) -> List[tuple]:
+        """
+        在页面中查找表格，结果按页面索引和检测参数缓存
+
+        Args:
+            page_num: 页面索引
+            settings: 传给 page.find_tables 的参数，默认为 TABLE_DETECTION_SETTINGS
+        """
+        settings = settings or TABLE_DETECTION_SETTINGS
+        key = (page_num, tuple(sorted(settings.items())))
+        if key in self._detections:
+            self._detections.move_to_end(key)
+            return self._detections[key]
+
+        tab = self.session.page(page_num).find_tables(**settings)
+        self.detections_run += 1
+
         tables = []
         if tab.tables:
             for table in tab.tables:
                 tables.append(table.bbox)
-        
+
+        self._detections[key] = tables
+        while len(self._detections) > self.max_cached_detections:
+            self._detections.popitem(last=False)
         return tables
 
     def _is_continued_table(
@@ -157,7 +174,7 @@ class TableFinder:
                 bbox2[3]  # 使用新的y1
         )
 
-    def _extract_headers(self, page: fitz.Page, table_rect: tuple) -> List[str]:
+    def _extract_headers(self, page_num: int, table_rect: tuple) -> List[str]:
         """提取表格的表头信息"""
         # 定义表头区域（表格顶部的一小部分区域）
         header_rect = (
@@ -168,7 +185,7 @@ class TableFinder:
         )
         
         # 获取表头区域的文本块
-        blocks = page.get_text("blocks", clip=header_rect)
+        blocks = self.session.get_blocks(page_num, clip=header_rect)
         if not blocks:
             return []
         
@@ -188,7 +205,8 @@ class TableFinder:
         return headers
 
     def close(self):
-        self.doc.close()
+        self._detections.clear()
+        self.session.close()
 
     @staticmethod
     def format_text(text: str) -> str:
@@ -197,21 +215,10 @@ class TableFinder:
             return ""
         return text.replace('\r', '').replace('\n', '\\n')
 
-    def _print_table_info(self, table: TableInfo, table_num: int):
-        """打印表格信息"""
-        print(f"\n\n表格 {table_num}:")
-        print(f"页码范围: {table.start_page + 1} - {table.end_page + 1}")
-        print(f"坐标: ({table.bbox[0]:.1f}, {table.bbox[1]:.1f}, "
-              f"{table.bbox[2]:.1f}, {table.bbox[3]:.1f})")
-        print(f"前置文本: {format_text(table.preceding_text)}")
-        if table.headers:
-            print(f"表头: {', '.join(format_text(header) for header in table.headers)}")
-
     def _has_next_page_table(self, current_page: int) -> bool:
         """检查下一页是否有表格延续"""
         if current_page + 1 >= len(self.doc):
             return False
         
-        next_page = self.doc[current_page + 1]
-        table_rects = self._find_table_rectangles(next_page)
+        table_rects = self._find_table_rectangles(current_page + 1)
         return len(table_rects) > 0
@@ -0,0 +1,170 @@
+"""
+批量模式：把所有待处理文件的分块打包成 Claude Message Batches 任务提交，不需要维持大量连接，
+任务结束后把结果写入分块缓存，最后由 ClaudePDFProcessor 照常合并（此时所有分块都命中缓存）
+
+    runner = ClaudeBatchRunner(ClaudePDFProcessor())
+    results = runner.run(pdf_paths)
+
+任务与每个请求的状态记录在数据库（llm_batch / llm_batch_item）中，中断后再次运行会继续轮询未结束的任务，
+已在任务中的分块不会重复提交
+"""
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sqlmodel import select
+
+from src.database import get_db
+from src.log import logger
+from src.models import LLMBatch, LLMBatchItem
+from src.v2_llm.pdf_split import PdfChunk
+from src.v2_llm.run_claude import ClaudePDFProcessor
+
+
+class ClaudeBatchRunner:
+    def __init__(self, processor: ClaudePDFProcessor):
+        self.processor = processor
+        self.config = processor.config
+        self.client = processor.client
+        # submit 时准备好的分块（_prepare 的返回值），collect 时直接复用，不再重新裁剪和分块
+        self._prepared: Dict[str, tuple] = {}
+
+    def run(self, pdf_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """提交、等待全部任务结束，然后合并每个文件的结果"""
+        self.submit(pdf_paths)
+        self.wait()
+        return self.collect(pdf_paths)
+
+    def submit(self, pdf_paths: List[str]) -> List[str]:
+        """
+        把没有缓存、也不在进行中的任务里的分块打包提交
+
+        Returns:
+            新创建的 batch id
+        """
+        with get_db() as session:
+            in_flight = set(session.exec(
+                select(LLMBatchItem.custom_id).where(LLMBatchItem.status == 'processing')).all())
+
+        pending: Dict[str, Tuple[str, PdfChunk]] = {}
+        for pdf_path in pdf_paths:
+            try:
+                prepared = self.processor._prepare(pdf_path)
+            except Exception as e:
+                logger.error(f"准备文件失败: {pdf_path}, 错误: {str(e)}")
+                continue
+            self._prepared[pdf_path] = prepared
+            _, cached_result, chunks, _ = prepared
+            if cached_result:
+                continue
+            for chunk in chunks:
+                custom_id = self.processor._chunk_cache_key(chunk)
+                # 同样内容的分块只提交一次
+                if custom_id in in_flight or custom_id in pending or custom_id in self.processor.cache:
+                    continue
+                pending[custom_id] = (Path(pdf_path).name, chunk)
+
+        batch_ids = [self._create_batch(group) for group in self._pack(pending)]
+        logger.info(f"提交了 {len(pending)} 个分块，共 {len(batch_ids)} 个批量任务")
+        return batch_ids
+
+    def _pack(self, pending: Dict[str, Tuple[str, PdfChunk]]) -> Iterator[Dict[str, Tuple[str, PdfChunk]]]:
+        """按 batch_max_requests 与 batch_max_bytes（base64 后的大小）分组"""
+        group, group_bytes = {}, 0
+        for custom_id, (paper_name, chunk) in pending.items():
+            size = len(chunk.data) * 4 // 3
+            if group and (len(group) >= self.config.batch_max_requests
+                          or group_bytes + size > self.config.batch_max_bytes):
+                yield group
+                group, group_bytes = {}, 0
+            group[custom_id] = (paper_name, chunk)
+            group_bytes += size
+        if group:
+            yield group
+
+    def _create_batch(self, group: Dict[str, Tuple[str, PdfChunk]]) -> str:
+        requests = []
+        for custom_id, (_, chunk) in group.items():
+            params = self.processor._build_request(chunk)
+            # beta 功能在整个任务的请求头中声明
+            params.pop('betas', None)
+            requests.append({'custom_id': custom_id, 'params': params})
+
+        batch = self.client.beta.messages.batches.create(requests=requests, betas=list(self.config.betas))
+        with get_db() as session:
+            session.add(LLMBatch(id=batch.id, model=self.config.model, status=batch.processing_status,
+                                 request_count=len(requests)))
+            session.add_all(LLMBatchItem(custom_id=custom_id, batch_id=batch.id, paper_name=paper_name,
+                                         pages=chunk.pages)
+                            for custom_id, (paper_name, chunk) in group.items())
+        logger.info(f"创建批量任务 {batch.id}，{len(requests)} 个请求")
+        return batch.id
+
+    def poll(self) -> int:
+        """
+        查询所有未处理结果的任务，已结束的把结果写入缓存
+
+        Returns:
+            仍在进行中的任务数
+        """
+        with get_db() as session:
+            batches = session.exec(select(LLMBatch).where(LLMBatch.ingested_at == None)).all()
+            remaining = 0
+            for batch_row in batches:
+                batch = self.client.beta.messages.batches.retrieve(batch_row.id)
+                batch_row.status = batch.processing_status
+                batch_row.updated_at = datetime.utcnow()
+                if batch.processing_status == 'ended':
+                    self._ingest(session, batch_row)
+                else:
+                    remaining += 1
+                session.add(batch_row)
+                session.commit()
+        return remaining
+
+    def wait(self):
+        """轮询直到所有任务结束，间隔从 batch_poll_initial 起每次翻倍，不超过 batch_poll_max"""
+        delay = self.config.batch_poll_initial
+        while True:
+            remaining = self.poll()
+            if not remaining:
+                return
+            logger.info(f"{remaining} 个批量任务进行中，{delay:.0f} 秒后再次查询")
+            time.sleep(delay)
+            delay = min(delay * 2, self.config.batch_poll_max)
+
+    def _ingest(self, session, batch_row: LLMBatch):
+        items = {item.custom_id: item for item in
+                 session.exec(select(LLMBatchItem).where(LLMBatchItem.batch_id == batch_row.id)).all()}
+        succeeded = 0
+        for entry in self.client.beta.messages.batches.results(batch_row.id):
+            item = items.get(entry.custom_id)
+            if item is None:
+                continue
+            result = entry.result
+            if result.type == 'succeeded':
+                try:
+                    self.processor.cache.put(entry.custom_id, self.processor._parse_chunk_response(result.message))
+                    item.status = 'succeeded'
+                    succeeded += 1
+                except json.JSONDecodeError as e:
+                    item.status, item.error = 'errored', f"invalid JSON: {e}"
+            else:
+                item.status = result.type
+                item.error = str(getattr(result, 'error', None) or result.type)
+            session.add(item)
+
+        batch_row.succeeded_count = succeeded
+        batch_row.ingested_at = datetime.utcnow()
+        logger.info(f"批量任务 {batch_row.id} 结束：{succeeded}/{batch_row.request_count} 个请求成功")
+
+    def collect(self, pdf_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        合并每个文件的结果；分块已在缓存中时不会再发请求，失败的分块会以普通请求补做
+
+        所有文件在一次 process_pdfs 中并发处理；本次 submit 过的文件复用当时的分块
+        """
+        prepared = {pdf_path: self._prepared.pop(pdf_path) for pdf_path in pdf_paths if pdf_path in self._prepared}
+        return self.processor.process_pdfs(pdf_paths, prepared=prepared)
@@ -0,0 +1,117 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+
+@dataclass
+class ClaudeConfig:
+    """Claude PDF 解析的配置"""
+    model: str = "claude-3-5-sonnet-20241022"
+    betas: tuple = ("pdfs-2024-09-25",)
+    max_tokens: int = 1024
+    # 流式输出被 max_tokens 截断时，把已输出的部分作为 assistant 前缀续写，最多续写的次数
+    max_continuations: int = 4
+    # 分块：claude 规定单个 PDF 不超过 100 页、prompt 不超过 200k token；按本地估计的每页 token 数贪心装箱，
+    # 每块不超过 chunk_size 页和 chunk_token_budget 个 token（给 prompt 和输出留出余量）；
+    # 实际预算还会收紧到 input_tokens_per_minute 以内，单个请求不会超过每分钟的输入额度
+    chunk_size: int = 100
+    chunk_token_budget: int = 150_000
+    # 每页 token 估计：页面图片的固定开销 + 文字字符数 / chars_per_token + 内嵌图片数 * tokens_per_image
+    page_base_tokens: int = 1500
+    chars_per_token: float = 4
+    tokens_per_image: int = 250
+    # 为 None 时使用官方地址；本地测试时指向 stub_server
+    base_url: Optional[str] = None
+    # 上传前先在本地定位目标表格所在页面，只上传这些页面（前后各扩展 crop_margin 页）和首页；定位不到时上传全文
+    crop_pages: bool = True
+    crop_margin: int = 2
+    # 结果缓存：整个文件与每个分块的结果分别按内容寻址缓存（gzip 压缩），超过大小或长期未使用的条目被清理
+    cache_dir: Path = field(default_factory=lambda: Path("./cache"))
+    cache_max_bytes: int = 512 * 1024 * 1024
+    cache_max_age_days: float = 90
+
+    # 并发：同时处理的文件数、所有文件合计同时在途的请求数（也是 HTTP 连接池的上限）
+    max_concurrent_papers: int = 4
+    max_concurrent_requests: int = 8
+
+    # 限速：按账号的 rate limit 填写，令牌桶按分钟匀速补充
+    requests_per_minute: int = 50
+    input_tokens_per_minute: int = 40000
+    output_tokens_per_minute: int = 8000
+
+    # 429 / 529 / 连接错误的重试：指数退避 backoff_base * 2^n，不超过 backoff_max，服务端给出 retry-after 时以其为准
+    max_retries: int = 5
+    backoff_base: float = 2.0
+    backoff_max: float = 60.0
+
+    # 批量模式（Message Batches）：每个任务最多的请求数与请求体大小，轮询间隔从 batch_poll_initial 起每次翻倍，不超过 batch_poll_max
+    batch_max_requests: int = 1000
+    batch_max_bytes: int = 200 * 1024 * 1024
+    batch_poll_initial: float = 30.0
+    batch_poll_max: float = 600.0
+
+    def __str__(self):
+        return (
+            f"Claude 配置:\n"
+            f"  模型: {self.model}\n"
+            f"  分块: 最多 {self.chunk_size} 页 / {self.chunk_token_budget} token\n"
+            f"  本地裁剪: {'开启 (前后 ' + str(self.crop_margin) + ' 页)' if self.crop_pages else '关闭'}\n"
+            f"  接口地址: {self.base_url or '官方'}\n"
+            f"  并发: {self.max_concurrent_papers} 个文件 / {self.max_concurrent_requests} 个请求\n"
+            f"  限速: {self.requests_per_minute} RPM, "
+            f"{self.input_tokens_per_minute} 输入 TPM, {self.output_tokens_per_minute} 输出 TPM\n"
+            f"  重试: 最多 {self.max_retries} 次"
+        )
+
+
+DEFAULT_CLAUDE_CONFIG = ClaudeConfig()
+
+
+@dataclass
+class GeminiConfig:
+    """Gemini PDF 解析的配置"""
+    model: str = "gemini-1.5-flash"
+    temperature: float = 1
+    top_p: float = 0.95
+    top_k: int = 40
+    max_output_tokens: int = 8192
+    # 要求直接返回 JSON，省去解析代码块
+    response_mime_type: str = "application/json"
+
+    # 上传记录与文件哈希索引所在目录；同样内容的文件在远端仍可用时直接复用，
+    # 剩余保留时间不足 reuse_min_ttl 秒的不再复用
+    cache_dir: Path = field(default_factory=lambda: Path("./cache"))
+    reuse_uploads: bool = True
+    reuse_min_ttl: float = 3600
+
+    # 并发：同时上传的文件数、同时在途的生成请求数
+    max_concurrent_uploads: int = 8
+    max_concurrent_requests: int = 4
+
+    # 上传后等待文件处理完成：所有文件共用一个轮询循环，间隔从 poll_initial 起每次翻倍，不超过 poll_max，
+    # 超过 poll_timeout 仍未就绪的文件视为失败
+    poll_initial: float = 1.0
+    poll_max: float = 30.0
+    poll_timeout: float = 600.0
+
+    @property
+    def generation_config(self) -> dict:
+        return {
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "top_k": self.top_k,
+            "max_output_tokens": self.max_output_tokens,
+            "response_mime_type": self.response_mime_type,
+        }
+
+    def __str__(self):
+        return (
+            f"Gemini 配置:\n"
+            f"  模型: {self.model}\n"
+            f"  复用上传: {'开启' if self.reuse_uploads else '关闭'}\n"
+            f"  并发: {self.max_concurrent_uploads} 个上传 / {self.max_concurrent_requests} 个请求\n"
+            f"  轮询: {self.poll_initial}s 起翻倍，最长 {self.poll_max}s，超时 {self.poll_timeout}s"
+        )
+
+
+DEFAULT_GEMINI_CONFIG = GeminiConfig()
@@ -0,0 +1,107 @@
+"""
+本地的 google.generativeai 替身，用于在不消耗额度的情况下测试 GeminiPDFProcessor 的并发上传与轮询
+
+    client = FakeGeminiClient(processing_polls=2, upload_latency=0.5)
+    processor = GeminiPDFProcessor(config=GeminiConfig(poll_initial=0.1), client=client)
+    processor.process_pdfs([...])
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from google.api_core.exceptions import NotFound
+
+from src.v2_llm.stub_server import DEFAULT_REPLY
+
+
+class FakeGeminiClient:
+    """
+    Args:
+        reply: 根据上传的文件名生成回复文本的函数，默认固定返回 DEFAULT_REPLY
+        processing_polls: 上传后前 N 次 get_file 返回 PROCESSING
+        upload_latency: 每次上传的模拟耗时（秒）
+        latency: 每次生成的模拟耗时（秒）
+        failed: 处理失败（状态为 FAILED）的文件名
+        file_ttl: 上传的文件在远端保留的时间（秒），过期后 get_file 与 SDK 一样抛出 NotFound
+        flaky_polls: 前 N 次 get_file 抛出 ConnectionError，模拟临时的网络错误
+    """
+
+    def __init__(self, reply: Callable[[str], str] = None, processing_polls: int = 1, upload_latency: float = 0.0,
+                 latency: float = 0.0, failed: tuple = (), file_ttl: float = 48 * 3600, flaky_polls: int = 0):
+        self.reply = reply or (lambda display_name: DEFAULT_REPLY)
+        self.processing_polls = processing_polls
+        self.upload_latency = upload_latency
+        self.latency = latency
+        self.failed = set(failed)
+        self.file_ttl = file_ttl
+        self.flaky_polls = flaky_polls
+
+        self._lock = threading.Lock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.uploads = 0
+        self.uploads_in_flight = 0
+        self.max_uploads_in_flight = 0  # 同时在上传的文件数峰值
+        self.polls = 0  # get_file 调用次数
+        self.requests = 0  # generate_content 调用次数
+        self.models = 0  # GenerativeModel 创建次数
+
+    def upload_file(self, path, *, mime_type: Optional[str] = None, display_name: Optional[str] = None, **kwargs):
+        with self._lock:
+            self.uploads += 1
+            self.uploads_in_flight += 1
+            self.max_uploads_in_flight = max(self.max_uploads_in_flight, self.uploads_in_flight)
+        try:
+            time.sleep(self.upload_latency)
+        finally:
+            with self._lock:
+                self.uploads_in_flight -= 1
+
+        name = f"files/{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self.files[name] = {"display_name": display_name or str(path), "polls": 0,
+                                "expiration_time": datetime.now(timezone.utc) + timedelta(seconds=self.file_ttl)}
+        return self._file(name, "PROCESSING" if self.processing_polls else "ACTIVE")
+
+    def get_file(self, name: str):
+        with self._lock:
+            self.polls += 1
+            if self.polls <= self.flaky_polls:
+                raise ConnectionError("Temporary failure in name resolution")
+            entry = self.files.get(name)
+            if entry is None or entry["expiration_time"] <= datetime.now(timezone.utc):
+                raise NotFound(f"File {name} does not exist or has expired")
+            entry["polls"] += 1
+            if entry["polls"] <= self.processing_polls:
+                state = "PROCESSING"
+            else:
+                state = "FAILED" if entry["display_name"] in self.failed else "ACTIVE"
+        return self._file(name, state)
+
+    def _file(self, name: str, state: str):
+        entry = self.files[name]
+        return SimpleNamespace(name=name, display_name=entry["display_name"], uri=f"https://fake.gemini/{name}",
+                               expiration_time=entry["expiration_time"], state=SimpleNamespace(name=state))
+
+    def GenerativeModel(self, model_name: str, generation_config: Optional[Dict] = None, **kwargs):
+        with self._lock:
+            self.models += 1
+        return _FakeModel(self)
+
+
+class _FakeModel:
+    def __init__(self, client: FakeGeminiClient):
+        self.client = client
+
+    def generate_content(self, contents: List[Any]):
+        with self.client._lock:
+            self.client.requests += 1
+        time.sleep(self.client.latency)
+        file = next(part for part in contents if hasattr(part, 'uri'))
+        text = self.client.reply(file.display_name)
+        # 与真实接口一样给出 token 用量，数值只是按文字长度粗略估计
+        usage = SimpleNamespace(prompt_token_count=len(contents[-1]) // 4,
+                                candidates_token_count=len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
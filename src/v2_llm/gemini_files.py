@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional, Union
+
+from loguru import logger
+
+
+class GeminiFileIndex:
+    """
+    持久化的 Gemini 上传记录：文件内容哈希 -> 远端文件 (name, uri, 过期时间)
+
+    上传的文件在服务端保留一段时间（目前为 48 小时），同样内容的 PDF 再次处理时先查这里，
+    远端文件仍可用就直接复用，不必重新上传和等待处理
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = Lock()
+        self._entries: Dict[str, Dict[str, Optional[str]]] = {}
+        if self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except Exception as e:
+                logger.warning(f"Failed to read Gemini file index, rebuilding: {e}")
+
+    def get(self, file_hash: str, valid_for: float = 0) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Args:
+            valid_for: 至少还要保留的秒数，快要过期的记录视为不存在
+
+        Returns:
+            {'name', 'uri', 'expiration_time'}，没有记录或即将过期时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(file_hash)
+        if entry is None:
+            return None
+        expiration_time = entry.get('expiration_time')
+        if expiration_time and (datetime.fromisoformat(expiration_time)
+                                <= datetime.now(timezone.utc) + timedelta(seconds=valid_for)):
+            self.discard(file_hash)
+            return None
+        return entry
+
+    def put(self, file_hash: str, file):
+        """记录上传得到的远端文件（google.generativeai 的 File 对象）"""
+        expiration_time = getattr(file, 'expiration_time', None)
+        if expiration_time and expiration_time.tzinfo is None:
+            expiration_time = expiration_time.replace(tzinfo=timezone.utc)
+        with self._lock:
+            self._entries[file_hash] = {
+                'name': file.name,
+                'uri': file.uri,
+                'expiration_time': expiration_time.isoformat() if expiration_time else None,
+            }
+            self._save()
+
+    def discard(self, file_hash: str):
+        with self._lock:
+            if self._entries.pop(file_hash, None) is not None:
+                self._save()
+
+    def discard_name(self, name: str):
+        """按远端文件名删除记录（远端处理失败时）"""
+        with self._lock:
+            stale = [file_hash for file_hash, entry in self._entries.items() if entry['name'] == name]
+            for file_hash in stale:
+                del self._entries[file_hash]
+            if stale:
+                self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._entries, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,137 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class _Frame:
+    __slots__ = ('kind', 'path', 'start', 'key')
+
+    def __init__(self, kind: str, path: tuple, start: int):
+        self.kind = kind  # '{' 或 '['
+        self.path = path  # 从根对象到该容器的键路径，数组元素记为 '[]'
+        self.start = start
+        self.key: Optional[str] = None  # 对象中当前值对应的键
+
+
+class IncrementalJsonParser:
+    """
+    增量解析流式返回的 JSON（结构见 run_claude.PROMPT），不必等整个回复结束：
+
+    - table.data 中的每一行一完整就由 feed 返回
+    - 遇到 "table": null 时 no_table 置为 True，调用方可以立即停止接收
+    - 回复被截断时 partial() 返回已经完整的部分，prefill() 返回可以作为 assistant 前缀续写的文字
+
+    开头的 ```json 等非 JSON 文字会被跳过
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.rows: List[Dict[str, Any]] = []
+        self.file: Optional[Dict[str, Any]] = None
+        self.table_metadata: Optional[Dict[str, Any]] = None
+        self.no_table = False
+        self.done = False  # 根对象已经闭合
+
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """追加一段文字，返回其中新完成的表格行"""
+        self.text += delta
+        rows = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            c = text[i]
+
+            if not self._started:
+                if c == '{':
+                    self._started = True
+                    self._push('{', (), i)
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if frame.kind == '{' and self._expect_key:
+                        frame.key = json.loads(text[self._string_start:i + 1])
+                        self._expect_key = False
+                self._pos += 1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in '{[':
+                parent = self._stack[-1]
+                self._push(c, parent.path + ((parent.key if parent.kind == '{' else '[]'),), i)
+            elif c in '}]':
+                row = self._pop(i)
+                if row is not None:
+                    rows.append(row)
+            elif c == ',':
+                self._expect_key = self._stack[-1].kind == '{'
+            elif c == 'n' and len(self._stack) == 1 and self._stack[0].key == 'table':
+                if len(text) - i < 4:
+                    # 等 null 完整了再判断
+                    break
+                if text[i:i + 4] == 'null':
+                    self.no_table = True
+            self._pos += 1
+        return rows
+
+    def _push(self, kind: str, path: tuple, start: int):
+        self._stack.append(_Frame(kind, path, start))
+        self._expect_key = kind == '{'
+
+    def _pop(self, end: int) -> Optional[Dict[str, Any]]:
+        frame = self._stack.pop()
+        self._expect_key = False
+        if not self._stack:
+            self.done = True
+            return None
+        if frame.kind != '{':
+            return None
+
+        path = frame.path
+        if path == ('table', 'data', '[]'):
+            row = json.loads(self.text[frame.start:end + 1])
+            self.rows.append(row)
+            return row
+        if path == ('file',):
+            self.file = json.loads(self.text[frame.start:end + 1])
+        elif path == ('table', 'metadata'):
+            self.table_metadata = json.loads(self.text[frame.start:end + 1])
+        return None
+
+    def prefill(self) -> str:
+        """
+        截断后续写用的 assistant 前缀；接口不接受以空白结尾的前缀
+
+        截断在字符串中间时退回到这个字符串的开头引号之前，由模型重新输出整个字符串，
+        否则去掉字符串结尾的空白会让续写的内容多出或少掉一个空格；之后结尾的空白都在结构之间，去掉不影响解析状态
+        """
+        if self._in_string:
+            self.text = self.text[:self._string_start]
+            self._pos = self._string_start
+            self._in_string = self._escape = False
+        self.text = self.text.rstrip()
+        self._pos = min(self._pos, len(self.text))
+        return self.text
+
+    def partial(self) -> Dict[str, Any]:
+        """已经完整解析的部分，结构与完整回复相同"""
+        table = None
+        if self.rows or self.table_metadata:
+            table = {"metadata": self.table_metadata, "data": list(self.rows)}
+        return {"file": self.file, "table": table}
@@ -0,0 +1,91 @@
+import re
+from typing import List, NamedTuple, Optional, Union
+
+import pymupdf
+
+from src.log import logger
+from src.utils.document_session import DocumentSession
+
+# 目标表格的标题，如 "Table 14: Summary of project findings and ratings"
+CAPTION_PATTERN = re.compile(r'summary\s+of\s+(the\s+)?project\s+findings\s+and\s+ratings', re.IGNORECASE)
+HEADER_KEYWORD = 'criterion'
+
+
+class CroppedPdf(NamedTuple):
+    """裁剪后的 PDF：pages[i] 为裁剪后第 i 页在原文件中的下标（从 0 开始）"""
+    data: bytes
+    pages: List[int]
+    total_pages: int
+
+
+def find_candidate_pages(session: DocumentSession) -> List[int]:
+    """
+    本地定位目标表格可能所在的页面：页面文字匹配目标表格标题，或页面上有表头包含 criterion 的表格
+
+    find_tables 较慢，只在文字中出现 criterion 的页面上运行
+    """
+    pages = []
+    for page_num in range(len(session)):
+        text = session.get_text(page_num)
+        if CAPTION_PATTERN.search(text):
+            pages.append(page_num)
+        elif HEADER_KEYWORD in text.lower() and _has_criterion_table(session.page(page_num)):
+            pages.append(page_num)
+    return pages
+
+
+def _has_criterion_table(page: pymupdf.Page) -> bool:
+    try:
+        tables = page.find_tables()
+    except Exception as e:
+        logger.debug(f"find_tables failed on page {page.number}: {e}")
+        return False
+    return any(HEADER_KEYWORD in (name or '').lower() for table in tables for name in table.header.names)
+
+
+def expand_pages(pages: List[int], margin: int, total_pages: int) -> List[int]:
+    """每个候选页前后各扩展 margin 页（跨页表格），并总是包含首页（发布日期通常在首页底部）"""
+    selected = {0}
+    for page_num in pages:
+        selected.update(range(max(0, page_num - margin), min(total_pages, page_num + margin + 1)))
+    return sorted(selected)
+
+
+def crop_to_candidate_pages(source: Union[str, pymupdf.Document], margin: int = 2) -> Optional[CroppedPdf]:
+    """
+    只保留候选页面（及其前后 margin 页和首页）组成新的 PDF
+
+    Args:
+        source: 文件路径，或调用方已经打开的文档（不会被关闭）
+
+    Returns:
+        没有找到任何候选页面时返回 None，由调用方决定是否上传全文
+    """
+    with DocumentSession(source) as session:
+        candidates = find_candidate_pages(session)
+        if not candidates:
+            return None
+
+        pages = expand_pages(candidates, margin, len(session))
+        cropped = pymupdf.open()
+        try:
+            for first, last in _ranges(pages):
+                cropped.insert_pdf(session.doc, from_page=first, to_page=last)
+            # no_new_id: 同样的页面每次生成相同的字节，分块缓存才能命中
+            data = cropped.tobytes(garbage=3, deflate=True, no_new_id=True)
+        finally:
+            cropped.close()
+        logger.info(f"Cropped {session.doc.name or 'PDF'} to {len(pages)}/{len(session)} pages "
+                    f"(candidates: {candidates})")
+        return CroppedPdf(data, pages, len(session))
+
+
+def _ranges(pages: List[int]):
+    """把有序页码合并为连续区间 [(first, last)]"""
+    start = prev = pages[0]
+    for page_num in pages[1:]:
+        if page_num != prev + 1:
+            yield start, prev
+            start = page_num
+        prev = page_num
+    yield start, prev
@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union
+
+import pymupdf
+
+from src.utils.document_session import DocumentSession
+from src.v2_llm.config import ClaudeConfig
+
+
+class PdfChunk(NamedTuple):
+    """分块后的 PDF：data 为该块的 PDF 字节，pages[i] 为块内第 i 页在原文件中的下标（从 0 开始）"""
+    data: bytes
+    pages: List[int]
+    estimated_tokens: int = 0  # 本地估计的输入 token 数
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+
+def estimate_page_tokens(session: DocumentSession, page_num: int, config: ClaudeConfig) -> int:
+    """
+    估计单页的输入 token 数：Claude 对每页同时输入渲染后的页面图片和抽取的文字，
+    图片部分近似为固定开销，文字按字符数折算，内嵌图片多的页面再额外加一些
+    """
+    text_tokens = len(session.get_text(page_num)) / config.chars_per_token
+    image_tokens = len(session.page(page_num).get_images()) * config.tokens_per_image
+    return int(config.page_base_tokens + text_tokens + image_tokens)
+
+
+def pack_pages(page_tokens: List[int], token_budget: int, max_pages: int) -> List[range]:
+    """
+    按顺序贪心装箱：当前块加上下一页会超过 token_budget 或 max_pages 时另起一块；
+    单页就超过预算时单独成块
+    """
+    chunks = []
+    start, total = 0, 0
+    for page_num, tokens in enumerate(page_tokens):
+        if page_num > start and (total + tokens > token_budget or page_num - start >= max_pages):
+            chunks.append(range(start, page_num))
+            start, total = page_num, 0
+        total += tokens
+    if page_tokens:
+        chunks.append(range(start, len(page_tokens)))
+    return chunks
+
+
+def split_pdf(source: Union[str, Path, bytes, pymupdf.Document], config: ClaudeConfig,
+              page_numbers: Optional[List[int]] = None, token_budget: Optional[int] = None) -> List[PdfChunk]:
+    """
+    把 PDF 按 token 预算分块，每块用 insert_pdf 按页码区间整体复制
+
+    Args:
+        source: 文件路径、PDF 字节（裁剪后的 PDF），或调用方已经打开的文档（不会被关闭）
+        page_numbers: source 每一页在原文件中的页码，默认与 source 相同
+        token_budget: 每块的 token 预算，默认为 config.chunk_token_budget
+    """
+    owns_doc = not isinstance(source, pymupdf.Document)
+    if not owns_doc:
+        doc = source
+    else:
+        doc = pymupdf.open(stream=source) if isinstance(source, bytes) else pymupdf.open(source)
+    with DocumentSession(doc) as session:
+        page_tokens = [estimate_page_tokens(session, page_num, config) for page_num in range(len(session))]
+    page_numbers = page_numbers or list(range(len(doc)))
+
+    chunks = []
+    try:
+        for pages in pack_pages(page_tokens, token_budget or config.chunk_token_budget, config.chunk_size):
+            chunk_doc = pymupdf.open()
+            try:
+                chunk_doc.insert_pdf(doc, from_page=pages.start, to_page=pages.stop - 1)
+                # no_new_id: 同样的页面每次生成相同的字节，分块缓存才能命中
+                data = chunk_doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+            finally:
+                chunk_doc.close()
+            chunks.append(PdfChunk(data, page_numbers[pages.start:pages.stop],
+                                   sum(page_tokens[pages.start:pages.stop])))
+    finally:
+        if owns_doc:
+            doc.close()
+    return chunks
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """
+    令牌桶：容量为每分钟（period 秒）的额度，按 capacity / period 每秒匀速补充
+
+    单次消耗可以超过当前余额（最多等到桶满再扣），余额变为负数，后续请求需要等欠额补回
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic, period: float = 60):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """还需要等待多少秒才能消耗 amount（超过容量的按容量计）"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        """按实际用量修正：预估多扣的还回去（amount 为负时补扣）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    同时限制每分钟请求数、输入 token 数和输出 token 数
+
+    请求前按估计值 acquire，拿到响应后用 usage 调用 settle 修正；收到 429 时调用 pause 让所有请求一起暂停。
+    等待中的请求按到达顺序放行。period 为额度对应的时间窗口（秒），只在测试时缩短
+    """
+
+    def __init__(self, requests_per_minute: int, input_tokens_per_minute: int, output_tokens_per_minute: int,
+                 clock: Callable[[], float] = time.monotonic, period: float = 60):
+        self._clock = clock
+        self.requests = TokenBucket(requests_per_minute, clock, period)
+        self.input_tokens = TokenBucket(input_tokens_per_minute, clock, period)
+        self.output_tokens = TokenBucket(output_tokens_per_minute, clock, period)
+        self._lock: Optional[asyncio.Lock] = None
+        self._paused_until = 0.0
+
+        self.waited_seconds = 0.0
+
+    async def acquire(self, input_tokens: int, output_tokens: int):
+        """等到三个额度都足够后扣除"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = max(self._paused_until - self._clock(),
+                           self.requests.wait_time(1),
+                           self.input_tokens.wait_time(input_tokens),
+                           self.output_tokens.wait_time(output_tokens))
+                if wait <= 0:
+                    break
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+            self.requests.consume(1)
+            self.input_tokens.consume(input_tokens)
+            self.output_tokens.consume(output_tokens)
+
+    def settle(self, estimated_input: int, estimated_output: int, actual_input: int, actual_output: int):
+        self.input_tokens.refund(estimated_input - actual_input)
+        self.output_tokens.refund(estimated_output - actual_output)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def backoff_delay(attempt: int, base: float, maximum: float, retry_after: Optional[float] = None) -> float:
+    """第 attempt 次重试（从 0 开始）前的等待秒数；服务端给出 retry-after 时以其为准"""
+    if retry_after is not None:
+        return min(retry_after, maximum)
+    return min(base * 2 ** attempt, maximum)
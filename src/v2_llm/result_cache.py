@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+
+class ResultCache:
+    """
+    按内容寻址的 LLM 结果缓存：键由调用方把影响结果的所有因素（内容哈希、prompt 哈希、模型、max_tokens 等）
+    交给 ResultCache.key 得到，任一因素变化都会换一个键，不会读到过期的结果
+
+    每个条目是一个 gzip 压缩的 JSON 文件，先写临时文件再原子替换；读取命中时刷新文件的修改时间，
+    evict 时先删除超过 max_age_days 未使用的条目，再按最久未使用的顺序删到总大小不超过 max_bytes
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024, max_age_days: float = 90):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def __contains__(self, key: str) -> bool:
+        """只检查条目是否存在，不计入命中统计"""
+        return self._path(key).exists()
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            value = None
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding corrupt cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, value: Dict):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{id(value)}.tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.writes += 1
+
+    def evict(self) -> int:
+        """按 max_age_days 和 max_bytes 清理，返回删除的条目数"""
+        entries = []
+        for path in self.cache_dir.glob("*/*.json.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        expire_before = time.time() - self.max_age_days * 86400
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime >= expire_before and total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self.evicted += removed
+        if removed:
+            logger.info(f"Evicted {removed} cache entries, {total / 1024 / 1024:.1f} MB left")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes, 'evicted': self.evicted}
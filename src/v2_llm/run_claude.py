@@ -1,22 +1,80 @@
+import asyncio
 import os
 import hashlib
 import time
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Tuple, Union
 from pathlib import Path
 import base64
 
+import anthropic
+import pymupdf
 from loguru import logger
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
+import httpx
 import json
 
+from src.utils.file_hash import FileHashIndex, mapped_file
+from src.v2_llm.config import ClaudeConfig, DEFAULT_CLAUDE_CONFIG
+from src.v2_llm.json_stream import IncrementalJsonParser
+from src.v2_llm.page_selection import crop_to_candidate_pages
+from src.v2_llm.pdf_split import PdfChunk, split_pdf
+from src.v2_llm.rate_limiter import RateLimiter, backoff_delay
+from src.v2_llm.result_cache import ResultCache
+
+PROMPT = """Please analyze this PDF document and provide the following information in a structured format:
+
+1. Find the distribution date (usually at the bottom of the first page) in YYYY-MM format. If not found, use JSON null for "distribution_date".
+
+2. Locate the table most semantically similar to "Summary of project findings and ratings". This table should contain "Summary Assessment" and "Rating" columns. The first column is typically labeled "Criterion". Create a pivoted structure with four columns (L1, L2, SummaryAssessment, Rating) where bold items in the first column are L1 indicators and non-bold items are L2 indicators.
+
+3. Provide metadata about the found table including:
+   - Start page
+   - End page
+   - Table name
+   - Confidence score (0-1) that this is the target table
+   If no matching table is found, set "table" to JSON null.
+
+Please format your response as a JSON object with this structure:
+{
+    "file": {
+        "name": "filename",
+        "total_pages": number,
+        "distribution_date": "YYYY-MM"
+    },
+    "table": {
+        "metadata": {
+            "start_page": number,
+            "end_page": number,
+            "table_name": "string",
+            "confidence": float
+        },
+        "data": [
+            {
+                "L1": "string",
+                "L2": "string",
+                "SummaryAssessment": "string",
+                "Rating": "string"
+            }
+        ]
+    }
+}"""
+
+PROMPT_HASH = hashlib.sha256(PROMPT.encode('utf-8')).hexdigest()
+PROMPT_TOKENS = len(PROMPT) // 4
+
 
 class ClaudePDFProcessor:
-    def __init__(self, api_key: str = os.environ['ANTHROPIC_API_KEY']):
-        self.client = Anthropic(api_key=api_key)
+    def __init__(self, api_key: Optional[str] = None, config: ClaudeConfig = DEFAULT_CLAUDE_CONFIG):
+        self.config = config
+        self.api_key = api_key or os.environ['ANTHROPIC_API_KEY']
+        # 显式传入 http_client：anthropic 0.39 默认构造的 httpx 客户端与 httpx 0.28 不兼容
+        self.client = Anthropic(api_key=self.api_key, base_url=config.base_url,
+                                http_client=anthropic.DefaultHttpxClient())
         self._setup_logger()
-        self.cache_dir = Path("./cache")
-        self.cache_dir.mkdir(exist_ok=True)
-        
+        self.cache = ResultCache(config.cache_dir, config.cache_max_bytes, config.cache_max_age_days)
+        self.cache.evict()
+        self.hash_index = FileHashIndex(Path(config.cache_dir) / "file_hashes.json")
+
     def _setup_logger(self):
         """设置logger配置"""
         logger.add(
@@ -26,225 +84,442 @@ class ClaudePDFProcessor:
             level="INFO"
         )
 
-    def _calculate_file_hash(self, file_path: str) -> str:
-        """计算文件的SHA256哈希值作为唯一标识"""
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+    def _calculate_file_hash(self, file_path: str, buffer=None) -> str:
+        """文件的SHA256哈希值作为唯一标识；文件大小和修改时间未变时直接使用索引中记录的值"""
+        return self.hash_index.hash(file_path, buffer)
+
+    def _request_key_parts(self) -> tuple:
+        """影响回复内容的请求参数，prompt、模型或 max_tokens 变化后旧的缓存不再命中"""
+        return PROMPT_HASH, self.config.model, self.config.max_tokens
 
-    def _get_cache_path(self, file_hash: str) -> Path:
-        """获取缓存文件路径"""
-        return self.cache_dir / f"{file_hash}.json"
+    def _file_cache_key(self, file_hash: str) -> str:
+        config = self.config
+        return ResultCache.key('file', file_hash, *self._request_key_parts(),
+                               config.crop_pages, config.crop_margin, config.chunk_size, self._chunk_token_budget())
+
+    def _chunk_cache_key(self, chunk: PdfChunk) -> str:
+        return ResultCache.key('chunk', hashlib.sha256(chunk.data).hexdigest(), *self._request_key_parts())
 
     def _read_from_cache(self, file_hash: str) -> Optional[Dict]:
-        """从缓存中读取结果"""
-        cache_path = self._get_cache_path(file_hash)
-        if cache_path.exists():
+        """从缓存中读取整个文件的合并结果"""
+        result = self.cache.get(self._file_cache_key(file_hash))
+        if result is not None:
             logger.info(f"Found cached result for file hash: {file_hash}")
-            import json
-            with open(cache_path) as f:
-                return json.load(f)
-        return None
+        return result
 
     def _save_to_cache(self, file_hash: str, result: Dict):
-        """保存结果到缓存"""
-        cache_path = self._get_cache_path(file_hash)
-        import json
-        with open(cache_path, "w") as f:
-            json.dump(result, f)
+        """保存整个文件的合并结果到缓存"""
+        self.cache.put(self._file_cache_key(file_hash), result)
         logger.info(f"Saved result to cache for file hash: {file_hash}")
 
-    def _split_pdf_content(self, pdf_content: bytes, chunk_size: int = 80) -> List[bytes]:
-        """将PDF内容分割成多个不超过chunk_size页的部分
-        claude 规定是 100，但是有可能导致 prompt 超过 200k，所以我们小一点        
-        """
-        import io
-        from PyPDF2 import PdfReader, PdfWriter
-        
-        reader = PdfReader(io.BytesIO(pdf_content))
-        total_pages = len(reader.pages)
-        print(f"Total pages: {total_pages}")
-        chunks = []
-        
-        for start in range(0, total_pages, chunk_size):
-            end = min(start + chunk_size, total_pages)
-            writer = PdfWriter()
-            
-            for page_num in range(start, end):
-                writer.add_page(reader.pages[page_num])
-            
-            output = io.BytesIO()
-            writer.write(output)
-            chunks.append(output.getvalue())
-            
+    def _log_cache_stats(self):
+        stats = self.cache.stats()
+        logger.info(f"Cache hits: {stats['hits']}, misses: {stats['misses']}, writes: {stats['writes']}")
+
+    def _chunk_token_budget(self) -> int:
+        """
+        实际使用的分块 token 预算：不超过 chunk_token_budget，也不超过每分钟的输入 token 额度
+        （扣除 prompt 和续写时带上的已输出部分）；超过额度的单个请求既会让限速器长时间停住所有请求，也会被 API 以 429 拒绝
+        """
+        config = self.config
+        headroom = config.input_tokens_per_minute - PROMPT_TOKENS - config.max_tokens * config.max_continuations
+        return max(1, min(config.chunk_token_budget, headroom))
+
+    def _split_pdf_content(self, pdf_source: Union[str, bytes, pymupdf.Document],
+                           page_numbers: Optional[List[int]] = None) -> List[PdfChunk]:
+        """
+        按 token 预算把 PDF 分割成多个部分，每块不超过 _chunk_token_budget() 个估计 token、chunk_size 页，见 pdf_split
+
+        page_numbers 为 pdf_source 每一页在原文件中的页码（裁剪过的 PDF），默认与 pdf_source 相同
+        """
+        chunks = split_pdf(pdf_source, self.config, page_numbers, self._chunk_token_budget())
+        logger.info(f"Total pages: {sum(chunk.page_count for chunk in chunks)}, "
+                    f"estimated tokens per chunk: {[chunk.estimated_tokens for chunk in chunks]}")
         return chunks
 
-    def _merge_results(self, results: List[Dict]) -> Dict:
-        """合并多个处理结果"""
+    def _build_request(self, chunk: PdfChunk) -> Dict[str, Any]:
+        """构造单个分块的请求参数"""
+        chunk_data = base64.standard_b64encode(chunk.data).decode("utf-8")
+        return dict(
+            model=self.config.model,
+            betas=list(self.config.betas),
+            max_tokens=self.config.max_tokens,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "document",
+                            "source": {
+                                "type": "base64",
+                                "media_type": "application/pdf",
+                                "data": chunk_data
+                            }
+                        },
+                        {
+                            "type": "text",
+                            "text": PROMPT
+                        }
+                    ]
+                }
+            ],
+        )
+
+    @staticmethod
+    def _parse_chunk_response(message) -> Dict:
+        """
+        把回复中的文字块拼接后解析为 JSON，兼容 ```json 代码块包裹的回复
+
+        Raises:
+            json.JSONDecodeError: 回复不是合法的 JSON
+        """
+        return parse_json_reply(''.join(block.text for block in message.content if block.type == "text"))
+
+    @staticmethod
+    def _to_original_pages(result: Dict, chunk: PdfChunk) -> Dict:
+        """回复中的页码是相对于上传的分块的（从 1 开始），换算为原文件的页码（从 1 开始）"""
+        metadata = (result.get('table') or {}).get('metadata') or {}
+        for key in ('start_page', 'end_page'):
+            page = metadata.get(key)
+            if isinstance(page, int) and 1 <= page <= chunk.page_count:
+                metadata[key] = chunk.pages[page - 1] + 1
+        return result
+
+    @staticmethod
+    def _merge_results(results: List[Dict]) -> Dict:
+        """
+        合并各分块的处理结果：没有找到表格的分块返回 "table": null，
+        表格以第一个找到表格的分块为准，后续分块的行依次追加；file 取第一个给出文件信息的分块
+        """
         if not results:
             return {}
-            
-        merged = results[0].copy()
-        
-        # 合并表格数据
-        if merged.get('table') and merged['table'].get('data'):
-            all_data = []
-            for result in results:
-                if result.get('table') and result['table'].get('data'):
-                    all_data.extend(result['table']['data'])
-            
-            # 更新合并后的表格数据
-            merged['table']['data'] = all_data
-            
-            # 更新表格元数据
-            if merged['table'].get('metadata'):
-                merged['table']['metadata'].update({
-                    'start_page': min(r['table']['metadata'].get('start_page', float('inf')) 
-                                    for r in results if r.get('table') and r['table'].get('metadata')),
-                    'end_page': max(r['table']['metadata'].get('end_page', 0) 
-                                  for r in results if r.get('table') and r['table'].get('metadata')),
-                    'confidence': max(r['table']['metadata'].get('confidence', 0) 
-                                   for r in results if r.get('table') and r['table'].get('metadata'))
-                })
-        
+
+        file = next((r['file'] for r in results if isinstance(r.get('file'), dict)), None)
+        merged = {**results[0], 'file': dict(file) if file else None, 'table': None}
+
+        tables = [r['table'] for r in results if r.get('table')]
+        if tables:
+            table = {**tables[0], 'data': [row for t in tables for row in (t.get('data') or [])]}
+            metadata = [t['metadata'] for t in tables if t.get('metadata')]
+            if metadata:
+                table['metadata'] = {**metadata[0]}
+                for key, combine in (('start_page', min), ('end_page', max), ('confidence', max)):
+                    found = [m[key] for m in metadata if m.get(key) is not None]
+                    if found:
+                        table['metadata'][key] = combine(found)
+            merged['table'] = table
+
         return merged
 
-    def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """处理PDF文件并返回结构化数据"""
-        start_time = time.time()
-        
-        try:
-            # 检查文件是否存在
-            if not os.path.exists(pdf_path):
-                raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-            
+    def _prepare(self, pdf_path: str) -> Tuple[str, Optional[Dict], List[PdfChunk], int]:
+        """
+        计算文件哈希并查缓存；未命中时读取（开启 crop_pages 时只保留候选页面）并分块
+
+        整个文件只读一次：哈希（索引未命中时）在内存映射上计算，缓存未命中时把映射复制为 bytes 打开，
+        裁剪与分块共用这一个打开的文档
+
+        Returns:
+            (file_hash, cached_result, chunks, 原文件总页数)
+        """
+        # 检查文件是否存在
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        with mapped_file(pdf_path) as pdf_buffer:
             # 计算文件哈希
-            file_hash = self._calculate_file_hash(pdf_path)
+            file_hash = self._calculate_file_hash(pdf_path, pdf_buffer)
             logger.info(f"Processing PDF: {pdf_path} (hash: {file_hash})")
-            
+
             # 检查缓存
             cached_result = self._read_from_cache(file_hash)
             if cached_result:
-                return cached_result
+                return file_hash, cached_result, [], 0
 
-            # 读取PDF文件内容
-            with open(pdf_path, "rb") as f:
-                pdf_content = f.read()
+            # pymupdf 的 stream 参数不接受 mmap
+            doc = pymupdf.open(stream=bytes(pdf_buffer), filetype="pdf")
+
+        try:
+            cropped = crop_to_candidate_pages(doc, self.config.crop_margin) if self.config.crop_pages else None
+            if cropped:
+                pdf_content, page_numbers = cropped.data, cropped.pages
+            else:
+                if self.config.crop_pages:
+                    logger.warning(f"No candidate pages found locally, uploading the whole file: {pdf_path}")
+                pdf_content, page_numbers = doc, None
 
             # 分割PDF内容
-            pdf_chunks = self._split_pdf_content(pdf_content)
+            pdf_chunks = self._split_pdf_content(pdf_content, page_numbers)
             logger.info(f"Split PDF into {len(pdf_chunks)} chunks")
+        finally:
+            doc.close()
+        total_pages = cropped.total_pages if cropped else sum(chunk.page_count for chunk in pdf_chunks)
+        return file_hash, None, pdf_chunks, total_pages
 
-            results = []
-            for i, chunk in enumerate(pdf_chunks):
-                logger.info(f"Processing chunk {i+1}/{len(pdf_chunks)}")
-                
-                # 构造提示词
-                prompt = """Please analyze this PDF document and provide the following information in a structured format:
+    def _finish(self, file_hash: str, results: List[Dict], start_time: float, total_pages: int,
+                complete: bool = True, usage: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        complete 为 False 表示有分块解析失败：合并结果照常返回，但不写入整个文件的缓存，下次运行时重试失败的分块
 
-1. Find the distribution date (usually at the bottom of the first page) in YYYY-MM format. If not found, return None.
+        usage 为本次处理实际消耗的 token 数，记录在 metadata 中
+        """
+        # 合并所有结果
+        result = self._merge_results(results)
+        if isinstance(result.get('file'), dict):
+            result['file']['total_pages'] = total_pages
 
-2. Locate the table most semantically similar to "Summary of project findings and ratings". This table should contain "Summary Assessment" and "Rating" columns. The first column is typically labeled "Criterion". Create a pivoted structure with four columns (L1, L2, SummaryAssessment, Rating) where bold items in the first column are L1 indicators and non-bold items are L2 indicators.
+        # 添加元数据
+        result["metadata"] = {
+            "exec_time": time.time() - start_time,
+            "success": True,
+            "note": "Successfully processed PDF",
+            "usage": usage or _no_usage()
+        }
 
-3. Provide metadata about the found table including:
-   - Start page
-   - End page
-   - Table name
-   - Confidence score (0-1) that this is the target table
-   If no matching table is found, return None.
+        # 保存到缓存
+        if complete:
+            self._save_to_cache(file_hash, result)
 
-Please format your response as a JSON object with this structure:
-{
-    "file": {
-        "name": "filename",
-        "total_pages": number,
-        "distribution_date": "YYYY-MM"
-    },
-    "table": {
-        "metadata": {
-            "start_page": number,
-            "end_page": number,
-            "table_name": "string",
-            "confidence": float
-        },
-        "data": [
-            {
-                "L1": "string",
-                "L2": "string",
-                "SummaryAssessment": "string",
-                "Rating": "string"
+        logger.info(f"Successfully processed PDF in {result['metadata']['exec_time']:.2f} seconds")
+        return result
+
+    @staticmethod
+    def _failure(e: Exception, start_time: float) -> Dict[str, Any]:
+        logger.error(f"Error processing PDF: {str(e)}")
+        return {
+            "file": None,
+            "table": None,
+            "metadata": {
+                "exec_time": time.time() - start_time,
+                "success": False,
+                "note": str(e)
             }
-        ]
-    }
-}"""
+        }
 
-                # 调用Claude API
-                chunk_data = base64.standard_b64encode(chunk).decode("utf-8")
-                message = self.client.beta.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    betas=["pdfs-2024-09-25"],
-                    max_tokens=1024,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "document",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": "application/pdf",
-                                        "data": chunk_data
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                }
-                            ]
-                        }
-                    ],
-                )
+    def process_pdf(self, pdf_path: str, on_row: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Any]:
+        """处理PDF文件并返回结构化数据，见 aprocess_pdfs"""
+        return asyncio.run(self.aprocess_pdf(pdf_path, on_row))
 
-                text = message.content
-                print(f"Chunk {i+1} response:", text)
+    def process_pdfs(self, pdf_paths: List[str], on_row: Optional[Callable[[str, Dict], None]] = None,
+                     prepared: Optional[Dict[str, tuple]] = None) -> Dict[str, Dict[str, Any]]:
+        """并发处理多个文件，见 aprocess_pdfs"""
+        return asyncio.run(self.aprocess_pdfs(pdf_paths, on_row, prepared))
 
-                try:
-                    chunk_result = json.loads(text)
-                    results.append(chunk_result)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse Claude response as JSON for chunk {i+1}: {e}")
-                    continue
+    async def aprocess_pdf(self, pdf_path: str, on_row: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Any]:
+        return (await self.aprocess_pdfs([pdf_path], on_row))[pdf_path]
 
-            # 合并所有结果
-            result = self._merge_results(results)
+    async def aprocess_pdfs(self, pdf_paths: List[str], on_row: Optional[Callable[[str, Dict], None]] = None,
+                            prepared: Optional[Dict[str, tuple]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        异步并发处理多个文件：最多 max_concurrent_papers 个文件同时处理，每个文件的分块并发请求，
+        所有请求共用一个连接池，在途请求数不超过 max_concurrent_requests，并经过 RateLimiter 限速
 
-            # 添加元数据
-            result["metadata"] = {
-                "exec_time": time.time() - start_time,
-                "success": True,
-                "note": "Successfully processed PDF"
-            }
+        回复以流式接收，见 _astream_chunk
 
-            # 保存到缓存
-            self._save_to_cache(file_hash, result)
-            
-            logger.info(f"Successfully processed PDF in {result['metadata']['exec_time']:.2f} seconds")
-            return result
+        Args:
+            on_row: 每解析出一行表格数据就调用 on_row(pdf_path, row)，不必等整个文件处理完
+            prepared: {pdf_path: _prepare 的返回值}，调用方已经做过哈希、裁剪与分块时传入（如 ClaudeBatchRunner），
+                这些文件不再重新准备
+
+        Returns:
+            {pdf_path: 结构化数据}
+        """
+        config = self.config
+        limits = httpx.Limits(max_connections=config.max_concurrent_requests,
+                              max_keepalive_connections=config.max_concurrent_requests)
+        # 重试由 _astream_chunk 统一处理，以便与限速器配合
+        client = AsyncAnthropic(api_key=self.api_key, base_url=config.base_url, max_retries=0,
+                                http_client=anthropic.DefaultAsyncHttpxClient(limits=limits))
+        limiter = RateLimiter(config.requests_per_minute, config.input_tokens_per_minute,
+                              config.output_tokens_per_minute)
+        paper_slots = asyncio.Semaphore(config.max_concurrent_papers)
+        request_slots = asyncio.Semaphore(config.max_concurrent_requests)
+
+        async def run_paper(pdf_path: str) -> Dict[str, Any]:
+            async with paper_slots:
+                return await self._aprocess_pdf(client, limiter, request_slots, pdf_path, on_row,
+                                                (prepared or {}).get(pdf_path))
+
+        try:
+            results = await asyncio.gather(*(run_paper(pdf_path) for pdf_path in pdf_paths))
+        finally:
+            await client.close()
+            self._log_cache_stats()
+        if limiter.waited_seconds:
+            logger.info(f"Rate limiter waited {limiter.waited_seconds:.1f} seconds in total")
+        return dict(zip(pdf_paths, results))
+
+    async def _aprocess_pdf(self, client: AsyncAnthropic, limiter: RateLimiter, request_slots: asyncio.Semaphore,
+                            pdf_path: str, on_row: Optional[Callable[[str, Dict], None]] = None,
+                            prepared: Optional[tuple] = None) -> Dict[str, Any]:
+        start_time = time.time()
+        # 本文件所有请求实际消耗的 token 数（命中缓存的分块不计）
+        usage = _no_usage()
+        try:
+            if prepared is None:
+                # 哈希与分块是同步的文件 / CPU 操作，放到线程中避免阻塞其它文件的请求
+                prepared = await asyncio.to_thread(self._prepare, pdf_path)
+            file_hash, cached_result, pdf_chunks, total_pages = prepared
+            if cached_result:
+                return {**cached_result, "metadata": {**cached_result.get("metadata", {}), "usage": usage}}
+
+            async def run_chunk(i: int, chunk: PdfChunk) -> Tuple[Optional[Dict], bool]:
+                # 每个分块的结果单独缓存，失败重跑时只需为没有缓存的分块付费
+                chunk_key = self._chunk_cache_key(chunk)
+                chunk_result = self.cache.get(chunk_key)
+                complete = True
+                if chunk_result is None:
+                    chunk_result, complete = await self._astream_chunk(
+                        client, limiter, request_slots, chunk,
+                        on_row=(lambda row: on_row(pdf_path, row)) if on_row else None, spent=usage)
+                    if chunk_result is None:
+                        logger.error(f"Failed to parse Claude response for chunk {i+1} of {pdf_path}")
+                        return None, False
+                    if complete:
+                        # 立即写入：同一文件的其它分块失败时，已付费的结果不会丢失
+                        self.cache.put(chunk_key, chunk_result)
+                    else:
+                        logger.warning(f"Keeping partial result for chunk {i+1} of {pdf_path}")
+                return self._to_original_pages(chunk_result, chunk), complete
+
+            chunk_results = await asyncio.gather(*(run_chunk(i, chunk) for i, chunk in enumerate(pdf_chunks)))
+            results = [result for result, _ in chunk_results if result is not None]
+            complete = all(complete for _, complete in chunk_results)
+            return self._finish(file_hash, results, start_time, total_pages, complete, usage)
 
         except Exception as e:
-            logger.error(f"Error processing PDF: {str(e)}")
-            return {
-                "file": None,
-                "table": None,
-                "metadata": {
-                    "exec_time": time.time() - start_time,
-                    "success": False,
-                    "note": str(e)
-                }
-            }
+            result = self._failure(e, start_time)
+            result["metadata"]["usage"] = usage
+            return result
+
+    async def _astream_chunk(self, client: AsyncAnthropic, limiter: RateLimiter, request_slots: asyncio.Semaphore,
+                             chunk: PdfChunk, on_row: Optional[Callable[[Dict], None]] = None,
+                             spent: Optional[Dict[str, int]] = None) -> Tuple[Optional[Dict], bool]:
+        """
+        流式请求单个分块，边接收边用 IncrementalJsonParser 解析：
+
+        - 模型输出 "table": null（该分块没有目标表格）时立即断开，不再为剩余输出付费
+        - 被 max_tokens 截断或连接中断时，以已输出的文字作为 assistant 前缀续写，而不是从头重来，
+          最多续写 max_continuations 次
+        - 429 / 529 / 连接错误按指数退避重试，先经过限速器
+
+        spent 不为 None 时，每次请求结束后（包括中途失败的）把实际的 token 数累加进去
+
+        Returns:
+            (结果, 是否完整)；续写次数用尽或回复不是合法 JSON 时返回已解析的部分和 False，什么都没解析出时结果为 None
+        """
+        config = self.config
+        base_request = self._build_request(chunk)
+        parser = IncrementalJsonParser()
+        start_time = time.time()
+        attempt = continuation = 0
+
+        def handle_rows(rows: List[Dict]):
+            if rows and len(parser.rows) == len(rows):
+                logger.info(f"First row after {time.time() - start_time:.2f}s")
+            if on_row:
+                for row in rows:
+                    on_row(row)
+
+        while True:
+            request = base_request
+            if parser.text:
+                request = dict(base_request, messages=base_request['messages'] + [
+                    {"role": "assistant", "content": parser.prefill()}])
+            estimated_input = chunk.estimated_tokens + PROMPT_TOKENS + len(parser.text) // 4
+            usage = _no_usage()
+
+            try:
+                async with request_slots:
+                    # 拿到连接槽位后再过限速器：排队等槽位期间收到的 429 暂停对这个请求同样生效
+                    await limiter.acquire(estimated_input, config.max_tokens)
+                    try:
+                        stop_reason = await self._astream_message(client, request, parser, usage, handle_rows)
+                    finally:
+                        # 中途失败的请求同样结算：已经开始的流式输出消耗的 token 计入限速与费用
+                        limiter.settle(estimated_input, config.max_tokens, usage['input_tokens'],
+                                       usage['output_tokens'])
+                        if spent is not None:
+                            for key in spent:
+                                spent[key] += usage[key]
+            except (anthropic.APIStatusError, anthropic.APIConnectionError, httpx.TransportError) as e:
+                # httpx.TransportError: 流式接收途中连接中断，重试时从已接收的部分续写
+                status = getattr(e, 'status_code', None)
+                if attempt == config.max_retries or status not in (None, 429, 529):
+                    raise
+                delay = backoff_delay(attempt, config.backoff_base, config.backoff_max, _retry_after(e))
+                if status == 429:
+                    # 限流是账号级的，其它请求也一起暂停
+                    limiter.pause(delay)
+                logger.warning(f"Claude API {status or 'connection error'}, retry {attempt + 1} in {delay:.1f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if parser.no_table:
+                logger.info(f"No target table in chunk, stopped stream after {len(parser.text)} chars")
+                return {"file": parser.file, "table": None}, True
+            if stop_reason == "max_tokens" and not parser.done and continuation < config.max_continuations:
+                continuation += 1
+                logger.info(f"Response truncated at max_tokens with {len(parser.rows)} rows, "
+                            f"continuing ({continuation}/{config.max_continuations})")
+                continue
+            break
+
+        try:
+            return parse_json_reply(parser.text), True
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Claude response as JSON: {e}")
+        if parser.file is None and not parser.rows:
+            return None, False
+        return parser.partial(), False
+
+    @staticmethod
+    async def _astream_message(client: AsyncAnthropic, request: Dict[str, Any], parser: IncrementalJsonParser,
+                               usage: Dict[str, int], handle_rows: Callable[[List[Dict]], None]) -> Optional[str]:
+        """
+        发送一次流式请求，把文字增量交给 parser，usage 随事件更新为实际的 token 数
 
+        Returns:
+            stop_reason；提前断开时为 None
+        """
+        stream = await client.beta.messages.create(**request, stream=True)
+        stop_reason = None
+        try:
+            async for event in stream:
+                if event.type == "message_start":
+                    usage['input_tokens'] = event.message.usage.input_tokens
+                    usage['output_tokens'] = 0
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    handle_rows(parser.feed(event.delta.text))
+                    usage['output_tokens'] += len(event.delta.text) // 4
+                    if parser.no_table:
+                        break
+                elif event.type == "message_delta":
+                    stop_reason = event.delta.stop_reason
+                    usage['output_tokens'] = event.usage.output_tokens
+        finally:
+            await stream.close()
+        return stop_reason
+
+
+def _no_usage() -> Dict[str, int]:
+    return {'input_tokens': 0, 'output_tokens': 0}
+
+
+def parse_json_reply(text: str) -> Dict:
+    """解析模型回复的 JSON，兼容 ```json 代码块包裹的回复"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    return json.loads(text)
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, 'response', None)
+    try:
+        return float(response.headers['retry-after'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
 
 
 if __name__ == "__main__":
@@ -1,94 +1,237 @@
+"""
+用 Gemini 解析 PDF，接口与 ClaudePDFProcessor 相同：
+
+    processor = GeminiPDFProcessor()
+    results = processor.process_pdfs(pdf_paths)
+
+多个文件并发上传，上传后所有文件共用一个指数退避的轮询循环等待处理完成，模型与生成参数在所有文件间复用。
+client 默认是配置好 api key 的 google.generativeai 模块，本地测试时可以传入 fake_gemini.FakeGeminiClient
+"""
+import asyncio
+import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
 import google.generativeai as genai
+from google.api_core.exceptions import NotFound, PermissionDenied
+from loguru import logger
+
+from src.utils.file_hash import FileHashIndex
+from src.v2_llm.config import GeminiConfig, DEFAULT_GEMINI_CONFIG
+from src.v2_llm.gemini_files import GeminiFileIndex
+from src.v2_llm.run_claude import PROMPT, parse_json_reply
+
+
+class GeminiPDFProcessor:
+    def __init__(self, api_key: Optional[str] = None, config: GeminiConfig = DEFAULT_GEMINI_CONFIG, client=None):
+        """
+        Args:
+            api_key: 默认读取环境变量 GEMINI_API_KEY
+            client: 提供 upload_file / get_file / GenerativeModel 的对象，默认为 google.generativeai
+        """
+        self.config = config
+        if client is None:
+            genai.configure(api_key=api_key or os.environ["GEMINI_API_KEY"])
+            client = genai
+        self.client = client
+        self.model = client.GenerativeModel(model_name=config.model, generation_config=config.generation_config)
+        # 与 ClaudePDFProcessor 共用文件哈希索引
+        self.hash_index = FileHashIndex(config.cache_dir / "file_hashes.json")
+        self.file_index = GeminiFileIndex(config.cache_dir / "gemini_files.json")
+        self._lock = threading.Lock()
+        self.reused_uploads = 0
+        logger.info(f"Initialized GeminiPDFProcessor with config:\n{config}")
+
+    def _upload(self, pdf_path: str):
+        """
+        上传单个文件（同步，由 aprocess_pdfs 放到线程中并发执行）；
+        同样内容的文件之前上传过且远端仍可用时直接复用
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        file_hash = self.hash_index.hash(pdf_path)
+        record = True
+        if self.config.reuse_uploads:
+            try:
+                file = self._find_uploaded(file_hash)
+            except Exception as e:
+                # 查询远端状态时的临时错误（网络抖动等）：保留原有的上传记录，这次另外上传一份且不覆盖记录
+                logger.warning(f"Failed to check uploaded file for {Path(pdf_path).name}, uploading again: {e}")
+                file, record = None, False
+            if file is not None:
+                logger.info(f"Reusing uploaded file {file.name} for {Path(pdf_path).name}")
+                with self._lock:
+                    self.reused_uploads += 1
+                return file
+
+        file = self.client.upload_file(pdf_path, mime_type="application/pdf", display_name=Path(pdf_path).name)
+        logger.info(f"Uploaded file '{file.display_name}' as: {file.uri}")
+        if record:
+            self.file_index.put(file_hash, file)
+        return file
+
+    def _find_uploaded(self, file_hash: str):
+        """
+        查上传记录并确认远端状态：ACTIVE 或仍在处理中的文件可以复用，已删除（404）/ 无权访问（403）/ 处理失败的记录作废；
+        其它查询错误视为临时错误，原样抛出，记录保留
+        """
+        entry = self.file_index.get(file_hash, valid_for=self.config.reuse_min_ttl)
+        if entry is None:
+            return None
+        try:
+            file = self.client.get_file(entry['name'])
+        except (NotFound, PermissionDenied) as e:
+            logger.info(f"Uploaded file {entry['name']} is no longer available: {e}")
+            self.file_index.discard(file_hash)
+            return None
+        if file.state.name not in ("ACTIVE", "PROCESSING"):
+            self.file_index.discard(file_hash)
+            return None
+        return file
+
+    async def _wait_for_files_active(self, files: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        等待上传的文件处理完成：所有文件共用一个轮询循环，每轮并发查询仍在处理中的文件，
+        间隔从 poll_initial 起每次翻倍，不超过 poll_max。
+        查询出错（网络抖动等）时保留上次的状态，下一轮再查，直到 poll_timeout 仍未就绪才算失败
+
+        Returns:
+            {pdf_path: 就绪的文件，或失败原因（Exception）}
+        """
+        config = self.config
+        # 上传失败的文件直接返回
+        ready: Dict[str, Any] = {pdf_path: file for pdf_path, file in files.items() if isinstance(file, Exception)}
+        pending = {pdf_path: file for pdf_path, file in files.items() if pdf_path not in ready}
+        errors: Dict[str, Exception] = {}  # 每个文件最近一次查询的错误
+        delay = config.poll_initial
+        deadline = time.monotonic() + config.poll_timeout
+
+        while True:
+            for pdf_path, file in list(pending.items()):
+                if file.state.name == "ACTIVE":
+                    ready[pdf_path] = pending.pop(pdf_path)
+                elif file.state.name != "PROCESSING":
+                    pending.pop(pdf_path)
+                    self.file_index.discard_name(file.name)
+                    ready[pdf_path] = RuntimeError(f"File {file.name} failed to process: {file.state.name}")
+            if not pending:
+                return ready
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for pdf_path, file in pending.items():
+                    error = errors.get(pdf_path)
+                    ready[pdf_path] = TimeoutError(f"File {file.name} not ready after {config.poll_timeout:.0f}s"
+                                                   + (f", last error: {error}" if error else ""))
+                return ready
+
+            logger.info(f"Waiting for {len(pending)} files to be processed, next check in {delay:.1f}s")
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, config.poll_max)
+            refreshed = await asyncio.gather(
+                *(asyncio.to_thread(self.client.get_file, file.name) for file in pending.values()),
+                return_exceptions=True)
+            for (pdf_path, file), result in zip(list(pending.items()), refreshed):
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to check file {file.name}, will retry: {result}")
+                    errors[pdf_path] = result
+                else:
+                    pending[pdf_path] = result
+                    errors.pop(pdf_path, None)
+
+    def _generate(self, file) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Returns:
+            (解析后的回复, 实际消耗的 token 数)
+
+        Raises:
+            json.JSONDecodeError: 回复不是合法的 JSON
+        """
+        response = self.model.generate_content([file, PROMPT])
+        logger.debug(f"Response for {file.display_name}: {response.text}")
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        usage = {'input_tokens': getattr(usage_metadata, 'prompt_token_count', 0),
+                 'output_tokens': getattr(usage_metadata, 'candidates_token_count', 0)}
+        return parse_json_reply(response.text), usage
+
+    @staticmethod
+    def _failure(e: Exception, start_time: float) -> Dict[str, Any]:
+        logger.error(f"Error processing PDF: {str(e)}")
+        return {
+            "file": None,
+            "table": None,
+            "metadata": {
+                "exec_time": time.time() - start_time,
+                "success": False,
+                "note": str(e)
+            }
+        }
+
+    def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
+        """处理PDF文件并返回结构化数据"""
+        return self.process_pdfs([pdf_path])[pdf_path]
+
+    def process_pdfs(self, pdf_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """并发处理多个文件，见 aprocess_pdfs"""
+        return asyncio.run(self.aprocess_pdfs(pdf_paths))
+
+    async def aprocess_pdf(self, pdf_path: str) -> Dict[str, Any]:
+        return (await self.aprocess_pdfs([pdf_path]))[pdf_path]
+
+    async def aprocess_pdfs(self, pdf_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        最多 max_concurrent_uploads 个文件同时上传，全部上传后统一等待处理完成，
+        再以最多 max_concurrent_requests 个并发请求生成结果
+
+        Returns:
+            {pdf_path: 与 ClaudePDFProcessor.process_pdf 相同格式的结果}
+        """
+        config = self.config
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        upload_slots = asyncio.Semaphore(config.max_concurrent_uploads)
+        request_slots = asyncio.Semaphore(config.max_concurrent_requests)
+        # SDK 的上传与生成都是阻塞调用，单独的线程池保证并发数不受默认线程池大小的限制
+        executor = ThreadPoolExecutor(max_workers=config.max_concurrent_uploads + config.max_concurrent_requests,
+                                      thread_name_prefix="gemini")
+
+        async def upload(pdf_path: str):
+            async with upload_slots:
+                return await loop.run_in_executor(executor, self._upload, pdf_path)
+
+        async def generate(pdf_path: str) -> Dict[str, Any]:
+            file = files[pdf_path]
+            if isinstance(file, Exception):
+                return self._failure(file, start_time)
+            try:
+                async with request_slots:
+                    result, usage = await loop.run_in_executor(executor, self._generate, file)
+            except Exception as e:
+                return self._failure(e, start_time)
+            result["metadata"] = {
+                "exec_time": time.time() - start_time,
+                "success": True,
+                "note": "Successfully processed PDF",
+                "usage": usage
+            }
+            return result
+
+        try:
+            uploaded = await asyncio.gather(*(upload(pdf_path) for pdf_path in pdf_paths), return_exceptions=True)
+            files = await self._wait_for_files_active(dict(zip(pdf_paths, uploaded)))
+            results = await asyncio.gather(*(generate(pdf_path) for pdf_path in pdf_paths))
+        finally:
+            executor.shutdown(wait=False)
+        logger.info(f"Processed {len(pdf_paths)} PDFs in {time.time() - start_time:.2f} seconds, "
+                    f"reused {self.reused_uploads} uploads so far")
+        return dict(zip(pdf_paths, results))
+
 
-genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-
-def upload_to_gemini(path, mime_type=None):
-  """Uploads the given file to Gemini.
-
-  See https://ai.google.dev/gemini-api/docs/prompting_with_media
-  """
-  file = genai.upload_file(path, mime_type=mime_type)
-  print(f"Uploaded file '{file.display_name}' as: {file.uri}")
-  return file
-
-def wait_for_files_active(files):
-  """Waits for the given files to be active.
-
-  Some files uploaded to the Gemini API need to be processed before they can be
-  used as prompt inputs. The status can be seen by querying the file's "state"
-  field.
-
-  This implementation uses a simple blocking polling loop. Production code
-  should probably employ a more sophisticated approach.
-  """
-  print("Waiting for file processing...")
-  for name in (file.name for file in files):
-    file = genai.get_file(name)
-    while file.state.name == "PROCESSING":
-      print(".", end="", flush=True)
-      time.sleep(10)
-      file = genai.get_file(name)
-    if file.state.name != "ACTIVE":
-      raise Exception(f"File {file.name} failed to process")
-  print("...all files ready")
-  print()
-
-# Create the model
-generation_config = {
-  "temperature": 1,
-  "top_p": 0.95,
-  "top_k": 40,
-  "max_output_tokens": 8192,
-  "response_mime_type": "text/plain",
-}
-
-model = genai.GenerativeModel(
-  model_name="gemini-1.5-flash",
-  generation_config=generation_config,
-)
-
-# TODO Make these files available on the local file system
-# You may need to update the file paths
-files = [
-  upload_to_gemini("1.10321_2024_ValTR_unep_gef_msp.pdf", mime_type="application/pdf"),
-]
-
-# Some files have a processing delay. Wait for them to be ready.
-wait_for_files_active(files)
-
-chat_session = model.start_chat(
-  history=[
-    {
-      "role": "user",
-      "parts": [
-        files[0],
-        "输出所有表格（若跨页则合并）的页数区间、坐标，以及表格之前的上一行文字的内容\n\n",
-      ],
-    },
-    {
-      "role": "model",
-      "parts": [
-        "- 表格1，页数区间：[7, 7]，坐标：[699, 126, 838, 849]，表格之前的上一行文字的内容：Table 1 Project Identification Table\n- 表格2，页数区间：[14, 14]，坐标：[878, 126, 965, 849]，表格之前的上一行文字的内容：Table 2 In-kind contributions of project partners (* indicates members of Steering Committee)\n- 表格3，页数区间：[19, 19]，坐标：[1006, 126, 1061, 849]，表格之前的上一行文字的内容：Table 3 Interview invitees and respondents, by affiliation\n- 表格4，页数区间：[24, 24]，坐标：[1175, 126, 1277, 849]，表格之前的上一行文字的内容：Table 4 ZCB project outputs and outcomes, at project launch.\n- 表格5，页数区间：[25, 25]，坐标：[1310, 126, 1415, 849]，表格之前的上一行文字的内容：Table 5 Stakeholder roles, responsibilities and anticipated behaviour changes\n- 表格6，页数区间：[29, 29]，坐标：[1566, 126, 1597, 849]，表格之前的上一行文字的内容：Table 6 Total cost of the ZCB project\n- 表格7，页数区间：[29, 29]，坐标：[1626, 126, 1722, 849]，表格之前的上一行文字的内容：Table 7 Project cost at design versus actual cost\n- 表格8，页数区间：[31, 31]，坐标：[1782, 126, 1838, 849]，表格之前的上一行文字的内容：Table 8 Elements of Theory of Change, from Terminal Review TOR\n- 表格9，页数区间：[33, 33]，坐标：[1871, 126, 1963, 849]，表格之前的上一行文字的内容：Table 9 Justification for Reformulation of Results Statements\n- 表格10，页数区间：[43, 43]，坐标：[2141, 126, 2197, 849]，表格之前的上一行文字的内容：Table 10 GEF Core Indicator 6: Targets and Achievements\n- 表格11，页数区间：[43, 43]，坐标：[2212, 126, 2317, 849]，表格之前的上一行文字的内容：Table 11 GEF Core Indicator 11: Targets and Achievements\n- 表格12，页数区间：[54, 55]，坐标：[2515, 126, 2667, 849]，表格之前的上一行文字的内容：Table 12 Examples of ZCB project outputs, by date, author, title and project component\n- 表格13，页数区间：[57, 57]，坐标：[2765, 126, 2870, 849]，表格之前的上一行文字的内容：Table 13 Proxy indicators and national data to test validity of Pathway 2 assumption\n- 表格14，页数区间：[72, 74]，坐标：[2975, 126, 3173, 849]，表格之前的上一行文字的内容：Table 14: Summary of project findings and ratings\n- 表格15，页数区间：[82, 82]，坐标：[3284, 323, 3300, 418]，表格之前的上一行文字的内容：Table 15: Implementation Plan of Recommendations\n- 表格16，页数区间：[85, 85]，坐标：[3336, 126, 3554, 849]，表格之前的上一行文字的内容：Table 16: People consulted during the Terminal Review, by family name\n- 表格17，页数区间：[86, 86]，坐标：[3585, 126, 3688, 849]，表格之前的上一行文字的内容：Table 16: People consulted during the Terminal Review, by family name\n- 表格18，页数区间：[93, 93]，坐标：[3738, 126, 3842, 849]，表格之前的上一行文字的内容：Table 18 Evidence of management response to Safeguard Standards Risks identified at project design and/or during implementation\n- 表格19，页数区间：[94, 94]，坐标：[3874, 126, 3946, 849]，表格之前的上一行文字的内容：Table 19 Observed Safeguard Standards Risks that were overlooked at project design and/or during project implementation\n- 表格20，页数区间：[94, 94]，坐标：[3978, 126, 4071, 849]，表格之前的上一行文字的内容：Table 20 Overall assessment of Safeguard Standards and Management Responsiveness\n- 表格21，页数区间：[103, 103]，坐标：[4115, 126, 4246, 849]，表格之前的上一行文字的内容：Table 21 Project Funding Sources \n- 表格22，页数区间：[103, 103]，坐标：[4278, 126, 4374, 849]，表格之前的上一行文字的内容：Table 22 Project cost at design versus actual cost\n- 表格23，页数区间：[104, 105]，坐标：[4410, 126, 4602, 849]，表格之前的上一行文字的内容：Table 23 Financial Management Table (EO template 21.03.23)\n- 表格24，页数区间：[106, 106]，坐标：[4634, 126, 4831, 849]，表格之前的上一行文字的内容：Table 24 Original and revised project budgets (Rev 1)\n- 表格25，页数区间：[112, 113]，坐标：[4947, 126, 5113, 849]，表格之前的上一行文字的内容：Table 25. ZCB Project components, outcomes and outputs\n- 表格26，页数区间：[114, 114]，坐标：[5145, 126, 5216, 849]，表格之前的上一行文字的内容：Table 26. Theory of change\n- 表格27，页数区间：[115, 115]，坐标：[5270, 126, 5440, 849]，表格之前的上一行文字的内容：Table 27. Project budget\n- 表格28，页数区间：[115, 115]，坐标：[5472, 126, 5555, 849]，表格之前的上一行文字的内容：Table 28. Disbursement amounts and schedule\n- 表格10，页数区间：[91, 91]，坐标：[4019, 126, 4124, 849]，表格之前的上一行文字的内容：(Table 10 GEF Core Indicator 6: Targets and Achievements)\n- 表格11，页数区间：[91, 91]，坐标：[4155, 126, 4261, 849]，表格之前的上一行文字的内容：(Table 11 GEF Core Indicator 11: Targets and Achievements )\n- 表格14，页数区间：[72, 74]，坐标：[2975, 126, 3173, 849]，表格之前的上一行文字的内容：Table 14: Summary of project findings and ratings\n- 表格17，页数区间：[88, 89]，坐标：[3694, 126, 3836, 849]，表格之前的上一行文字的内容：Table 17 Rating Performance: Criteria, Indicators and Means of Verification\n- 表格21，页数区间：[103, 103]，坐标：[4115, 126, 4246, 849]，表格之前的上一行文字的内容：Table 21 Project Funding Sources \n- 表格27，页数区间：[115, 115]，坐标：[5270, 126, 5440, 849]，表格之前的上一行文字的内容：Table 27. Project budget\n- 表格28，页数区间：[115, 115]，坐标：[5472, 126, 5555, 849]，表格之前的上一行文字的内容：Table 28. Disbursement amounts and schedule\n- 表格3，页数区间：[19, 19]，坐标：[1006, 126, 1061, 849]，表格之前的上一行文字的内容：Table 3 Interview invitees and respondents, by affiliation\n- 表格13，页数区间：[57, 57]，坐标：[2765, 126, 2870, 849]，表格之前的上一行文字的内容：Table 13 Proxy indicators and national data to test validity of Pathway 2 assumption\n- 表格10，页数区间：[43, 43]，坐标：[2141, 126, 2197, 849]，表格之前的上一行文字的内容：Table 10 GEF Core Indicator 6: Targets and Achievements\n- 表格11，页数区间：[43, 43]，坐标：[2212, 126, 2317, 849]，表格之前的上一行文字的内容：Table 11 GEF Core Indicator 11: Targets and Achievements\n\n",
-      ],
-    },
-    {
-      "role": "user",
-      "parts": [
-        "输出第14 个表的每一行每一个单元格的内容，并标记该单元格是否加粗\n\n\n",
-        "cool，请把这个表进行一种特殊的 pivot，具体地，对照第一列，从上往下，如果是加粗的，说明是一级指标，否则是二级指标，基于此，把原先 N 列的表格变成 N+1 列。",
-      ],
-    },
-    {
-      "role": "model",
-      "parts": [
-        "| Criterion | Summary assessment | Rating | Justification for any ratings’ changes due to validation | EOU Validated Rating |\n|---|---|---|---|---|\n| **Strategic Relevance** |  |  |  |  |\n| 1. Alignment to UNEP MTS, POW and strategic priorities | Excellent alignment | **HS** | The rating is corrected from HS to S in accordance with the weighted rating of the three sub-criteria under Strategic Relevance. | **S** |\n| 2. Alignment to Donor/Partner strategic priorities | Very good alignment | **HS** | The rating is validated. | **HS** |\n| 3. Relevance to global, regional, sub-regional and national environmental priorities | Relevance varied but overall was Satisfactory | **S** | The rating is validated. | **S** |\n| 4. Complementarity with relevant existing interventions/coherence | HS complementarity, but it was underutilized. (Pending reassessment) | **MS** | The rating is validated. | **MS** |\n| **Quality of Project Design** |  |  |  |  |\n|  | Design based on successful BEA projects, but TOC lacked some relevant market elements of ZCBs | **S** | The rating is validated. The EOU notes that, according to evidence presented in the review report, the project design had weaknesses in its TOC and lacked ‘smart’ stakeholder-related indicators at output and outcome levels in the logical framework and monitoring. | **S** |\n| **Nature of External Context** | Global pandemic of SARS COVID-19 and earthquake in Türkiye were challenging | **MU** | The rating is validated. | **MU** |\n| **Effectiveness** |  |  |  |  |\n|  | Outputs were high quality, available and well-utilized but should have been gathered together in one public access point by end of project | **HS** | The rating is validated. However, the assessment does not provide evidence of availability of outputs against baseline and indicator targets. The outputs that were delivered and assessed in the review appear to be of good quality. | **HS** |\n| 1. Availability of outputs |  | **S** |  | **S** |\n| 2. Achievement of project outcomes | Targets for outcomes were exceeded | **HS** | The rating is validated based on the evidence presented. While targets for outcomes were exceeded, the lack of evidence provided on delivery of all outputs versus delivery of key outputs weakens the causal narrative underpinning the outcome assessment. | **HS** |\n| 3. Likelihood of impact | Difficult to project, given lack of emissions data and long timeline(post-2030) for assumptions and drivers to hold for multiple countries | **ML** | The rating is validated. In addition to the justification provided by the reviewer, there are key assumptions and drivers identified in the discussion in the conclusions sections which are not addressed. | **ML** |\n| **Financial Management** |  |  |  |  |\n| 1. Adherence to UNEP’s financial policies and procedures | All policies and procedures followed | **HS** | The rating is corrected from HS to S in accordance with the weighted rating of the three sub-criteria under Financial Management. | **S** |\n| 2. Completeness of project financial information | Nearly complete, except for final audit (underway) and PM’s explanation for one budget shortfall (IFC in-kind contribution) | **MS** | The rating is validated. | **MS** |\n| 3. Communication between finance and project management staff | Regular, frequent and satisfactory; FMO and TM well informed. See above for outstanding PM items | **S** | The rating is validated. | **S** |\n| **Efficiency** | Implemented fully within timeframe (with well-justified no cost 7-month extension for MU nature of external context) | **HS** | The rating is revised from HS to S. The project had one no-cost extension. The project was implemented over the period 2021-2023 after the Covid-19 onset. Although the extension was justified by external factors in Turkey, the increased cost of project management remains. | **S** |\n| **Monitoring and Reporting** |  |  |  |  |\n| 1. Monitoring design and budgeting | Plan fully developed and designed with sufficient budget and indicators and owned by UNEP TMs and WRI PMs. | **HS** | The rating is revised reflecting a lack of adequate and smart indicators disaggregated by relevant stakeholder groups for measuring results, especially at outcome level and towards impact. . | **S** |\n| 2. Monitoring of project implementation | Plan fully developed and conducted in a timely manner by TMs and PMs. Some reporting revisions made for no-cost time extension. | **S** | The rating is validated. | **S** |\n| 3. Project reporting | Reports match other evidence examined during TR; PM submitted detailed reports of stakeholder engagement and outreach (disaggregated by gender) | **HS** | The rating is validated. | **HS** |\n| **Sustainability** |  |  |  |  |\n| 1. Socio-political sustainability | Near-term is likely, but longer term is highly dependent upon each country’s, state’s or city’s political commitments, continuity of governance and increased capabilities | **ML** | The rating is validated. | **ML** |\n| 2. Financial sustainability | Near-term, partially reliant upon international support. Long-term, the ZCB approach must demonstrate value to the financial sector in each locality and level of governance. | **ML** | The rating is validated. | **ML** |\n| 3. Institutional sustainability | ZCB advocacy by UNEP, WRI and other partners likely will persist under their respective programs, possibly driven by the Buildings Breakthrough, GlobalABC and other UNEP and UNFCCC efforts. | **L** | The rating is validated. | **L** |\n| **Factors Affecting Performance** |  |  |  |  |\n| 1. Preparation and readiness | All conditions met; first disbursement within 6 months. | **HS** | The overall rating of factors is validated. | **HS** |\n|  |  | **HS** | The rating is validated. Timeliness and engagement was supported by an experienced implementing partner and a project well situated in a nest of other EE projects. | **HS** |\n| 2. Quality of project management and supervision | Good communication maintained virtually by both parties, including smooth transitions during staff turnovers. | **HS** | The rating is validated. | **HS** |\n| 2.1 UNEP/Implementing Agency: |  | **HS** | The rating is validated. | **HS** |\n| 2.2 Partners/Executing Agency: |  | **HS** | The rating is validated. | **HS** |\n| 3. Stakeholders’ participation and cooperation | High degree of participation, exceeding targets for number of participants and balanced gender participation | **HS** | The rating is validated. | **HS** |\n| 4. Responsiveness to human rights and gender equality | Consideration given to gender equality throughout project activities, outputs and outcomes. Human rights issues addressed in discussions of informal building sector | **HS** | The rating is revised from HS to S. Moderate human rights and gender considerations demonstrated in project activities through the use of WRI tools and guides with focus on gender inclusion. Some gender sensitivity was demonstrated during implementation with “gender-balanced participation of donors” (paragraph 169). | **S** |\n| 5. Environmental and social safeguards | Safeguarding and risks well considered and monitored; no negative environmental impacts | **S** | Rating is validated. See also Annex III, for more details on the management of safeguards. | **S** |\n| 6. Country ownership and driven-ness | High degree of country and subnational ownership and driven-ness demonstrated, with many local-level ZCB policy & building efforts continuing post project | **HS** | The rating is validated. | **HS** |\n| 7. Communication and public awareness | Good awareness at local stakeholder level; global audience communication could have been improved (lacks central access point for resources, post-project; this could negatively impact ease of ZCB project replication) | **MS** | The rating is validated. | **MS** |\n| **Overall Project Performance Rating** |  | **HS**, especially considering diverse locations, short timeframe, medium-size project (& budget) and unanticipated external context (prolonged pandemic & a major earthquake) | **HS** | The overall rating is corrected based on the weighted rating scale of evaluation criteria. | **S** |\n| **Lessons learned** |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  |  |  |  |\n|  |  ",
-      ],
-    },
-  ]
-)
-
-response = chat_session.send_message("INSERT_INPUT_HERE")
-
-print(response.text)
\ No newline at end of file
+if __name__ == "__main__":
+    print(json.dumps(GeminiPDFProcessor().process_pdf("1.10321_2024_ValTR_unep_gef_msp.pdf"),
+                     ensure_ascii=False, indent=2))
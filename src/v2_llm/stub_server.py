@@ -0,0 +1,294 @@
+"""
+本地的 Anthropic Messages API 替身，用于在不消耗额度的情况下测试并发、限速、重试、流式输出与批量模式
+
+    with StubAnthropicServer(latency=0.5, rate_limit_first=2) as stub:
+        processor = ClaudePDFProcessor(api_key='stub', config=ClaudeConfig(base_url=stub.base_url))
+        processor.process_pdfs([...])
+
+也可以单独运行：python -m src.v2_llm.stub_server 8765
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# 默认回复：没有找到目标表格
+DEFAULT_REPLY = json.dumps({
+    "file": {"name": "stub.pdf", "total_pages": 0, "distribution_date": None},
+    "table": None})
+
+
+class StubAnthropicServer:
+    """
+    Args:
+        reply: 根据请求体生成回复文本的函数，默认固定返回 DEFAULT_REPLY
+        latency: 每个请求的模拟耗时（秒）
+        rate_limit_first: 前 N 个请求返回 429
+        overload_first: 接下来的 N 个请求返回 529
+        retry_after: 429 / 529 响应中的 retry-after 头（秒）
+        batch_latency: 批量任务（/v1/messages/batches）从创建到结束的模拟耗时（秒）
+        stream_chunk: 流式输出时每个 text_delta 的字符数
+        drop_streams_first: 前 N 个流式请求在第一个 text_delta 之后断开连接（响应体不完整）
+
+    回复按 max_tokens（每 token 约 4 个字符）截断，stop_reason 为 max_tokens；
+    最后一条消息是 assistant 前缀时，只返回完整回复中前缀之后的部分
+        port: 0 表示随机端口
+    """
+
+    def __init__(self, reply: Callable[[Dict], str] = None, latency: float = 0.0, rate_limit_first: int = 0,
+                 overload_first: int = 0, retry_after: Optional[float] = None, batch_latency: float = 0.0,
+                 stream_chunk: int = 16, drop_streams_first: int = 0, port: int = 0):
+        self.reply = reply or (lambda request: DEFAULT_REPLY)
+        self.latency = latency
+        self.rate_limit_first = rate_limit_first
+        self.overload_first = overload_first
+        self.retry_after = retry_after
+        self.batch_latency = batch_latency
+        self.stream_chunk = stream_chunk
+        self.drop_streams_first = drop_streams_first
+
+        self._lock = threading.Lock()
+        self.requests = 0  # 收到的请求总数（含被拒绝的）
+        self.in_flight = 0
+        self.max_in_flight = 0  # 同时在处理的请求数峰值
+        self.batches: Dict[str, Dict] = {}
+        self.batch_polls = 0  # 查询批量任务状态的次数
+        self.streams_closed_early = 0  # 客户端提前断开的流式请求数
+        self.arrivals: List[Tuple[float, int]] = []  # 每个请求的 (到达时间 time.monotonic(), 响应状态码)
+        self.usage: List[Dict[str, int]] = []  # 每个完整返回的请求在响应中报告的 token 用量（提前断开的流式请求不计）
+        self.dropped_usage: List[Dict[str, int]] = []  # 被 drop_streams_first 断开的请求已经发出的 token 数
+        self._streams = 0
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-anthropic", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _next_status(self) -> int:
+        with self._lock:
+            self.requests += 1
+            if self.requests <= self.rate_limit_first:
+                status = 429
+            elif self.requests <= self.rate_limit_first + self.overload_first:
+                status = 529
+            else:
+                status = 200
+            self.arrivals.append((time.monotonic(), status))
+            if status != 200:
+                return status
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return 200
+
+    def _handle_messages(self, request: Dict) -> Dict:
+        try:
+            time.sleep(self.latency)
+            text = self.reply(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        message = self._message(request, text)
+        with self._lock:
+            self.usage.append(dict(message["usage"]))
+        return message
+
+    def _complete(self, request: Dict, text: str) -> Tuple[str, str]:
+        """去掉 assistant 前缀并按 max_tokens 截断，返回 (输出文字, stop_reason)"""
+        messages = request.get("messages", [])
+        if messages and messages[-1]["role"] == "assistant":
+            prefix = messages[-1]["content"]
+            prefix = prefix if isinstance(prefix, str) else ''.join(block.get("text", "") for block in prefix)
+            if text.startswith(prefix):
+                text = text[len(prefix):]
+        limit = request.get("max_tokens", 1024) * 4
+        if len(text) > limit:
+            return text[:limit], "max_tokens"
+        return text, "end_turn"
+
+    def _message(self, request: Dict, text: str) -> Dict:
+        text, stop_reason = self._complete(request, text)
+        usage = {"input_tokens": len(json.dumps(request)) // 4, "output_tokens": len(text) // 4}
+        return {
+            "id": f"msg_stub_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "stub"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage}
+
+    def _take_drop(self) -> bool:
+        """这个流式请求是否要中途断开"""
+        with self._lock:
+            self._streams += 1
+            return self._streams <= self.drop_streams_first
+
+    def _stream_events(self, request: Dict, drop: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """流式请求的 SSE 事件，latency 平均分摊到每个 text_delta 上；drop 为 True 时在第一个 text_delta 之后结束"""
+        text, stop_reason = self._complete(request, self.reply(request))
+        message = self._message(request, "")
+        message.update(content=[], stop_reason=None)
+        message["usage"]["output_tokens"] = 1
+        yield "message_start", {"type": "message_start", "message": message}
+        yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}}
+        pieces = [text[i:i + self.stream_chunk] for i in range(0, len(text), self.stream_chunk)]
+        for piece in pieces:
+            time.sleep(self.latency / max(len(pieces), 1))
+            yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": piece}}
+            if drop:
+                with self._lock:
+                    self.dropped_usage.append({"input_tokens": message["usage"]["input_tokens"],
+                                               "output_tokens": len(piece) // 4})
+                return
+        yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+        with self._lock:
+            self.usage.append({"input_tokens": message["usage"]["input_tokens"], "output_tokens": len(text) // 4})
+        yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                "usage": {"output_tokens": len(text) // 4}}
+        yield "message_stop", {"type": "message_stop"}
+
+    def _create_batch(self, body: Dict) -> Dict:
+        """批量任务创建时就生成全部结果，batch_latency 秒后才标记为结束"""
+        batch_id = f"msgbatch_stub_{uuid.uuid4().hex[:12]}"
+        results = []
+        for item in body.get("requests", []):
+            message = self._message(item["params"], self.reply(item["params"]))
+            results.append({"custom_id": item["custom_id"], "result": {"type": "succeeded", "message": message}})
+        with self._lock:
+            self.batches[batch_id] = {"created_at": datetime.now(timezone.utc), "results": results}
+        return self._batch(batch_id)
+
+    def _batch(self, batch_id: str) -> Optional[Dict]:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        created_at = batch["created_at"]
+        ended = datetime.now(timezone.utc) >= created_at + timedelta(seconds=self.batch_latency)
+        count = len(batch["results"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else count, "succeeded": count if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": created_at.isoformat(),
+            "expires_at": (created_at + timedelta(hours=24)).isoformat(),
+            "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('content-length', 0)))
+                path = self.path.split('?')[0]
+                if path == '/v1/messages/batches':
+                    return self._send(200, stub._create_batch(json.loads(body)))
+                if path != '/v1/messages':
+                    return self._not_found()
+
+                status = stub._next_status()
+                if status == 429:
+                    return self._send(429, {"type": "error", "error": {"type": "rate_limit_error", "message": "stub"}})
+                if status == 529:
+                    return self._send(529, {"type": "error", "error": {"type": "overloaded_error", "message": "stub"}})
+                request = json.loads(body)
+                if request.get("stream"):
+                    drop = stub._take_drop()
+                    return self._send_stream(stub._stream_events(request, drop), drop)
+                self._send(200, stub._handle_messages(request))
+
+            def _send_stream(self, events: Iterator[Tuple[str, Dict]], drop: bool = False):
+                self.send_response(200)
+                self.send_header('content-type', 'text/event-stream')
+                self.send_header('cache-control', 'no-cache')
+                self.send_header('connection', 'close')
+                if drop:
+                    # 声明一个永远发不完的长度，客户端在连接关闭时报告响应不完整
+                    self.send_header('content-length', str(1 << 30))
+                self.end_headers()
+                try:
+                    for event, data in events:
+                        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with stub._lock:
+                        stub.streams_closed_early += 1
+                finally:
+                    events.close()
+                    with stub._lock:
+                        stub.in_flight -= 1
+                self.close_connection = True
+
+            def do_GET(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if parts[:3] != ['v1', 'messages', 'batches'] or len(parts) not in (4, 5):
+                    return self._not_found()
+                batch = stub._batch(parts[3])
+                if batch is None:
+                    return self._not_found()
+                if len(parts) == 4:
+                    with stub._lock:
+                        stub.batch_polls += 1
+                    return self._send(200, batch)
+                if parts[4] != 'results' or batch["processing_status"] != "ended":
+                    return self._not_found()
+                data = ''.join(json.dumps(line) + '\n' for line in stub.batches[parts[3]]["results"]).encode('utf-8')
+                self.send_response(200)
+                self.send_header('content-type', 'application/binary')
+                self.send_header('content-length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self):
+                self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+            def _send(self, status: int, payload: Dict):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(data)))
+                if status in (429, 529) and stub.retry_after is not None:
+                    self.send_header('retry-after', str(stub.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    server = StubAnthropicServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765).start()
+    print(f"stub listening on {server.base_url}")
+    server._thread.join()
@@ -0,0 +1,177 @@
+"""
+混合路由：先走本地解析（init_candidate_tables + merge_tables），用几项廉价的检查给结果打分，
+只有低于阈值的文章才交给 LLM（ClaudePDFProcessor / GeminiPDFProcessor）重新解析
+
+每篇文章的评分、决策与耗时记录在 route_decision 表中；已有决策的文章不会重复处理，
+交给 LLM 但还没有结果的文章（例如中途中断）下次运行时继续
+"""
+import time
+from typing import Dict, List, Optional
+
+from sqlmodel import select
+
+from src.config import ROOT_PATH
+from src.database import get_db
+from src.log import logger
+from src.models import Paper, RouteDecision
+from src.v2_llm.run_claude import ClaudePDFProcessor
+from src.v3_stable.step_2_add_candidate_tables import init_candidate_tables
+from src.v3_stable.step_3_merge_tables import merge_tables
+from src.v3_stable.step_4_dump_tables import normalize_column_name
+from src.v3_stable.step_5_pivot_table import STANDARD_L1_CRITERIA, match_criterion_to_l1
+
+# 各项检查的权重，和为 1
+SCORE_WEIGHTS = {'header': 0.3, 'rows': 0.2, 'l1_coverage': 0.3, 'continuity': 0.2}
+ROUTE_THRESHOLD = 0.75
+EXPECTED_HEADERS = ('Criterion', 'SummaryAssessment', 'Rating')
+# 目标表格通常有 10 个左右的一级指标，加上二级指标一般不超过 60 行
+EXPECTED_ROWS = (10, 60)
+
+
+def score_local_result(paper: Paper) -> Dict[str, float]:
+    """
+    给本地合并出的目标表打分，每项 0-1：
+
+    - header: 表头中 Criterion / Summary Assessment / Rating 的命中比例
+    - rows: 行数落在 EXPECTED_ROWS 区间内为 1，过少或过多按比例扣分
+    - l1_coverage: 第一列能匹配上的 STANDARD_L1_CRITERIA 的比例
+    - continuity: 合并的表格页码连续，且没有落在合并范围之外的候选表格（否则说明选表有歧义）
+    """
+    table = paper.merged_criterion_table
+    if not table or len(table) < 2:
+        return {name: 0.0 for name in SCORE_WEIGHTS}
+
+    headers = [normalize_column_name(col) for col in table[0]]
+    header = sum(name in headers for name in EXPECTED_HEADERS) / len(EXPECTED_HEADERS)
+
+    rows = len(table) - 1
+    low, high = EXPECTED_ROWS
+    rows_score = min(1.0, rows / low, high / rows)
+
+    criterion_index = headers.index('Criterion') if 'Criterion' in headers else 0
+    matched = {match_criterion_to_l1(row[criterion_index]) for row in table[1:] if criterion_index < len(row)}
+    l1_coverage = len(matched - {None}) / len(STANDARD_L1_CRITERIA)
+
+    merged = paper.merged_tables_count or 1
+    span = (paper.merged_table_end_page or 0) - (paper.merged_table_start_page or 0) + 1
+    continuity = min(1.0, merged / max(span, 1)) * merged / max(paper.criterion_tables_count or merged, merged)
+
+    return {'header': header, 'rows': rows_score, 'l1_coverage': l1_coverage, 'continuity': continuity}
+
+
+def total_score(scores: Dict[str, float]) -> float:
+    return sum(SCORE_WEIGHTS[name] * value for name, value in scores.items())
+
+
+def run_local(session, paper: Paper) -> Paper:
+    """本地解析；step 2 / step 3 已经跑过的文章直接复用数据库中的结果"""
+    if paper.criterion_tables_count is None:
+        paper, candidate_tables = init_candidate_tables(paper)
+        session.add_all(candidate_tables)
+    if paper.criterion_tables_count and paper.merged_criterion_table is None:
+        paper = merge_tables(paper)
+    return paper
+
+
+def llm_rows_to_table(data: List[Dict]) -> List[List[str]]:
+    """
+    把 LLM 返回的 (L1, L2, SummaryAssessment, Rating) 行还原为与本地合并表相同的二维数组，
+    一级指标单独占一行，后续的 step 4 / step 5 可以照常处理
+    """
+    table = [['Criterion', 'Summary Assessment', 'Rating']]
+    current_l1 = None
+    for row in data:
+        l1, l2 = row.get('L1') or '', row.get('L2') or ''
+        if l2 and l1 != current_l1:
+            table.append([l1, '', ''])
+        current_l1 = l1
+        table.append([l2 or l1, row.get('SummaryAssessment') or '', row.get('Rating') or ''])
+    return table
+
+
+def apply_llm_result(paper: Paper, result: Dict) -> bool:
+    """LLM 找到目标表格时用它替换本地合并表，返回是否替换"""
+    table = result.get('table') or {}
+    if not result['metadata']['success'] or not table.get('data'):
+        return False
+    paper.merged_criterion_table = llm_rows_to_table(table['data'])
+    paper.merged_rows_count = len(paper.merged_criterion_table)
+    metadata = table.get('metadata') or {}
+    paper.merged_table_start_page = metadata.get('start_page')
+    paper.merged_table_end_page = metadata.get('end_page')
+    return True
+
+
+def route_local(threshold: float = ROUTE_THRESHOLD):
+    """对还没有决策的文章跑本地解析并打分"""
+    with get_db() as session:
+        routed = select(RouteDecision.paper_id)
+        papers = session.scalars(select(Paper).where(Paper.id.not_in(routed))).all()
+        logger.info(f'papers count={len(papers)}')
+        for (index, paper) in enumerate(papers):
+            logger.info(f"handling [{index} / {len(papers)}] paper: {paper.name}")
+            start_time = time.time()
+            try:
+                paper = run_local(session, paper)
+            except Exception as e:
+                logger.error(f"本地解析出错: {paper.name}, 错误: {str(e)}")
+
+            scores = score_local_result(paper)
+            score = total_score(scores)
+            route = 'local' if score >= threshold else 'llm'
+            logger.info(f"score={score:.2f} {scores} -> {route}")
+            session.add(paper)
+            session.add(RouteDecision(paper=paper, score=score, scores=scores, threshold=threshold, route=route,
+                                      local_seconds=time.time() - start_time))
+            session.commit()
+
+
+def route_llm(processor: Optional[ClaudePDFProcessor] = None):
+    """
+    把评分低于阈值的文章交给 LLM 并发处理（见 process_pdfs）
+
+    Args:
+        processor: ClaudePDFProcessor 或接口相同的 GeminiPDFProcessor，默认 ClaudePDFProcessor()
+    """
+    with get_db() as session:
+        query = select(RouteDecision).where(RouteDecision.route == 'llm', RouteDecision.llm_success == None)
+        decisions = session.scalars(query).all()
+        logger.info(f'escalating {len(decisions)} papers to LLM')
+        if not decisions:
+            return
+
+        processor = processor or ClaudePDFProcessor()
+        paths = {decision.id: str(ROOT_PATH / decision.paper.name) for decision in decisions}
+        results = processor.process_pdfs(list(paths.values()))
+
+        for decision in decisions:
+            result = results[paths[decision.id]]
+            decision.llm_seconds = result['metadata']['exec_time']
+            usage = result['metadata'].get('usage') or {}
+            decision.llm_input_tokens = usage.get('input_tokens')
+            decision.llm_output_tokens = usage.get('output_tokens')
+            decision.llm_success = apply_llm_result(decision.paper, result)
+            if not decision.llm_success:
+                decision.note = result['metadata']['note'] if not result['metadata']['success'] else "LLM 未找到目标表格"
+            session.add(decision.paper)
+            session.add(decision)
+        session.commit()
+
+
+def step_hybrid_route(processor: Optional[ClaudePDFProcessor] = None, threshold: float = ROUTE_THRESHOLD):
+    route_local(threshold)
+    route_llm(processor)
+
+    with get_db() as session:
+        decisions = session.scalars(select(RouteDecision)).all()
+        escalated = [d for d in decisions if d.route == 'llm']
+        logger.info(f"{len(decisions)} papers routed, {len(escalated)} escalated to LLM "
+                    f"({sum(bool(d.llm_success) for d in escalated)} succeeded); "
+                    f"local {sum(d.local_seconds for d in decisions):.0f}s, "
+                    f"LLM {sum(d.llm_seconds or 0 for d in escalated):.0f}s, "
+                    f"{sum(d.llm_input_tokens or 0 for d in escalated)} input / "
+                    f"{sum(d.llm_output_tokens or 0 for d in escalated)} output tokens")
+
+
+if __name__ == '__main__':
+    step_hybrid_route()
@@ -1,64 +1,123 @@
-from typing import List
+import concurrent.futures
+import os
+from typing import Dict, List
 
-import pymupdf
 from sqlmodel import select
 
 from src.database import get_db
 from src.models import Paper, CandidateTable
-from src.config import ROOT_PATH
+from src.config import ROOT_PATH, OUTPUT_DIR
 from src.log import logger
+from src.utils.deadline_pool import DeadlineExceeded, DeadlinePool, WorkerCrashed
+from src.utils.document_session import DocumentSession
+from src.utils.quarantine import Quarantine
+from src.utils.scheduling import schedule
 
+# 单个文件的处理时限（秒），超时的子进程会被杀掉，文件进入隔离名单
+STEP_2_TIMEOUT = 600
+QUARANTINE_FILE = OUTPUT_DIR / "quarantine_v3.json"
 
-def init_candidate_tables(paper: Paper, progress_callback=None):
-    fn = paper.name
-    fp = ROOT_PATH / fn
-    doc = pymupdf.open(fp)
-    total_pages = len(doc)
 
-    if progress_callback:
-        progress_callback(0, total_pages)
+def find_criterion_tables(fp, progress_callback=None, light=False) -> List[Dict]:
+    """
+    找出文件中表头包含 criterion 的所有表格
+
+    light 为 True 时只在页面文字包含 criterion 的页面上运行耗时的 find_tables（用于重试隔离名单中的文件）
+
+    Returns:
+        [{page, bbox, raw_data, headers}]，page 下标从 1 开始
+    """
+    with DocumentSession(fp) as session:
+        total_pages = len(session)
 
-    candidate_tables: List[CandidateTable] = []
-    for page_index, page in enumerate(doc, 1):
-        logger.debug(f'  page {page_index}')
         if progress_callback:
-            progress_callback(page_index, total_pages)
+            progress_callback(0, total_pages)
+
+        tables_data: List[Dict] = []
+        for page_index in range(1, total_pages + 1):
+            logger.debug(f'  page {page_index}')
+            if progress_callback:
+                progress_callback(page_index, total_pages)
 
-        try:
-            tables = page.find_tables()
-        except Exception as e:
-            if "not a textpage" in str(e).lower():
+            if light and 'criterion' not in session.get_text(page_index - 1).lower():
                 continue
-            else:
-                raise e
-
-        for table in tables:
-            headers = [i.lower().strip() for i in table.header.names if i]
-            if "criterion" in headers:
-                logger.info(f'page: {page_index}, headers: {headers}')
-                raw_data = table.extract()
-                candidate_table = CandidateTable(paper=paper,
-                                                 page=page_index,
-                                                 bbox=table.bbox,
-                                                 raw_data=raw_data,
-                                                 headers=headers)
-                candidate_tables.append(candidate_table)
 
+            try:
+                tables = session.page(page_index - 1).find_tables()
+            except Exception as e:
+                if "not a textpage" in str(e).lower():
+                    continue
+                else:
+                    raise e
+
+            for table in tables:
+                headers = [i.lower().strip() for i in table.header.names if i]
+                if "criterion" in headers:
+                    logger.info(f'page: {page_index}, headers: {headers}')
+                    tables_data.append({
+                        'page': page_index,
+                        'bbox': list(table.bbox),
+                        'raw_data': table.extract(),
+                        'headers': headers})
+
+    return tables_data
+
+
+def to_candidate_tables(paper: Paper, tables_data: List[Dict]) -> List[CandidateTable]:
+    candidate_tables = [CandidateTable(paper=paper, **data) for data in tables_data]
     paper.criterion_tables_count = len(candidate_tables)
+    return candidate_tables
+
+
+def init_candidate_tables(paper: Paper, progress_callback=None):
+    tables_data = find_criterion_tables(ROOT_PATH / paper.name, progress_callback=progress_callback)
+    candidate_tables = to_candidate_tables(paper, tables_data)
     return paper, candidate_tables
 
 
-def step_2_add_candidate_tables():
+def step_2_add_candidate_tables(max_workers=None, timeout=STEP_2_TIMEOUT, quarantine_policy='retry_light',
+                                scheduling_policy='longest_first'):
+    """
+    每个文件在独立的子进程中解析（见 DeadlinePool），超过 timeout 秒或崩溃的文件进入隔离名单，
+    之后的运行按 quarantine_policy 跳过或用轻量策略重试；提交顺序见 scheduling_policy（默认页数多的先跑）
+    """
+    quarantine = Quarantine(QUARANTINE_FILE, quarantine_policy)
     with get_db() as session:
         query = select(Paper).where(Paper.criterion_tables_count == None)
         papers = session.scalars(query).all()
-        for (index, paper) in enumerate(papers[:]):
-            logger.info(f"handling [{index} / {len(papers)}] paper: {paper}")
-            paper, candidate_tables = init_candidate_tables(paper, progress_callback=None)
-            session.add(paper)
-            session.add_all(candidate_tables)
-            session.commit()
+
+        skipped = [paper.name for paper in papers if quarantine.should_skip(paper.name)]
+        if skipped:
+            logger.warning(f"跳过隔离名单中的 {len(skipped)} 个文件: {skipped}")
+        papers = schedule([paper for paper in papers if paper.name not in skipped],
+                          lambda paper: paper.page_size or 0,
+                          scheduling_policy)
+
+        with DeadlinePool(max_workers or os.cpu_count(), timeout) as pool:
+            future_to_paper = {}
+            for paper in papers:
+                light = quarantine.use_light(paper.name)
+                future = pool.submit(find_criterion_tables, str(ROOT_PATH / paper.name), light=light)
+                future_to_paper[future] = (paper, light)
+
+            for (index, future) in enumerate(concurrent.futures.as_completed(future_to_paper)):
+                paper, light = future_to_paper[future]
+                logger.info(f"handling [{index} / {len(papers)}] paper: {paper}")
+                try:
+                    tables_data = future.result()
+                except (DeadlineExceeded, WorkerCrashed) as e:
+                    quarantine.add(paper.name, str(e), 'light' if light else 'full')
+                    continue
+                except Exception as e:
+                    logger.error(f"处理文件出错: {paper.name}, 错误: {str(e)}")
+                    continue
+
+                candidate_tables = to_candidate_tables(paper, tables_data)
+                session.add(paper)
+                session.add_all(candidate_tables)
+                session.commit()
+                quarantine.remove(paper.name)
 
 
 if __name__ == '__main__':
-    step_2_add_candidate_tables()
\ No newline at end of file
+    step_2_add_candidate_tables()
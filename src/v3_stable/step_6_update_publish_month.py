@@ -1,4 +1,3 @@
-import pymupdf
 from sqlalchemy import null
 from sqlmodel import select
 
@@ -6,16 +5,14 @@ from src.database import get_db
 from src.models import Paper
 from src.config import ROOT_PATH
 from src.log import logger
+from src.utils.document_session import DocumentSession
 
 
-def find_month(page: pymupdf.Page) -> str | None:
+def find_month(text: str) -> str | None:
     """
-    从当页中使用相似度匹配找到格式接近 December 2024 的月份表示
-    Find month representation similar to 'December 2024' from the page
+    从页面文字中使用相似度匹配找到格式接近 December 2024 的月份表示
+    Find month representation similar to 'December 2024' from the page text
     """
-    # Extract all text from the page
-    text = page.get_textpage().extractText()
-    
     # Define month names
     months = [
         "January", "February", "March", "April", "May", "June",
@@ -55,10 +52,8 @@ def step_6_update_publish_month():
         papers = session.scalars(query).all()
         for (index, paper) in enumerate(papers[:]):
             logger.info(f"handling [{index} / {len(papers)}] paper: {paper.name}")
-            doc = pymupdf.open(ROOT_PATH / paper.name)
-            first_page: pymupdf.Page = doc[0]
-
-            publish_month = find_month(first_page)
+            with DocumentSession(ROOT_PATH / paper.name) as doc_session:
+                publish_month = find_month(doc_session.get_text(0))
             logger.info(f"  publish month: {publish_month}")
             paper.publish_month = publish_month
             paper.publish_month_verified = True
@@ -0,0 +1,36 @@
+import pymupdf
+import pytest
+from sqlmodel import SQLModel, create_engine
+
+import src.database
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """临时的 sqlite 数据库，替换 src.database.engine"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(src.database, 'engine', engine)
+    return engine
+
+
+def make_pdf(path, pages: int, tables: dict = None) -> str:
+    """
+    每页只有一行文字的 PDF
+
+    tables 为 {页面索引: 表格标题}，这些页面改为标题加一个 5 行 3 列的文字表格（find_tables 按文字对齐识别）
+    """
+    tables = tables or {}
+    doc = pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i not in tables:
+            page.insert_text((72, 72), f"{path.stem} page {i + 1}")
+            continue
+        page.insert_text((300, 200), tables[i])
+        for row in range(5):
+            for col, x in enumerate((72, 250, 430)):
+                page.insert_text((x, 240 + row * 20), f"Cell{row}{col} p{i + 1}")
+    doc.save(path)
+    doc.close()
+    return str(path)
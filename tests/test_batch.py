@@ -0,0 +1,28 @@
+from src.v2_llm.batch import ClaudeBatchRunner
+from src.v2_llm.config import ClaudeConfig
+from src.v2_llm.run_claude import ClaudePDFProcessor
+from src.v2_llm.stub_server import StubAnthropicServer
+from tests.conftest import make_pdf
+
+
+def test_collect_reuses_chunks_from_submit(tmp_path, database, monkeypatch):
+    pdf_paths = [make_pdf(tmp_path / f"{i}.pdf", pages=3 + i) for i in range(3)]
+
+    with StubAnthropicServer() as stub:
+        config = ClaudeConfig(base_url=stub.base_url, cache_dir=tmp_path / 'cache', crop_pages=False,
+                              chunk_size=2, batch_poll_initial=0.05)
+        processor = ClaudePDFProcessor(api_key='stub', config=config)
+        prepared = []
+        prepare = processor._prepare
+        monkeypatch.setattr(processor, '_prepare', lambda pdf_path: prepared.append(pdf_path) or prepare(pdf_path))
+        runs = []
+        process_pdfs = processor.process_pdfs
+        monkeypatch.setattr(processor, 'process_pdfs',
+                            lambda *args, **kwargs: runs.append(args) or process_pdfs(*args, **kwargs))
+
+        results = ClaudeBatchRunner(processor).run(pdf_paths)
+
+    assert sorted(prepared) == sorted(pdf_paths)
+    assert len(runs) == 1
+    assert stub.requests == 0
+    assert all(result['metadata']['success'] for result in results.values())
@@ -0,0 +1,122 @@
+import json
+
+import pandas as pd
+import pytest
+
+import src.v1_plain.checkpoint as checkpoint
+from src.v1_plain.checkpoint import CheckpointJournal, _parse_bbox
+
+MATCH = {'page_num': 3, 'confidence': 0.8, 'matched_text': 'Ratings', 'text_bbox': (1.0, 2.0, 3.0, 4.0),
+         'table_bbox': None}
+
+
+def _result(file_name: str) -> dict:
+    return {'file_name': file_name, 'status': 'success', 'page_number': 4, 'matched_text': 'Ratings',
+            'confidence': 0.9, 'text_bbox': '(1.0, 2.0, 3.0, 4.0)', 'table_bbox': None}
+
+
+def _reload(path) -> tuple:
+    journal = CheckpointJournal(path)
+    loaded = journal.load()
+    journal.close()
+    return loaded
+
+
+def test_replay_skips_a_truncated_last_line(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(path)
+    journal.load()
+    journal.record_page('a.pdf', 3, MATCH)
+    journal.record_result(_result('b.pdf'))
+    journal.close()
+    # 进程在写最后一行时崩溃
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "page", "file_name": "c.pdf", "last_pa')
+
+    results, page_progress, best_matches = _reload(path)
+
+    assert results == [_result('b.pdf')]
+    assert page_progress == {'a.pdf': 3}
+    assert best_matches == {'a.pdf': MATCH}
+    # 回放后压缩成快照，残缺行不再保留
+    assert all(json.loads(line) for line in path.read_text(encoding='utf-8').splitlines())
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 2
+
+
+def test_result_supersedes_page_events(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(path)
+    journal.load()
+    journal.record_page('a.pdf', 3, MATCH)
+    journal.record_page('a.pdf', 7, MATCH)
+    journal.record_result(_result('a.pdf'))
+    # 成功之后的页面进度（例如被中断的重复任务写入的）不再生效
+    journal.record_page('a.pdf', 9)
+    journal.record_page('b.pdf', 2)
+    journal.close()
+
+    results, page_progress, best_matches = _reload(path)
+
+    assert results == [_result('a.pdf')]
+    assert page_progress == {'b.pdf': 2}
+    assert best_matches == {}
+
+
+def test_compact_replaces_the_journal_atomically(tmp_path, monkeypatch):
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(path)
+    journal.load()
+    journal.record_page('a.pdf', 3, MATCH)
+    journal.record_result(_result('b.pdf'))
+    journal.close()
+    before = path.read_bytes()
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    # 快照写到一半失败：原日志保持不变
+    monkeypatch.setattr(checkpoint.os, 'fsync', fail)
+    with pytest.raises(OSError):
+        CheckpointJournal(path).load()
+    assert path.read_bytes() == before
+
+    monkeypatch.undo()
+    assert _reload(path)[1] == {'a.pdf': 3}
+
+
+def test_legacy_csv_files_are_imported_once(tmp_path):
+    progress_file = tmp_path / 'progress.csv'
+    page_progress_file = tmp_path / 'page_progress.csv'
+    pd.DataFrame([_result('a.pdf'), {**_result('b.pdf'), 'status': 'not_found'}]).to_csv(progress_file, index=False)
+    pd.DataFrame([
+        {'file_name': 'c.pdf', 'last_page': 5, 'best_match_page': 2, 'best_match_confidence': 0.7,
+         'best_match_text': 'Ratings', 'best_match_bbox': '(1.0, 2.0, 3.0, 4.0)', 'best_match_table_bbox': None},
+        {'file_name': 'd.pdf', 'last_page': 1, 'best_match_page': None, 'best_match_confidence': None,
+         'best_match_text': None, 'best_match_bbox': None, 'best_match_table_bbox': None},
+    ]).to_csv(page_progress_file, index=False)
+    path = tmp_path / 'checkpoint.jsonl'
+
+    journal = CheckpointJournal(path, legacy_progress_file=progress_file, legacy_page_progress_file=page_progress_file)
+    results, page_progress, best_matches = journal.load()
+    journal.close()
+
+    assert [result['file_name'] for result in results] == ['a.pdf']
+    assert page_progress == {'c.pdf': 5, 'd.pdf': 1}
+    assert best_matches == {'c.pdf': {'page_num': 2, 'confidence': 0.7, 'matched_text': 'Ratings',
+                                      'text_bbox': (1.0, 2.0, 3.0, 4.0), 'table_bbox': None}}
+
+    # 之后从断点日志加载，CSV 的改动不再生效
+    progress_file.unlink()
+    assert _reload(path)[1:] == (page_progress, best_matches)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ('(1.0, 2.0, 3.0, 4.0)', (1.0, 2.0, 3.0, 4.0)),
+    ('[1, 2, 3, 4]', (1, 2, 3, 4)),
+    ('None', None),
+    ('', None),
+    (float('nan'), None),
+    ('Rect(1, 2, 3, 4)', None),
+])
+def test_parse_bbox(value, expected):
+    assert _parse_bbox(value) == expected
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from src.utils.deadline_pool import DeadlineExceeded, DeadlinePool, WorkerCrashed
+
+
+def _parent_pid():
+    return os.getppid()
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _crash():
+    os._exit(3)
+
+
+@pytest.fixture
+def background_thread():
+    """模拟 Live 刷新线程：进程池补充子进程时父进程中已有其他线程在运行"""
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait, daemon=True)
+    thread.start()
+    yield
+    stop.set()
+    thread.join()
+
+
+def test_workers_are_forked_from_zygote_and_replaced_after_kill_and_crash(background_thread):
+    with DeadlinePool(2, timeout=0.5, mp_context=multiprocessing.get_context('fork')) as pool:
+        zygote_pid = pool._zygote.pid
+        assert pool.submit(_parent_pid).result() == zygote_pid
+
+        with pytest.raises(DeadlineExceeded):
+            pool.submit(_sleep, 10).result()
+        with pytest.raises(WorkerCrashed):
+            pool.submit(_crash).result()
+
+        # 补充的子进程同样由 zygote fork，而不是由父进程的调度线程 fork
+        results = [pool.submit(_parent_pid) for _ in range(4)]
+        assert {future.result() for future in results} == {zygote_pid}
+        assert pool.submit(_sleep, 0.01).result() == 0.01
+        assert (pool.killed, pool.crashed) == (1, 1)
+    assert pool._zygote is None
+
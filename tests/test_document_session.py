@@ -0,0 +1,41 @@
+import pymupdf
+import pytest
+
+from src.utils.document_session import DocumentSession
+
+CLIPS = [
+    (0, 0, 300, 200),
+    (72, 95, 400, 140),  # 横切过一行文字
+    (100, 60, 180, 400),  # 竖切过单词中间
+    (50, 300, 560, 305),  # 只擦到字形边缘
+    (0, 0, 612, 792),
+]
+
+
+@pytest.fixture
+def doc():
+    doc = pymupdf.open()
+    page = doc.new_page()
+    y = 80
+    for size in (9, 12, 18):
+        for line in ("Summary Assessment and Rating", "Criterion  Highly Satisfactory (HS)"):
+            page.insert_text((72, y), line, fontsize=size)
+            y += size * 1.6
+    page.insert_textbox((300, 300, 560, 500), "Overall Project Rating " * 12, fontsize=10)
+    yield doc
+    doc.close()
+
+
+@pytest.mark.parametrize("clip", CLIPS)
+def test_clipped_blocks_match_native_get_text(doc, clip):
+    with DocumentSession(doc) as session:
+        assert session.get_blocks(0, clip=clip) == doc[0].get_text("blocks", clip=clip)
+
+
+def test_clipped_blocks_are_cached_per_clip(doc):
+    with DocumentSession(doc) as session:
+        session.get_blocks(0)
+        first = session.get_blocks(0, clip=CLIPS[0])
+        assert session.get_blocks(0, clip=CLIPS[0]) is first
+        session.get_blocks(0, clip=CLIPS[1])
+        assert session.textpages_built == 3
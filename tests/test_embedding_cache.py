@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.v1_plain.embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+
+
+def _nul_terminated_text(cache: EmbeddingCache) -> str:
+    """找一个键以 \\0 结尾的文本（约 1/256 的概率）"""
+    for i in range(100_000):
+        text = f"text {i}"
+        if cache._key(text).endswith(b'\0'):
+            return text
+    raise AssertionError("no NUL-terminated digest found")
+
+
+def _vector(value: float) -> np.ndarray:
+    return np.full((1, 4), value, dtype=np.float32)
+
+
+def test_nul_terminated_key_survives_reload_evict_and_reuse(tmp_path):
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=4, evict_fraction=0.25)
+    old_text = _nul_terminated_text(cache)
+    cache.put_many([old_text], _vector(1))
+    for i, text in enumerate(["a", "b", "c"]):
+        cache.put_many([text], _vector(i + 2))
+    cache.flush()
+
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=4, evict_fraction=0.25)
+    assert len(cache) == 4
+    assert np.array_equal(cache.get_many([old_text])[0], _vector(1)[0])
+
+    # old_text 变成最近使用的，先淘汰 "a"，再把 old_text 以外的都用一遍，让它成为最久未使用的
+    cache.put_many(["d"], _vector(5))
+    assert cache.get_many(["a"]) == [None]
+    cache.get_many(["b", "c", "d"])
+    cache.put_many(["e"], _vector(6))
+
+    # 淘汰 old_text 后它的槽位被 "e" 复用，旧键不能再命中到 "e" 的向量
+    assert cache.get_many([old_text]) == [None]
+    assert np.array_equal(cache.get_many(["e"])[0], _vector(6)[0])
+    assert len(cache) == 4
+    cache.flush()
+
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=4, evict_fraction=0.25)
+    assert cache.get_many([old_text]) == [None]
+    assert np.array_equal(cache.get_many(["e"])[0], _vector(6)[0])
+    assert len(cache) == 4
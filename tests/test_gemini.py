@@ -0,0 +1,146 @@
+import time
+
+import pytest
+
+from src.v2_llm.config import GeminiConfig
+from src.v2_llm.fake_gemini import FakeGeminiClient
+from src.v2_llm.run_gemini import GeminiPDFProcessor
+from tests.conftest import make_pdf
+
+
+@pytest.fixture
+def pdf_paths(tmp_path):
+    return [make_pdf(tmp_path / f"{i}.pdf", pages=1) for i in range(6)]
+
+
+def _processor(tmp_path, client, **config) -> GeminiPDFProcessor:
+    config = GeminiConfig(cache_dir=tmp_path / 'cache', poll_initial=0.01, poll_max=0.05, **config)
+    return GeminiPDFProcessor(config=config, client=client)
+
+
+def test_uploads_run_concurrently_and_share_one_poll_loop(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=2, upload_latency=0.2)
+    results = _processor(tmp_path, client, max_concurrent_uploads=3).process_pdfs(pdf_paths)
+
+    assert all(result['metadata']['success'] for result in results.values())
+    assert client.uploads == 6
+    assert client.max_uploads_in_flight == 3
+    # 每轮一起查询所有仍在处理中的文件：每个文件两次 PROCESSING、一次 ACTIVE，没有多余的查询
+    assert client.polls == 6 * 3
+    assert client.models == 1
+    assert client.requests == 6
+
+
+def test_transient_poll_errors_are_retried(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=1, flaky_polls=8)
+    results = _processor(tmp_path, client).process_pdfs(pdf_paths)
+
+    assert all(result['metadata']['success'] for result in results.values())
+    assert client.polls > 8
+
+
+def test_poll_errors_fail_only_after_poll_timeout(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=1, flaky_polls=10 ** 6)
+    results = _processor(tmp_path, client, poll_timeout=0.3).process_pdfs(pdf_paths[:2])
+
+    for result in results.values():
+        assert not result['metadata']['success']
+        assert 'not ready after' in result['metadata']['note']
+        assert 'Temporary failure' in result['metadata']['note']
+    assert client.requests == 0
+
+
+def test_failed_processing_is_reported_per_file(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=1, failed=('0.pdf',))
+    results = _processor(tmp_path, client).process_pdfs(pdf_paths[:2])
+
+    assert not results[pdf_paths[0]]['metadata']['success']
+    assert 'FAILED' in results[pdf_paths[0]]['metadata']['note']
+    assert results[pdf_paths[1]]['metadata']['success']
+
+
+def test_second_run_reuses_uploaded_files(tmp_path, pdf_paths):
+    client = FakeGeminiClient()
+    _processor(tmp_path, client).process_pdfs(pdf_paths)
+
+    # 新的 processor 从磁盘上的上传记录找到远端文件
+    processor = _processor(tmp_path, client)
+    results = processor.process_pdfs(pdf_paths)
+
+    assert all(result['metadata']['success'] for result in results.values())
+    assert client.uploads == 6
+    assert processor.reused_uploads == 6
+
+
+def test_expired_record_is_uploaded_again(tmp_path, pdf_paths):
+    client = FakeGeminiClient(file_ttl=0.2)
+    _processor(tmp_path, client, reuse_min_ttl=0).process_pdfs(pdf_paths[:1])
+    time.sleep(0.3)
+
+    processor = _processor(tmp_path, client, reuse_min_ttl=0)
+    assert processor.process_pdfs(pdf_paths[:1])[pdf_paths[0]]['metadata']['success']
+    assert client.uploads == 2
+    assert processor.reused_uploads == 0
+
+
+def test_record_close_to_expiry_is_uploaded_again(tmp_path, pdf_paths):
+    client = FakeGeminiClient(file_ttl=1800)
+    _processor(tmp_path, client, reuse_min_ttl=3600).process_pdfs(pdf_paths[:1])
+
+    processor = _processor(tmp_path, client, reuse_min_ttl=3600)
+    processor.process_pdfs(pdf_paths[:1])
+    assert client.uploads == 2
+    assert processor.reused_uploads == 0
+
+
+def test_deleted_remote_file_is_uploaded_again(tmp_path, pdf_paths):
+    client = FakeGeminiClient()
+    _processor(tmp_path, client).process_pdfs(pdf_paths[:1])
+    client.files.clear()
+
+    processor = _processor(tmp_path, client)
+    assert processor.process_pdfs(pdf_paths[:1])[pdf_paths[0]]['metadata']['success']
+    assert client.uploads == 2
+    assert processor.reused_uploads == 0
+
+
+def test_failed_remote_file_is_uploaded_again(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=0)
+    _processor(tmp_path, client).process_pdfs(pdf_paths[:1])
+    # 记录仍在有效期内，但远端文件处理失败：不复用，重新上传
+    client.failed.add('0.pdf')
+
+    processor = _processor(tmp_path, client)
+    processor.process_pdfs(pdf_paths[:1])
+    assert client.uploads == 2
+    assert processor.reused_uploads == 0
+
+
+def test_failed_processing_discards_the_record(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=1, failed=('0.pdf',))
+    _processor(tmp_path, client).process_pdfs(pdf_paths[:1])
+    client.failed.clear()
+
+    processor = _processor(tmp_path, client)
+    assert processor.process_pdfs(pdf_paths[:1])[pdf_paths[0]]['metadata']['success']
+    assert client.uploads == 2
+    assert processor.reused_uploads == 0
+
+
+def test_transient_lookup_error_keeps_the_record(tmp_path, pdf_paths):
+    client = FakeGeminiClient(processing_polls=0)
+    first = _processor(tmp_path, client)
+    first.process_pdfs(pdf_paths[:1])
+    name = first.file_index.get(first.hash_index.hash(pdf_paths[0]))['name']
+
+    # 查询上传记录时网络抖动：这次重新上传，但记录不作废
+    client.flaky_polls = client.polls + 1
+    processor = _processor(tmp_path, client)
+    assert processor.process_pdfs(pdf_paths[:1])[pdf_paths[0]]['metadata']['success']
+    assert client.uploads == 2
+    assert processor.file_index.get(processor.hash_index.hash(pdf_paths[0]))['name'] == name
+
+    processor = _processor(tmp_path, client)
+    processor.process_pdfs(pdf_paths[:1])
+    assert client.uploads == 2
+    assert processor.reused_uploads == 1
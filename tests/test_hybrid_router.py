@@ -0,0 +1,28 @@
+from sqlmodel import Session, select
+
+import src.v3_stable.hybrid_router as hybrid_router
+from src.models import Paper, RouteDecision
+from src.v2_llm.config import ClaudeConfig
+from src.v2_llm.run_claude import ClaudePDFProcessor
+from src.v2_llm.stub_server import StubAnthropicServer
+from tests.conftest import make_pdf
+
+
+def test_route_llm_records_token_usage(tmp_path, database, monkeypatch):
+    monkeypatch.setattr(hybrid_router, 'ROOT_PATH', tmp_path)
+    make_pdf(tmp_path / 'a.pdf', pages=3)
+    with Session(database) as session:
+        paper = Paper(name='a.pdf', file_size=1, page_size=3)
+        session.add(RouteDecision(paper=paper, score=0.2, scores={}, threshold=0.75, route='llm', local_seconds=1))
+        session.commit()
+
+    with StubAnthropicServer() as stub:
+        config = ClaudeConfig(base_url=stub.base_url, cache_dir=tmp_path / 'cache', crop_pages=False)
+        hybrid_router.route_llm(ClaudePDFProcessor(api_key='stub', config=config))
+        # 第二次处理同一文件命中缓存，不再消耗 token
+        cached = ClaudePDFProcessor(api_key='stub', config=config).process_pdf(str(tmp_path / 'a.pdf'))
+
+    with Session(database) as session:
+        decision = session.exec(select(RouteDecision)).one()
+    assert decision.llm_input_tokens > 0 and decision.llm_output_tokens > 0
+    assert cached['metadata']['usage'] == {'input_tokens': 0, 'output_tokens': 0}
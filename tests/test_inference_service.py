@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+
+from src.v1_plain.inference_service import InferenceService
+
+
+def _encode(texts):
+    return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_requests_are_merged_into_batches():
+    with InferenceService(_encode, max_latency_ms=50) as service:
+        futures = [service.submit([f"text {i}"]) for i in range(10)]
+        vectors = [future.result(timeout=5) for future in futures]
+
+    assert all(v.shape == (1, 2) for v in vectors)
+    assert service.requests == 10
+    assert service.batches < 10
+
+
+def test_submit_after_stop_encodes_in_caller_thread():
+    service = InferenceService(_encode).start()
+    service.stop()
+
+    future = service.submit(["abc"])
+    assert future.done()
+    np.testing.assert_array_equal(future.result(), _encode(["abc"]))
+    assert service.requests == 0
+
+
+def test_submit_racing_with_stop_always_resolves():
+    service = InferenceService(_encode, max_latency_ms=1).start()
+    futures, lock = [], threading.Lock()
+
+    def submit_many():
+        for i in range(200):
+            future = service.submit([f"text {i}"])
+            with lock:
+                futures.append(future)
+
+    threads = [threading.Thread(target=submit_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    service.stop()
+    for thread in threads:
+        thread.join()
+
+    assert len(futures) == 800
+    assert all(future.result(timeout=5).shape == (1, 2) for future in futures)
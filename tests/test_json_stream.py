@@ -0,0 +1,37 @@
+import json
+
+from src.v2_llm.json_stream import IncrementalJsonParser
+
+REPLY = json.dumps({
+    "file": {"name": "a.pdf", "total_pages": 3, "distribution_date": "2024-01"},
+    "table": {"metadata": {"start_page": 2, "end_page": 3, "table_name": "Ratings", "confidence": 0.9},
+              "data": [{"L1": "Relevance", "L2": "", "SummaryAssessment": 'Highly "relevant" \\ ', "Rating": "HS"},
+                       {"L1": "Efficiency", "L2": "Cost", "SummaryAssessment": "Mostly  on budget", "Rating": "S"}]}},
+    indent=1)
+
+
+def test_continuing_from_prefill_at_any_cut_matches_the_full_reply():
+    expected = IncrementalJsonParser()
+    expected.feed(REPLY)
+
+    for cut in range(1, len(REPLY)):
+        parser = IncrementalJsonParser()
+        rows = parser.feed(REPLY[:cut])
+        prefix = parser.prefill()
+        assert REPLY.startswith(prefix)
+        assert prefix == prefix.rstrip()
+        # 模型从前缀之后接着输出
+        rows += parser.feed(REPLY[len(prefix):])
+
+        assert parser.done
+        assert rows == parser.rows == expected.rows
+        assert (parser.file, parser.table_metadata) == (expected.file, expected.table_metadata)
+        assert json.loads(parser.text) == json.loads(REPLY)
+
+
+def test_prefill_inside_a_string_backs_up_to_its_opening_quote():
+    parser = IncrementalJsonParser()
+    parser.feed('{"table": {"data": [{"L1": "Relevance", "Rating": "Highly ')
+    assert parser.prefill() == '{"table": {"data": [{"L1": "Relevance", "Rating":'
+
+    assert parser.feed(' "Highly Satisfactory"}]}}') == [{"L1": "Relevance", "Rating": "Highly Satisfactory"}]
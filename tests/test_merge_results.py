@@ -0,0 +1,40 @@
+from src.v2_llm.run_claude import ClaudePDFProcessor
+
+
+def _table(start_page, end_page, rows, confidence=0.9):
+    return {"metadata": {"start_page": start_page, "end_page": end_page, "table_name": "Ratings",
+                         "confidence": confidence},
+            "data": [{"L1": "Relevance", "L2": f"row {i}", "SummaryAssessment": "", "Rating": "S"} for i in rows]}
+
+
+def test_tables_after_a_chunk_without_table_are_kept():
+    results = [
+        {"file": None, "table": None},
+        {"file": {"name": "a.pdf", "total_pages": 20, "distribution_date": "2024-05"},
+         "table": _table(12, 13, range(3), confidence=0.8)},
+        {"file": None, "table": _table(14, 14, range(3, 5))},
+    ]
+
+    merged = ClaudePDFProcessor._merge_results(results)
+
+    assert merged["file"]["distribution_date"] == "2024-05"
+    assert [row["L2"] for row in merged["table"]["data"]] == [f"row {i}" for i in range(5)]
+    metadata = merged["table"]["metadata"]
+    assert (metadata["start_page"], metadata["end_page"], metadata["confidence"]) == (12, 14, 0.9)
+
+
+def test_merge_does_not_modify_chunk_results():
+    first = {"file": {"name": "a.pdf"}, "table": _table(1, 1, range(2))}
+    second = {"file": {"name": "a.pdf"}, "table": _table(2, 2, range(2, 4))}
+
+    merged = ClaudePDFProcessor._merge_results([first, second])
+    merged["file"]["total_pages"] = 2
+
+    assert len(first["table"]["data"]) == 2
+    assert first["table"]["metadata"]["end_page"] == 1
+    assert "total_pages" not in first["file"]
+
+
+def test_no_table_in_any_chunk():
+    merged = ClaudePDFProcessor._merge_results([{"file": {"name": "a.pdf"}, "table": None}] * 2)
+    assert merged == {"file": {"name": "a.pdf"}, "table": None}
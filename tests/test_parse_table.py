@@ -0,0 +1,42 @@
+import pymupdf
+import pytest
+
+from src.utils.document_session import DocumentSession
+from src.v1_plain.parse_table import _extract_bold_chars, _find_bold_cells, _is_bold_span
+
+
+@pytest.fixture
+def doc():
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_text((80, 100), "Rating", fontname="helv", fontsize=11)
+    page.insert_text((220, 100), "Bold", fontname="hebo", fontsize=11)
+    page.insert_text((80, 130), "   ", fontname="hebo", fontsize=11)  # 单元格里只有加粗的空格
+    page.insert_text((220, 130), "plain   ", fontname="helv", fontsize=11)
+    page.insert_text((80, 160), "x", fontname="helv", fontsize=11)
+    page.insert_text((90, 160), "  ", fontname="hebo", fontsize=11)
+    page.insert_text((190, 160), "Straddles the border", fontname="hebo", fontsize=11)
+    yield doc
+    doc.close()
+
+
+def _clip_baseline(page, cells):
+    """逐个单元格 page.get_text("dict", clip=cell_rect) 判断是否加粗"""
+    return {key for key, rect in cells.items()
+            if any(_is_bold_span(span)
+                   for block in page.get_text("dict", clip=rect)["blocks"]
+                   for line in block.get("lines", [])
+                   for span in line["spans"])}
+
+
+@pytest.mark.parametrize("offset", [0, 7.5, 21])
+def test_bold_cells_match_per_cell_clip(doc, offset):
+    cells = {(i, j): pymupdf.Rect(70 + offset + 140 * j, 85 + 30 * i, 210 + offset + 140 * j, 115 + 30 * i)
+             for i in range(3) for j in range(2)}
+    page = doc[0]
+    with DocumentSession(doc) as session:
+        bold_cells = _find_bold_cells(page, cells, _extract_bold_chars(session.get_rawdict(0)))
+
+    assert bold_cells == _clip_baseline(page, cells)
+    if offset == 0:
+        assert (1, 0) in bold_cells
@@ -0,0 +1,26 @@
+import numpy as np
+import pymupdf
+
+import src.v1_plain.parse_text as parse_text
+from src.v1_plain.parse_text import find_summary_text
+
+
+def test_rerank_reports_display_progress_before_the_checkpointed_page(tmp_path, monkeypatch):
+    doc = pymupdf.open()
+    for i in range(5):
+        doc.new_page().insert_text((72, 72), parse_text.target_text if i == 3 else f"Chapter {i + 1}")
+    doc.save(tmp_path / 'a.pdf')
+    doc.close()
+
+    # 以词法得分代替语义打分，不需要加载模型
+    monkeypatch.setattr(parse_text, '_score_blocks', lambda page_blocks: {
+        page_num: np.array([parse_text.lexical_score(block[4]) for block in blocks])
+        for page_num, blocks in page_blocks.items()})
+    events = []
+    result = find_summary_text(str(tmp_path / 'a.pdf'), start_page=1, light=True,
+                               page_callback=lambda page_num, total, best_match=None: events.append(('page', page_num)),
+                               progress_callback=lambda page_num, total, stage: events.append((stage, page_num)))
+
+    assert result['page_num'] == 3
+    # 粗筛时逐页上报显示进度，断点进度只在重排完成后上报一次
+    assert events == [('lexical', 1), ('lexical', 2), ('lexical', 3), ('lexical', 4), ('rerank', 4), ('page', 4)]
@@ -0,0 +1,51 @@
+import pymupdf
+import pytest
+
+from src.v2_llm.config import ClaudeConfig
+from src.v2_llm.pdf_split import pack_pages, split_pdf
+from tests.conftest import make_pdf
+
+
+def _covered(chunks) -> list:
+    return [page for chunk in chunks for page in chunk]
+
+
+@pytest.mark.parametrize("page_tokens, budget, max_pages", [
+    ([100] * 10, 350, 100),
+    ([100] * 10, 10_000, 4),
+    ([100, 900, 100, 100, 50, 600, 10], 600, 3),
+    ([], 100, 5),
+])
+def test_pack_pages_covers_every_page_once_within_limits(page_tokens, budget, max_pages):
+    chunks = pack_pages(page_tokens, budget, max_pages)
+
+    assert _covered(chunks) == list(range(len(page_tokens)))
+    for chunk in chunks:
+        assert len(chunk) <= max_pages
+        # 只有单页就超过预算时才会超出
+        assert sum(page_tokens[page] for page in chunk) <= budget or len(chunk) == 1
+
+
+def test_page_over_budget_forms_its_own_chunk():
+    assert pack_pages([100, 900, 100, 100], 500, 10) == [range(0, 1), range(1, 2), range(2, 4)]
+
+
+def test_split_pdf_respects_chunk_size_and_budget(tmp_path):
+    pdf_path = make_pdf(tmp_path / 'a.pdf', pages=7)
+    config = ClaudeConfig(chunk_size=3, page_base_tokens=1000)
+    page_tokens = []
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            page_tokens.append(int(config.page_base_tokens + len(page.get_text()) / config.chars_per_token))
+
+    # 每块最多 2 页的预算，chunk_size=3 不起作用
+    chunks = split_pdf(pdf_path, config, token_budget=sum(page_tokens[:2]) + 1)
+    assert [chunk.pages for chunk in chunks] == [[0, 1], [2, 3], [4, 5], [6]]
+    # 预算足够时按 chunk_size 分块，page_numbers 映射回原文件页码
+    chunks = split_pdf(pdf_path, config, page_numbers=[10, 11, 12, 13, 14, 15, 16], token_budget=10 ** 6)
+    assert [chunk.pages for chunk in chunks] == [[10, 11, 12], [13, 14, 15], [16]]
+
+    for chunk in chunks:
+        assert chunk.estimated_tokens == sum(page_tokens[page - 10] for page in chunk.pages)
+        with pymupdf.open(stream=chunk.data) as doc:
+            assert [page.get_text().strip() for page in doc] == [f"a page {page - 9}" for page in chunk.pages]
@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.v2_llm.run_claude as run_claude
+from src.v2_llm.config import ClaudeConfig
+from src.v2_llm.rate_limiter import RateLimiter
+from src.v2_llm.run_claude import ClaudePDFProcessor
+from src.v2_llm.stub_server import StubAnthropicServer
+from tests.conftest import make_pdf
+
+# 时间相关断言的容差（秒）
+TOLERANCE = 0.1
+
+TABLE_REPLY = json.dumps({
+    "file": {"name": "stub.pdf", "total_pages": 1, "distribution_date": "2024-01"},
+    "table": {"metadata": {"start_page": 1, "end_page": 1, "table_name": "Ratings", "confidence": 0.9},
+              "data": [{"L1": "Relevance", "L2": "", "SummaryAssessment": "ok", "Rating": "S"}]}})
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    """替换 run_claude 中的 RateLimiter，记录创建的实例与每次申请的额度；可以缩短额度的时间窗口或固定时钟"""
+    limiters = SimpleNamespace(created=[], options={}, acquired=[])
+
+    class Limiter(RateLimiter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **{**kwargs, **limiters.options})
+            limiters.created.append(self)
+
+        async def acquire(self, input_tokens, output_tokens):
+            limiters.acquired.append((input_tokens, output_tokens))
+            await super().acquire(input_tokens, output_tokens)
+
+    monkeypatch.setattr(run_claude, 'RateLimiter', Limiter)
+    return limiters
+
+
+def _process(stub, tmp_path, pages, **config):
+    config = ClaudeConfig(base_url=stub.base_url, cache_dir=tmp_path / 'cache', crop_pages=False, chunk_size=1,
+                          **config)
+    result = ClaudePDFProcessor(api_key='stub', config=config).process_pdf(make_pdf(tmp_path / 'a.pdf', pages))
+    assert result['metadata']['success']
+    return result
+
+
+def _offsets(stub, status=200):
+    times = sorted(t for t, s in stub.arrivals if s == status)
+    return [t - times[0] for t in times]
+
+
+def test_429_with_retry_after_pauses_all_requests(tmp_path):
+    with StubAnthropicServer(latency=0.2, rate_limit_first=1, retry_after=1) as stub:
+        _process(stub, tmp_path, pages=4, max_concurrent_requests=2)
+
+    assert stub.requests == 5
+    (rate_limited_at, _), *rest = sorted(stub.arrivals, key=lambda arrival: arrival[1] != 429)
+    # 与 429 同时发出的请求照常完成，之后的请求（包括排队等连接槽位的）都等到 retry-after 结束
+    later = sorted(t for t, _ in rest)[1:]
+    assert len(later) == 3
+    assert all(t >= rate_limited_at + 1 - TOLERANCE for t in later)
+
+
+def test_requests_per_minute_is_enforced(tmp_path, limiters):
+    limiters.options['period'] = 1
+    with StubAnthropicServer() as stub:
+        _process(stub, tmp_path, pages=9, requests_per_minute=3)
+
+    # 桶里的 3 个请求立即发出，之后每 1/3 秒一个
+    offsets = _offsets(stub)
+    assert len(offsets) == 9
+    for k, offset in enumerate(offsets):
+        assert offset >= (k + 1 - 3) / 3 - TOLERANCE
+
+
+def test_output_tokens_per_minute_is_enforced(tmp_path, limiters):
+    limiters.options['period'] = 1
+    rows = [{"L1": f"Criterion {i}", "L2": "", "SummaryAssessment": "x" * 40, "Rating": "S"} for i in range(50)]
+    long_reply = json.dumps({"file": None, "table": {"metadata": None, "data": rows}})
+    with StubAnthropicServer(reply=lambda request: long_reply) as stub:
+        # 回复被 max_tokens 截断，实际输出等于预留的 100 个 token，结算不会退还额度
+        _process(stub, tmp_path, pages=6, max_tokens=100, max_continuations=0, output_tokens_per_minute=200)
+
+    assert all(usage['output_tokens'] == 100 for usage in stub.usage)
+    offsets = _offsets(stub)
+    assert len(offsets) == 6
+    for k, offset in enumerate(offsets):
+        assert offset >= (k + 1 - 2) / 2 - TOLERANCE
+
+
+def test_reservations_are_settled_against_reported_usage(tmp_path, limiters):
+    # 固定时钟：令牌桶不补充，剩余额度只取决于扣除与结算
+    limiters.options['clock'] = lambda: 0.0
+    with StubAnthropicServer(reply=lambda request: TABLE_REPLY) as stub:
+        result = _process(stub, tmp_path, pages=3, input_tokens_per_minute=1_000_000,
+                          output_tokens_per_minute=100_000)
+
+    limiter, = limiters.created
+    assert len(stub.usage) == 3
+    spent_input = sum(usage['input_tokens'] for usage in stub.usage)
+    spent_output = sum(usage['output_tokens'] for usage in stub.usage)
+    assert limiter.input_tokens.tokens == 1_000_000 - spent_input
+    assert limiter.output_tokens.tokens == 100_000 - spent_output
+    assert limiter.requests.tokens == ClaudeConfig.requests_per_minute - 3
+    assert result['metadata']['usage'] == {'input_tokens': spent_input, 'output_tokens': spent_output}
+
+
+def test_chunks_are_split_to_fit_input_tokens_per_minute(tmp_path, limiters):
+    limiters.options['period'] = 1
+    # 6 页的估计 token 数超过每分钟输入额度，按 chunk_token_budget 本应只有一块
+    config = ClaudeConfig(cache_dir=tmp_path / 'cache', crop_pages=False, max_tokens=100, max_continuations=0,
+                          input_tokens_per_minute=5000)
+    pdf_path = make_pdf(tmp_path / 'a.pdf', pages=6)
+    with StubAnthropicServer() as stub:
+        config.base_url = stub.base_url
+        result = ClaudePDFProcessor(api_key='stub', config=config).process_pdf(pdf_path)
+
+    assert result['metadata']['success']
+    assert stub.requests == len(limiters.acquired) > 1
+    assert all(input_tokens <= config.input_tokens_per_minute for input_tokens, _ in limiters.acquired)
+
+
+def test_streams_dropped_midway_are_settled_and_counted(tmp_path, limiters):
+    limiters.options['clock'] = lambda: 0.0
+    with StubAnthropicServer(reply=lambda request: TABLE_REPLY, drop_streams_first=2) as stub:
+        result = _process(stub, tmp_path, pages=2, backoff_base=0.01, input_tokens_per_minute=1_000_000,
+                          output_tokens_per_minute=100_000)
+
+    limiter, = limiters.created
+    assert len(stub.dropped_usage) == 2
+    assert len(stub.usage) == 2
+    # 断开前已经发出的 token 同样计入限速额度与结果中的用量
+    spent = stub.usage + stub.dropped_usage
+    spent_input = sum(usage['input_tokens'] for usage in spent)
+    spent_output = sum(usage['output_tokens'] for usage in spent)
+    assert limiter.input_tokens.tokens == 1_000_000 - spent_input
+    assert limiter.output_tokens.tokens == 100_000 - spent_output
+    assert result['metadata']['usage'] == {'input_tokens': spent_input, 'output_tokens': spent_output}
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+from src.v2_llm.config import ClaudeConfig
+from src.v2_llm.result_cache import ResultCache
+from src.v2_llm.run_claude import ClaudePDFProcessor
+from src.v2_llm.stub_server import DEFAULT_REPLY, StubAnthropicServer
+from tests.conftest import make_pdf
+
+
+def _failing_once(fail_request: int):
+    """第 fail_request 个请求返回无法解析的回复，其余返回 DEFAULT_REPLY"""
+    lock = threading.Lock()
+    count = [0]
+
+    def reply(request):
+        with lock:
+            count[0] += 1
+            return "not json" if count[0] == fail_request else DEFAULT_REPLY
+
+    return reply
+
+
+def test_rerun_after_partial_failure_only_pays_for_failed_chunks(tmp_path):
+    pdf_path = make_pdf(tmp_path / 'a.pdf', pages=3)
+    config = ClaudeConfig(cache_dir=tmp_path / 'cache', crop_pages=False, chunk_size=1, max_continuations=0)
+
+    with StubAnthropicServer(reply=_failing_once(2)) as stub:
+        config.base_url = stub.base_url
+        ClaudePDFProcessor(api_key='stub', config=config).process_pdf(pdf_path)
+    assert stub.requests == 3
+
+    with StubAnthropicServer() as stub:
+        config.base_url = stub.base_url
+        processor = ClaudePDFProcessor(api_key='stub', config=config)
+        result = processor.process_pdf(pdf_path)
+    assert result['metadata']['success']
+    assert stub.requests == 1
+    assert processor.cache.stats()['hits'] == 2
+
+    # 所有分块都成功后整个文件的结果写入缓存，再次运行不发请求
+    with StubAnthropicServer() as stub:
+        config.base_url = stub.base_url
+        ClaudePDFProcessor(api_key='stub', config=config).process_pdf(pdf_path)
+    assert stub.requests == 0
+
+
+def _put(cache: ResultCache, name: str, mtime: float) -> str:
+    key = ResultCache.key(name)
+    cache.put(key, {"name": name, "padding": name * 100})
+    os.utime(cache._path(key), (mtime, mtime))
+    return key
+
+
+def test_evict_removes_entries_older_than_max_age(tmp_path):
+    cache = ResultCache(tmp_path, max_age_days=1)
+    now = time.time()
+    old = _put(cache, 'old', now - 2 * 86400)
+    recent = _put(cache, 'recent', now - 3600)
+
+    assert cache.evict() == 1
+    assert old not in cache
+    assert recent in cache
+
+
+def test_evict_removes_least_recently_used_entries_over_max_bytes(tmp_path):
+    cache = ResultCache(tmp_path)
+    now = time.time()
+    keys = [_put(cache, name, now - 300 + i * 100) for i, name in enumerate('abc')]
+    cache.max_bytes = sum(cache._path(key).stat().st_size for key in keys[:2])
+
+    # 读取刷新 a 的使用时间，最久未使用的变为 b
+    assert cache.get(keys[0]) is not None
+    assert cache.evict() == 1
+    assert [key in cache for key in keys] == [True, False, True]
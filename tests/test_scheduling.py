@@ -0,0 +1,41 @@
+import pytest
+
+from src.utils.scheduling import estimate_pages, schedule, schedule_pdf_files
+
+
+def _files(tmp_path, sizes: dict) -> list:
+    paths = []
+    for name, size in sizes.items():
+        path = tmp_path / name
+        path.write_bytes(b'x' * size)
+        paths.append(path)
+    return paths
+
+
+def test_longest_first_keeps_original_order_for_ties():
+    items = ['a', 'b', 'c', 'd', 'e']
+    cost = {'a': 1, 'b': 5, 'c': 3, 'd': 5, 'e': 1}.__getitem__
+
+    assert schedule(items, cost) == ['b', 'd', 'c', 'a', 'e']
+    assert schedule(items, cost, 'filename') == items
+    with pytest.raises(ValueError):
+        schedule(items, cost, 'shortest_first')
+
+
+def test_unknown_page_counts_are_estimated_from_median_bytes_per_page(tmp_path):
+    a, b, c, d, e = _files(tmp_path, {'a.pdf': 1000, 'b.pdf': 3000, 'c.pdf': 10_000, 'd.pdf': 4000, 'e.pdf': 500})
+    # 已知文件每页 100、300、1000 字节，中位数 300
+    page_counts = {'a.pdf': 10, 'b.pdf': 10, 'c.pdf': 10}
+
+    pages = estimate_pages([a, b, c, d, e], page_counts)
+
+    assert pages == {a: 10, b: 10, c: 10, d: pytest.approx(4000 / 300), e: pytest.approx(500 / 300)}
+    assert schedule_pdf_files([a, b, c, d, e], page_counts=page_counts) == [d, a, b, c, e]
+
+
+def test_file_size_is_the_cost_without_any_known_page_count(tmp_path):
+    paths = _files(tmp_path, {'1.pdf': 200, '2.pdf': 900, '3.pdf': 500})
+
+    assert estimate_pages(paths, {}) == {path: path.stat().st_size for path in paths}
+    assert [path.name for path in schedule_pdf_files(paths, page_counts={})] == ['2.pdf', '3.pdf', '1.pdf']
+    assert schedule_pdf_files(paths, 'filename') == paths
@@ -0,0 +1,39 @@
+import pytest
+
+from src.v1_plain.table_finder import TableFinder, caption_matches
+from tests.conftest import make_pdf
+
+CAPTIONS = {0: "Table 1: Budget", 2: "Table 2: Project Ratings", 3: "Table 2 (continued)", 5: "Table 3: Staff"}
+
+
+@pytest.fixture
+def finder(tmp_path):
+    finder = TableFinder(make_pdf(tmp_path / 'a.pdf', pages=7, tables=CAPTIONS))
+    yield finder
+    finder.close()
+
+
+def _summary(tables) -> list:
+    return [(table.start_page, table.end_page, table.preceding_text, len(table.headers)) for table in tables]
+
+
+def test_find_tables_with_context_matches_the_full_scan(finder):
+    # 与改为生成器之前逐页扫描全文的结果相同：第 3、4 页的表格合并为一个跨页表格
+    tables = finder.find_tables_with_context()
+
+    assert _summary(tables) == [(0, 0, "Table 1: Budget", 3), (2, 3, "Table 2: Project Ratings", 3),
+                                (5, 5, "Table 3: Staff", 3)]
+    assert [tuple(round(v, 1) for v in table.bbox) for table in tables] == [(72.0, 231.4, 476.5, 322.4)] * 3
+    assert tables[1].headers[0] == "Cell00 p3\nCell01 p3\nCell02 p3"
+    assert finder.detections_run == 7
+
+
+def test_stop_when_ends_the_scan_early(finder):
+    pages = []
+    tables = list(finder.iter_tables(stop_when=caption_matches(r"project ratings"),
+                                     progress_callback=lambda page_num, total: pages.append(page_num)))
+
+    assert _summary(tables) == [(0, 0, "Table 1: Budget", 3), (2, 3, "Table 2: Project Ratings", 3)]
+    # 跨页表格在确认第 5 页没有延续后产出，之后的页面不再扫描
+    assert pages == [0, 1, 2, 3]
+    assert finder.detections_run == 5